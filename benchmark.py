@@ -0,0 +1,532 @@
+"""
+Benchmarks for the autograder's hot paths, run against large generated Brewin programs.
+
+    python3 benchmark.py parser --classes 2000
+    python3 benchmark.py parse-memory --classes 2000
+    python3 benchmark.py parse-stream --classes 2000
+    python3 benchmark.py engines [program.brewin ...]
+    python3 benchmark.py engine-workloads --fib 20 --iterations 100000
+    python3 benchmark.py object-memory --nodes 5000
+    python3 benchmark.py deep-hierarchy --depth 30
+    python3 benchmark.py expression-memory --expressions 1000000
+    python3 benchmark.py output --lines 100000
+    python3 benchmark.py suite-load
+"""
+
+import argparse
+import glob
+import io
+import os
+import tempfile
+import time
+import tracemalloc
+from contextlib import redirect_stdout
+
+from bparser import BParser
+from output_sink import BufferedStreamSink, ComparingSink, ListSink, OutputMismatch, TeeSink
+from suite_bundle import SuiteBundle, build_bundle
+from tester import TestScaffold, generate_test_suite
+import interpreterv2
+import interpreterv3
+from objectv2 import ObjectDef
+from type_valuev2 import create_value
+
+
+def generate_program(num_classes):
+    """
+    Generate the lines of a large, syntactically valid Brewin program: num_classes classes
+    with fields, comments, string literals containing delimiters, and nested statements.
+    """
+    lines = []
+    for i in range(num_classes):
+        lines += [
+            f"# generated class {i}; (comments can hold parens and \"quotes\")\n",
+            f"(class class{i}\n",
+            f"  (field int count{i} {i})\n",
+            f'  (field string label{i} "class ({i}) # not a comment")\n',
+            "  (method int step ((int n) (bool verbose))\n",
+            "    (begin\n",
+            "      (while (> n 0)\n",
+            "        (begin\n",
+            f"          (set count{i} (+ count{i} (* n 2)))  # accumulate\n",
+            "          (if verbose (print \"n is \" n \" (still going)\") (set n (- n 1)))\n",
+            "          (set n (- n 1))\n",
+            "        )\n",
+            "      )\n",
+            f"      (return count{i})\n",
+            "    )\n",
+            "  )\n",
+            ")\n",
+        ]
+    return lines
+
+
+def best_time(func, repeat):
+    """Best wall-clock time of `repeat` calls to func, in seconds."""
+    best = float("inf")
+    for _ in range(repeat):
+        start = time.perf_counter()
+        func()
+        best = min(best, time.perf_counter() - start)
+    return best
+
+
+def bench_parser(args):
+    """Compare the tokenizer parser against the character-by-character reference."""
+    lines = generate_program(args.classes)
+    status, fast_tree = BParser.parse(lines)
+    assert status and fast_tree == BParser.parse(lines, fast=False)[1]
+    fast = best_time(lambda: BParser.parse(lines), args.repeat)
+    reference = best_time(lambda: BParser.parse(lines, fast=False), args.repeat)
+    print(f"{len(lines)} lines, {sum(map(len, lines))} characters")
+    print(f"char-by-char parse: {reference * 1000:9.1f} ms")
+    print(f"tokenizer parse:    {fast * 1000:9.1f} ms")
+    print(f"speedup:            {reference / fast:9.2f}x")
+
+
+class DictToken(str):
+    """The original token layout: a str subclass with a line_num in its own instance dict."""
+
+    def __new__(cls, string, line_num):
+        instance = super().__new__(cls, string)
+        instance.line_num = line_num
+        return instance
+
+
+def retained_bytes(func):
+    """Run func and return (result, bytes it allocated that are still alive afterwards)."""
+    tracemalloc.start()
+    try:
+        result = func()
+        retained, _ = tracemalloc.get_traced_memory()
+    finally:
+        tracemalloc.stop()
+    return result, retained
+
+
+def count_tokens(tree):
+    """Number of tokens (leaves) in a parse tree."""
+    return sum(count_tokens(item) if isinstance(item, list) else 1 for item in tree)
+
+
+def with_dict_tokens(tree):
+    """Copy of a parse tree that uses the original per-token-dict layout."""
+    return [
+        with_dict_tokens(item)
+        if isinstance(item, list)
+        else DictToken(str(item), item.line_num)
+        for item in tree
+    ]
+
+
+def bench_parse_memory(args):
+    """Memory retained by a parse tree, compared against per-token attribute dicts."""
+    lines = generate_program(args.classes)
+    (_, tree), compact = retained_bytes(lambda: BParser.parse(lines))
+    _, legacy = retained_bytes(lambda: with_dict_tokens(tree))
+    tokens = count_tokens(tree)
+    print(f"{len(lines)} lines, {tokens} tokens")
+    print(f"per-token dicts:    {legacy / 2**20:9.1f} MB ({legacy / tokens:6.1f} bytes/token)")
+    print(f"shared line dicts:  {compact / 2**20:9.1f} MB ({compact / tokens:6.1f} bytes/token)")
+    print(f"reduction:          {legacy / compact:9.2f}x")
+
+
+def peak_bytes(func):
+    """Run func and return the peak number of bytes traced while it ran."""
+    tracemalloc.start()
+    try:
+        func()
+        _, peak = tracemalloc.get_traced_memory()
+    finally:
+        tracemalloc.stop()
+    return peak
+
+
+def bench_parse_stream(args):
+    """Peak memory of parsing a large file whole versus form by form."""
+    handle, path = tempfile.mkstemp(suffix=".brewin")
+    try:
+        with os.fdopen(handle, "w", encoding="utf-8") as source:
+            source.writelines(generate_program(args.classes))
+
+        def parse_whole():
+            with open(path, encoding="utf-8") as source:
+                BParser.parse(source.readlines())
+
+        def parse_streaming():
+            with open(path, encoding="utf-8") as source:
+                for status, _ in BParser.parse_stream(source):
+                    assert status
+
+        whole = peak_bytes(parse_whole)
+        streaming = peak_bytes(parse_streaming)
+    finally:
+        os.unlink(path)
+    print(f"{args.classes} top-level classes")
+    print(f"readlines + parse:  {whole / 2**10:9.0f} KB peak")
+    print(f"parse_stream:       {streaming / 2**10:9.0f} KB peak")
+
+
+def run_program(program, stdin, **options):
+    """Run a program on a fresh interpreterv3; returns (output lines, error type, error line)."""
+    interpreter = interpreterv3.Interpreter(False, stdin, False, **options)
+    try:
+        with redirect_stdout(io.StringIO()):  # the interpreter prints debugging output
+            interpreter.run(program)
+    except Exception:  # pylint: disable=broad-except
+        pass  # interpreter errors are recorded on the interpreter, like in tester.py
+    error_type, error_line = interpreter.get_error_type_and_line()
+    return interpreter.get_output(), error_type, error_line
+
+
+def load_program(path):
+    """Return (program lines, stdin lines or None, expected lines or None) for a .brewin file."""
+    base = path[: -len(".brewin")]
+    with open(path, encoding="utf-8") as handle:
+        program = handle.readlines()
+    stdin = expected = None
+    if os.path.exists(base + ".in"):
+        with open(base + ".in", encoding="utf-8") as handle:
+            stdin = [line.rstrip("\n") for line in handle]
+    if os.path.exists(base + ".exp"):
+        with open(base + ".exp", encoding="utf-8") as handle:
+            expected = [line.rstrip("\n") for line in handle]
+    return program, stdin, expected
+
+
+def matches_expected(result, expected, expect_failure):
+    """Whether a run_program result passes the way tester.py would grade it."""
+    output, error_type, _ = result
+    if expect_failure:
+        return error_type is not None and [f"{error_type}"] == expected
+    return error_type is None and output == expected
+
+
+def bench_engines(args):
+    """Run programs on the closure compiler and the bytecode VM; check they agree and compare speed."""
+    paths = args.programs or sorted(
+        path
+        for version in ("v2", "v3")
+        for path in glob.glob(f"{version}/**/*.brewin", recursive=True)
+    )
+    engines = {"closures": {}, "bytecode": {"bytecode": True}}
+    totals = dict.fromkeys(engines, 0.0)
+    passed = dict.fromkeys(engines, 0)
+    timings = []
+    for path in paths:
+        program, stdin, expected = load_program(path)
+        results, times = {}, {}
+        for engine, options in engines.items():
+
+            def run(options=options):
+                return run_program(program, stdin, **options)
+
+            results[engine] = run()
+            times[engine] = best_time(run, args.repeat)
+            totals[engine] += times[engine]
+            if expected is not None and matches_expected(
+                results[engine], expected, "/fails/" in path
+            ):
+                passed[engine] += 1
+        if results["closures"] != results["bytecode"]:
+            print(f"MISMATCH {path}: {results['closures']} != {results['bytecode']}")
+        timings.append((times["closures"], times["bytecode"], path))
+    print(f"{len(paths)} programs")
+    for closure_time, bytecode_time, path in sorted(timings, reverse=True)[: args.top]:
+        print(f"{path:50} closures {closure_time * 1000:8.1f} ms   bytecode {bytecode_time * 1000:8.1f} ms")
+    for engine in engines:
+        print(f"{engine + ':':10} {totals[engine]:8.2f} s total, {passed[engine]} match their .exp")
+
+
+def engine_workloads(fib, iterations):
+    """Programs that favour each engine: deep recursion computing fib(fib), and a loop of iterations additions."""
+    recursion = f"""
+(class main
+  (method int fib ((int n))
+    (if (< n 2) (return n) (return (+ (call me fib (- n 1)) (call me fib (- n 2)))))
+  )
+  (method void main () (print (call me fib {fib})))
+)
+"""
+    loop = f"""
+(class main
+  (method void main ()
+    (let ((int i 0) (int total 0))
+      (while (< i {iterations}) (begin (set total (+ total i)) (set i (+ i 1))))
+      (print total)
+    )
+  )
+)
+"""
+    return {"recursion": recursion.splitlines(keepends=True), "loop": loop.splitlines(keepends=True)}
+
+
+def bench_engine_workloads(args):
+    """
+    Time the closure compiler and the bytecode VM on deep recursion, where the VM's cheaper calls win, and on
+    a statement-heavy loop, where its per-instruction dispatch loses.
+    """
+    for name, program in engine_workloads(args.fib, args.iterations).items():
+        times = {
+            engine: best_time(lambda options=options: run_program(program, None, **options), args.repeat)
+            for engine, options in (("closures", {}), ("bytecode", {"bytecode": True}))
+        }
+        print(
+            f"{name:10} closures {times['closures'] * 1000:8.1f} ms   bytecode {times['bytecode'] * 1000:8.1f} ms"
+            f"   ({times['closures'] / times['bytecode']:.2f}x)"
+        )
+
+
+def scaled_linked_list(nodes):
+    """v2/tests/test_ll.brewin with a main that inserts `nodes` values into the list instead of three."""
+    with open("v2/tests/test_ll.brewin", encoding="utf-8") as handle:
+        source = handle.read()
+    main = f"""
+(class main
+  (field linkedlist x null)
+  (field int i 0)
+  (method void main ()
+    (begin
+      (set x (new linkedlist))
+      (while (< i {nodes})
+        (begin
+          (call x insert i)
+          (set i (+ i 1))
+        )
+      )
+    )
+  )
+)
+"""
+    return (source[: source.index("(class main")] + main).splitlines(keepends=True)
+
+
+def bench_object_memory(args):
+    """Peak memory and time of building a long linked list, per node, on both object models."""
+    program = scaled_linked_list(args.nodes)
+    for module in (interpreterv2, interpreterv3):
+
+        def run(module=module):
+            with redirect_stdout(io.StringIO()):
+                module.Interpreter(False, None, False).run(program)
+
+        peak = peak_bytes(run)
+        elapsed = best_time(run, args.repeat)
+        print(
+            f"{module.__name__}: {args.nodes} nodes, {peak / 2**20:7.1f} MB peak "
+            f"({peak / args.nodes:7.0f} bytes/node), {elapsed * 1000:8.1f} ms"
+        )
+
+
+def deep_hierarchy_program(depth, iterations):
+    """
+    A chain of `depth` classes, each inheriting from the previous one. main repeatedly assigns an instance of the
+    most derived class to a base class field and passes it to a base class method, which type checks it against
+    the whole chain.
+    """
+    lines = [
+        "(class c0\n",
+        "  (field int count 0)\n",
+        "  (method void visit ((c0 other)) (set count (+ count 1)))\n",
+        "  (method int get_count () (return count))\n",
+        ")\n",
+    ]
+    for i in range(1, depth):
+        lines += [
+            f"(class c{i} inherits c{i - 1}\n",
+            f"  (field int f{i} {i})\n",
+            f"  (method int m{i} () (return f{i}))\n",
+            ")\n",
+        ]
+    lines += [
+        "(class main\n",
+        "  (field c0 base null)\n",
+        f"  (field c{depth - 1} leaf null)\n",
+        "  (field int i 0)\n",
+        "  (method void main ()\n",
+        "    (begin\n",
+        f"      (set leaf (new c{depth - 1}))\n",
+        f"      (while (< i {iterations})\n",
+        "        (begin\n",
+        "          (set base leaf)\n",
+        "          (call leaf visit base)\n",
+        "          (set i (+ i 1))\n",
+        "        )\n",
+        "      )\n",
+        "      (print (call leaf get_count))\n",
+        "    )\n",
+        "  )\n",
+        ")\n",
+    ]
+    return lines
+
+
+def bench_deep_hierarchy(args):
+    """Assignments and calls through a deep inheritance chain on interpreterv3."""
+    program = deep_hierarchy_program(args.depth, args.iterations)
+    output, error_type, _ = run_program(program, None)
+    assert error_type is None and output == [str(args.iterations)], (output, error_type)
+    elapsed = best_time(lambda: run_program(program, None), args.repeat)
+    print(f"depth {args.depth}, {args.iterations} iterations: {elapsed * 1000:8.1f} ms")
+
+
+def expression_mix(count):
+    """
+    `count` (operation, operand, operand) triples drawn from what test programs evaluate most: loop counter
+    arithmetic and comparisons, boolean logic, and string building, on the small operands those programs use
+    """
+    int_ops = ObjectDef.binary_ops["int"]
+    bool_ops = ObjectDef.binary_ops["bool"]
+    string_ops = ObjectDef.binary_ops["string"]
+    ints = [create_value(str(i)) for i in range(100)]
+    one = create_value("1")
+    true = create_value("true")
+    empty = create_value('""')
+    word = create_value('"ab"')
+    mix = []
+    for i in range(count):
+        n = ints[i % len(ints)]
+        kind = i % 6
+        if kind == 0:
+            mix.append((int_ops["+"], n, one))
+        elif kind == 1:
+            mix.append((int_ops["-"], n, one))
+        elif kind == 2:
+            mix.append((int_ops["<"], n, ints[50]))
+        elif kind == 3:
+            mix.append((int_ops["=="], n, ints[0]))
+        elif kind == 4:
+            mix.append((bool_ops["&"], true, true))
+        else:
+            mix.append((string_ops["+"], empty, word if i % 12 == 5 else empty))
+    return mix
+
+
+def bench_expression_memory(args):
+    """Bytes allocated for the Values that evaluating a mix of expressions produces, per million expressions."""
+    mix = expression_mix(args.expressions)
+    # every result is kept alive, so none of the memory allocated for one can be reused for the next
+    results, allocated = retained_bytes(lambda: [operation(a, b) for operation, a, b in mix])
+    per_million = allocated * 1_000_000 / len(results)
+    print(
+        f"{len(results)} expressions: {per_million / 2**20:7.1f} MB per 1M expressions "
+        f"({allocated / len(results):5.1f} bytes/expression, including the list holding the results)"
+    )
+
+
+def print_loop_program(lines):
+    """main prints `lines` lines in a loop"""
+    return [
+        "(class main\n",
+        "  (field int i 0)\n",
+        "  (method void main ()\n",
+        f"    (while (< i {lines})\n",
+        "      (begin\n",
+        '        (print "line " i)\n',
+        "        (set i (+ i 1))\n",
+        "      )\n",
+        "    )\n",
+        "  )\n",
+        ")\n",
+    ]
+
+
+def bench_output(args):
+    """
+    A printing loop's run time per output sink, writing to a line-buffered file as a terminal would be, and
+    comparing with expected output that matches and that is wrong from the first line
+    """
+    program = print_loop_program(args.lines)
+    expected = [f"line {i}" for i in range(args.lines)]
+    with open(os.devnull, "w", encoding="utf-8", buffering=1) as console:
+        sinks = {
+            "list": ListSink,
+            "list, capped at 100": lambda: ListSink(max_lines=100),
+            "list + console per line": lambda: TeeSink(ListSink(), BufferedStreamSink(console, block_lines=1)),
+            "list + console in blocks": lambda: TeeSink(ListSink(), BufferedStreamSink(console)),
+            "compare, matching": lambda: ComparingSink(expected),
+            "compare, wrong line 1": lambda: ComparingSink(["wrong"] + expected[1:]),
+        }
+        for name, make_sink in sinks.items():
+
+            def run(make_sink=make_sink):
+                interpreter = interpreterv3.Interpreter(False, None, False, output_sink=make_sink())
+                try:
+                    interpreter.run(program)
+                except OutputMismatch:
+                    pass
+                interpreter.flush_output()
+
+            elapsed = best_time(run, args.repeat)
+            peak = peak_bytes(run)
+            print(f"{name:26} {elapsed * 1000:8.1f} ms  {peak / 2**20:7.1f} MB peak")
+
+
+def bench_suite_load(args):
+    """Time to read every v1-v3 test case's files, one by one versus from a suite bundle built from them."""
+    tests = [test for version in ("1", "2", "3") for test in generate_test_suite(version)]
+    with tempfile.TemporaryDirectory() as directory:
+        path = os.path.join(directory, "suite.bundle")
+        files = build_bundle(path, ["v1", "v2", "v3"])
+        scaffolds = {
+            "files": lambda: TestScaffold(interpreterv3),
+            "bundle": lambda: TestScaffold(interpreterv3, bundle=SuiteBundle(path)),
+        }
+        print(f"{len(tests)} test cases, {files} files")
+        for name, make_scaffold in scaffolds.items():
+
+            def load(make_scaffold=make_scaffold):
+                scaffold = make_scaffold()
+                for test in tests:
+                    scaffold.setup(test)
+
+            print(f"{name:8} {best_time(load, args.repeat) * 1000:8.1f} ms")
+
+
+def parse_args():
+    """Parse the command line; each benchmark is a subcommand."""
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument("--repeat", type=int, default=5, help="runs per measurement")
+    benchmarks = parser.add_subparsers(dest="benchmark", required=True)
+    parser_bench = benchmarks.add_parser("parser", help="BParser.parse throughput")
+    parser_bench.add_argument("--classes", type=int, default=2000)
+    parser_bench.set_defaults(func=bench_parser)
+    memory_bench = benchmarks.add_parser("parse-memory", help="parse tree memory")
+    memory_bench.add_argument("--classes", type=int, default=2000)
+    memory_bench.set_defaults(func=bench_parse_memory)
+    stream_bench = benchmarks.add_parser("parse-stream", help="streaming parse peak memory")
+    stream_bench.add_argument("--classes", type=int, default=2000)
+    stream_bench.set_defaults(func=bench_parse_stream)
+    engines_bench = benchmarks.add_parser("engines", help="closure compiler vs bytecode VM")
+    engines_bench.add_argument(
+        "programs", nargs="*", help=".brewin files (default: everything under v2/ and v3/)"
+    )
+    engines_bench.add_argument("--top", type=int, default=5, help="slowest programs to list")
+    engines_bench.set_defaults(func=bench_engines)
+    workloads_bench = benchmarks.add_parser(
+        "engine-workloads", help="closure compiler vs bytecode VM on recursion and loops"
+    )
+    workloads_bench.add_argument("--fib", type=int, default=20)
+    workloads_bench.add_argument("--iterations", type=int, default=100000)
+    workloads_bench.set_defaults(func=bench_engine_workloads)
+    object_bench = benchmarks.add_parser("object-memory", help="per-object footprint of test_ll")
+    object_bench.add_argument("--nodes", type=int, default=5000)
+    object_bench.set_defaults(func=bench_object_memory)
+    hierarchy_bench = benchmarks.add_parser("deep-hierarchy", help="type checks and calls in deep hierarchies")
+    hierarchy_bench.add_argument("--depth", type=int, default=30)
+    hierarchy_bench.add_argument("--iterations", type=int, default=20000)
+    hierarchy_bench.set_defaults(func=bench_deep_hierarchy)
+    expression_bench = benchmarks.add_parser("expression-memory", help="Values allocated by expressions")
+    expression_bench.add_argument("--expressions", type=int, default=1000000)
+    expression_bench.set_defaults(func=bench_expression_memory)
+    output_bench = benchmarks.add_parser("output", help="output sinks for a program that prints in a loop")
+    output_bench.add_argument("--lines", type=int, default=100000)
+    output_bench.set_defaults(func=bench_output)
+    suite_bench = benchmarks.add_parser("suite-load", help="reading test files, one by one or bundled")
+    suite_bench.set_defaults(func=bench_suite_load)
+    return parser.parse_args()
+
+
+if __name__ == "__main__":
+    arguments = parse_args()
+    arguments.func(arguments)
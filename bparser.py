@@ -5,22 +5,48 @@ Provided module for parsing Brewin programs. When grading your project,
 we'll use our own copy; don't submit (or change) your own version!
 """
 
+import re
+
 
 class StringWithLineNumber(str):
     """
     Wrapper class for str that allows you to add a line number tag (line_num).
+
+    str subclasses can't use __slots__, so every token used to carry its own attribute dict,
+    which dominated a parse tree's memory. Instead, the parser passes line_dicts, a table it
+    keeps for one parse, and all tokens on a line of that parse share one dict from it (holding
+    line_num); setting an attribute gives the token a private copy first, so tokens never affect
+    each other. Without line_dicts, a token gets a dict of its own.
     """
 
     line_num = None
 
-    def __new__(cls, string, line_num):
+    def __new__(cls, string, line_num, line_dicts=None):
         instance = super().__new__(cls, string)
-        instance.line_num = line_num
+        line_dict = None
+        if line_dicts is not None:
+            try:
+                line_dict = line_dicts.get(line_num)
+                if line_dict is None:
+                    line_dict = line_dicts[line_num] = {"line_num": line_num}
+            except TypeError:  # unhashable line number; keep a private dict
+                pass
+        if line_dict is None:
+            line_dict = {"line_num": line_num}
+        object.__setattr__(instance, "__dict__", line_dict)
         return instance
 
+    def __setattr__(self, name, value):
+        private_dict = dict(self.__dict__)
+        private_dict[name] = value
+        object.__setattr__(self, "__dict__", private_dict)
+
     def __copy__(self):
         return StringWithLineNumber(self, self.line_num)
 
+    def __reduce__(self):
+        return StringWithLineNumber, (str(self), self.line_num)
+
     def __deepcopy__(self, _memo):
         return StringWithLineNumber(self, self.line_num)
 
@@ -37,8 +63,16 @@ class BParser:
     WHITESPACE_CHARS = " \t\r\n"
     DELIMETER_CHARS = WHITESPACE_CHARS + OPEN_PAREN_CHAR + CLOSE_PAREN_CHAR
 
+    # every lexical element on a line: a paren, a string literal, a lone quote (a string
+    # that isn't closed on its line), a comment marker, or a bare token. Whitespace matches
+    # nothing, so findall skips it.
+    TOKEN_REGEX = re.compile(r'[()]|"[^"]*"|"|#|[^ \t\r\n()"#]+')
+
+    # optional parse_cache.ParseCache; when set, identical sources are only parsed once
+    cache = None
+
     @staticmethod
-    def parse(lines):
+    def parse(lines, fast=True):
         """
         Maps a list of input strings containing only alphanumeric tokens, spaces, and parentheses
         to a tuple with two items:
@@ -59,11 +93,95 @@ class BParser:
                 [(1, 'this'), (1, 'is'), (1, 'too')]
             ]
         )
+
+        By default lines are split with a compiled tokenizer regex; fast=False selects the
+        original character-by-character scanner. Both produce identical trees and errors.
+        If BParser.cache is set, results are looked up there by a hash of the source first.
+        """
+        cache = BParser.cache
+        if cache is None:
+            return BParser.__parse_uncached(lines, fast)
+        key = cache.key(lines)
+        status, tree = cache.get(key) or cache.put(
+            key, BParser.__parse_uncached(lines, fast)
+        )
+        return status, cache.thaw(tree) if status else tree
+
+    @staticmethod
+    def __parse_uncached(lines, fast):
+        if fast:
+            return BParser.__parse_with_tokenizer(lines)
+        return BParser.__parse_by_char(lines)
+
+    @staticmethod
+    def parse_stream(lines):
+        """
+        Incremental version of BParser.parse for large sources: consumes any iterable of lines
+        (e.g., an open file) and yields (True, item) for each top-level item as soon as it is
+        complete, typically a (class ...) or (tclass ...) form, without holding the rest of
+        the program. On a syntax error it yields (False, message) with the same message parse
+        would return, and stops; items yielded before the error are not retracted.
         """
+        top = []  # completed top-level items that haven't been yielded yet
+        output_stack = [top]
+        current = top
+        tokenize = BParser.TOKEN_REGEX.findall
+        open_paren, close_paren = BParser.OPEN_PAREN_CHAR, BParser.CLOSE_PAREN_CHAR
+        comment, quote = BParser.COMMENT_CHAR, BParser.QUOTE_CHAR
+        line_dicts = {}  # this parse's own; see StringWithLineNumber
+        for line_no, line in enumerate(lines):
+            line_tokens = {}  # repeats of a token on a line share one object
+            for token in tokenize(line):
+                if token == open_paren:
+                    nested = []
+                    current.append(nested)
+                    output_stack.append(nested)
+                    current = nested
+                elif token == close_paren:
+                    if len(output_stack) < 2:
+                        yield False, "Extra closing parenthesis"
+                        return
+                    output_stack.pop()
+                    current = output_stack[-1]
+                    if current is top:
+                        for item in top:
+                            yield True, item
+                        top.clear()
+                elif token == comment:
+                    break
+                elif token == quote:
+                    yield False, "Unclosed string"
+                    return
+                else:
+                    token_and_line_num = line_tokens.get(token)
+                    if token_and_line_num is None:
+                        token_and_line_num = line_tokens[token] = StringWithLineNumber(
+                            token, line_no, line_dicts
+                        )
+                    current.append(token_and_line_num)
+            if current is top:
+                for item in top:
+                    yield True, item
+                top.clear()
+        if len(output_stack) > 1:
+            yield False, "Unclosed parenthesis"
+
+    @staticmethod
+    def __parse_with_tokenizer(lines):
+        output = []
+        for status, item in BParser.parse_stream(lines):
+            if not status:
+                return False, item
+            output.append(item)
+        return True, output
+
+    @staticmethod
+    def __parse_by_char(lines):
         cur_token = ""
         in_quote = False
         output = []
         output_stack = [output]
+        line_dicts = {}  # this parse's own; see StringWithLineNumber
         for line_no, line in enumerate(lines):
             line = BParser.__remove_comment(line)
             for char in line:
@@ -71,14 +189,16 @@ class BParser:
                     if not in_quote:
                         if cur_token:
                             token_and_line_num = StringWithLineNumber(
-                                cur_token, line_no
+                                cur_token, line_no, line_dicts
                             )
                             output_stack[-1].append(token_and_line_num)
                         cur_token = BParser.QUOTE_CHAR
                         in_quote = True
                     else:
                         cur_token += BParser.QUOTE_CHAR
-                        token_and_line_num = StringWithLineNumber(cur_token, line_no)
+                        token_and_line_num = StringWithLineNumber(
+                            cur_token, line_no, line_dicts
+                        )
                         output_stack[-1].append(token_and_line_num)
                         cur_token = ""
                         in_quote = False
@@ -89,7 +209,9 @@ class BParser:
 
                 if char in BParser.DELIMETER_CHARS:
                     if cur_token:
-                        token_and_line_num = StringWithLineNumber(cur_token, line_no)
+                        token_and_line_num = StringWithLineNumber(
+                            cur_token, line_no, line_dicts
+                        )
                         output_stack[-1].append(token_and_line_num)
                         cur_token = ""
                 if char == BParser.OPEN_PAREN_CHAR:
@@ -105,7 +227,9 @@ class BParser:
             if in_quote:
                 return False, "Unclosed string"
             if cur_token:
-                token_and_line_num = StringWithLineNumber(cur_token, line_no)
+                token_and_line_num = StringWithLineNumber(
+                    cur_token, line_no, line_dicts
+                )
                 output_stack[-1].append(token_and_line_num)
                 cur_token = ""
         if len(output_stack) > 1:
@@ -0,0 +1,596 @@
+"""
+Stack-based bytecode compiler and virtual machine for Brewin v2/v3 method bodies; the alternative to the closure
+compiler in objectv2, selected with interpreterv3.Interpreter(..., bytecode=True).
+
+A method body compiles to a flat list of (opcode, argument) instructions. Expressions push their Value on the
+operand stack; statements leave their outcome in the VM's status/return_value registers, exactly the
+(status_code, return_value) pair the closure engine's statements return, and the instructions that follow a
+statement inspect it the way its enclosing begin/let/while/try would. Method calls, object creation, variable
+assignment and error reporting go through the same ObjectDef and Interpreter methods the closure engine uses, so
+both engines report the same ErrorType and line number for every error.
+
+The VM is experimental; the closure compiler stays the default. Its calls are cheaper, so deep recursion runs
+about 1.5-2x faster on it, but its per-instruction dispatch makes statement-heavy loops slower, and on the
+v2/v3 test programs it is no faster overall (see benchmark.py engines and engine-workloads).
+tests/test_engines.py checks that both engines agree on every v2 and v3 program.
+"""
+
+from functools import partial
+
+from intbase import InterpreterBase, ErrorType
+from objectv2 import MethodScope, ObjectDef, let_variables
+from tracing import STATEMENTS
+from type_valuev2 import create_value
+from type_valuev2 import STRING_TYPE, Value, int_value, string_value
+
+# opcodes; the VM tests them roughly in order of how often they run
+LOAD_VARIABLE = 0  # local_slot, local_type: push a parameter or local
+LOAD_FIELD = 1  # field_slot, field_type: push a field
+CONST = 2  # value: push a constant
+BINARY = 3  # BinaryOperation: pop two operands, push the result
+BLOCK_CHECK = 4  # end: unpack the statement result; leave the block on return or exception
+SET = 5  # name, line_num, local_variable, field_slot: pop a value and assign it
+CALL_RESULT = 6  # -: pop a call's result as the outcome of a call statement
+IF_TEST = 7  # else_target, end_target, condition_source, line_num
+WHILE_TEST = 8  # exit_target, condition_source, line_num
+WHILE_CHECK = 9  # exit_target, loop_target
+JUMP = 10  # target
+CALL_ME = 11  # method_name, argc, line_num, class_def
+CALL_TARGET = 12  # end_target, line_num: check the object a call is made on
+CALL_OBJECT = 13  # method_name, argc, line_num
+RETURN_VALUE = 14  # return_type, line_num
+RESULT = 15  # (status, return_value): set the statement result
+LOAD_ME = 16  # -
+UNARY = 17  # bool_operation, line_num
+NEW = 18  # class_name, line_num
+PRINT_BEGIN = 19  # -
+PRINT_TERM = 20  # end_target
+PRINT_END = 21  # -
+LET_ENTER = 22  # var_defs, slots, line_num
+TRY_CHECK = 23  # end_target, exception_slot
+TRY_END = 24  # -
+THROW = 25  # -
+CHECK_SUPER = 26  # line_num, class_def
+CALL_SUPER = 27  # method_name, argc, line_num, superclass_def
+INPUT = 28  # statement source, get_string, line_num, local_variable, field_slot
+UNKNOWN_NAME = 29  # name, line_num
+UNKNOWN_STATEMENT = 30  # statement source
+MISSING = 31  # -: a statement or expression is missing a part
+TRACE = 32  # statement source
+HALT = 33  # -: end of the method
+
+
+# everything BINARY needs to evaluate one operator, resolved at compile time
+class BinaryOperation:
+    def __init__(self, obj, operator, line_num):
+        self.operator = operator
+        self.int_operation = obj.binary_ops[InterpreterBase.INT_DEF].get(operator)
+        self.string_operation = obj.binary_ops[InterpreterBase.STRING_DEF].get(operator)
+        self.bool_operation = obj.binary_ops[InterpreterBase.BOOL_DEF].get(operator)
+        self.class_operations = obj.binary_ops[InterpreterBase.CLASS_DEF]
+        self.incompatible_types_message = f"operator {operator} applied to two incompatible types"
+        self.line_num = line_num
+
+
+# compiles a method body for the VM; returns a callable with the same (obj, env) -> (status_code, return_value)
+# interface as the closure engine's compiled methods
+def compile_to_bytecode(obj, method_def):
+    compiler = BytecodeCompiler(obj, method_def)
+    code = compiler.assemble()
+    compiler.scope.set_frame_layout(method_def)
+    return partial(execute, code)
+
+
+class BytecodeCompiler:
+    # obj is an object of a class that has the method; it supplies the operator tables and trace setting, which
+    # are the same for every object
+    def __init__(self, obj, method_def):
+        self.obj = obj
+        self.method_def = method_def
+        self.scope = MethodScope(method_def)
+        self.code = []
+
+    def assemble(self):
+        self.__statement(self.method_def.code)
+        self.__emit(HALT)
+        return [tuple(instruction) for instruction in self.code]
+
+    # appends an instruction and returns its address, so jump targets can be patched in once known
+    def __emit(self, op, arg=None):
+        self.code.append([op, arg])
+        return len(self.code) - 1
+
+    def __here(self):
+        return len(self.code)
+
+    # fills in a jump target that was left as None: the whole argument, or item index of a list argument
+    def __patch(self, address, target, index=None):
+        if index is None:
+            self.code[address][1] = target
+        else:
+            self.code[address][1][index] = target
+
+    def __statement(self, code):
+        if self.obj.interpreter.tracer.enabled(STATEMENTS):
+            self.__emit(TRACE, code)
+        compiler = None
+        if type(code) is list and code and type(code[0]) is not list:
+            compiler = self.__statement_compilers().get(code[0])
+        if compiler is None:
+            self.__emit(UNKNOWN_STATEMENT, code)
+        else:
+            compiler(code)
+
+    def __statement_compilers(self):
+        return {
+            InterpreterBase.BEGIN_DEF: self.__begin,
+            InterpreterBase.SET_DEF: self.__set,
+            InterpreterBase.IF_DEF: self.__if,
+            InterpreterBase.CALL_DEF: self.__call_statement,
+            InterpreterBase.WHILE_DEF: self.__while,
+            InterpreterBase.RETURN_DEF: self.__return,
+            InterpreterBase.INPUT_STRING_DEF: self.__input,
+            InterpreterBase.INPUT_INT_DEF: self.__input,
+            InterpreterBase.PRINT_DEF: self.__print,
+            InterpreterBase.LET_DEF: self.__let,
+            InterpreterBase.THROW_DEF: self.__throw,
+            InterpreterBase.TRY_DEF: self.__try,
+        }
+
+    # the statement at code[index]; running it raises if it is missing, as indexing the source would
+    def __sub_statement(self, code, index):
+        if index >= len(code):
+            self.__emit(MISSING)
+        else:
+            self.__statement(code[index])
+
+    # the expression counterpart of __sub_statement
+    def __operand(self, code, index, line_num):
+        if index >= len(code):
+            self.__emit(MISSING)
+        else:
+            self.__expression(code[index], line_num)
+
+    # statements in order, leaving the block as soon as one returns or throws
+    def __block(self, statements):
+        if not statements:
+            self.__emit(RESULT, (ObjectDef.STATUS_PROCEED, None))
+            return
+        exits = []
+        for statement in statements:
+            self.__statement(statement)
+            exits.append(self.__emit(BLOCK_CHECK))
+        for address in exits:
+            self.__patch(address, self.__here())
+
+    # (begin (statement1) (statement2) ... (statementn))
+    def __begin(self, code):
+        self.__block(code[1:])
+
+    # (let ((type1 var1 defaultvalue1) ... (typen varn defaultvaluen)) (statement1) ... (statementn))
+    def __let(self, code):
+        if len(code) < 2:
+            self.__emit(MISSING)
+            return
+        slots = self.scope.block_nest(let_variables(code[1], self.obj.interpreter.type_manager))
+        self.__emit(LET_ENTER, (code[1], slots, code[0].line_num))
+        self.__block(code[2:])
+        self.scope.block_unnest()
+
+    # (set varname expression)
+    def __set(self, code):
+        line_num = code[0].line_num
+        self.__operand(code, 2, line_num)
+        var_name = code[1] if len(code) > 1 else None
+        local_variable = self.scope.local_variable(var_name)
+        field_slot = self.scope.field_slot(var_name)
+        self.__emit(SET, (var_name, line_num, local_variable, field_slot))
+
+    # (if expression (statement) (statement))
+    def __if(self, code):
+        line_num = code[0].line_num
+        self.__operand(code, 1, line_num)
+        condition_source = code[1] if len(code) > 1 else None
+        test = self.__emit(IF_TEST, [None, None, condition_source, line_num])
+        self.__sub_statement(code, 2)
+        skip_else = self.__emit(JUMP)
+        self.__patch(test, self.__here(), 0)
+        if len(code) == 4:
+            self.__statement(code[3])
+        else:
+            self.__emit(RESULT, (ObjectDef.STATUS_PROCEED, None))
+        self.__patch(test, self.__here(), 1)
+        self.__patch(skip_else, self.__here())
+
+    # (while expression (statement))
+    def __while(self, code):
+        line_num = code[0].line_num
+        loop = self.__here()
+        self.__operand(code, 1, line_num)
+        condition_source = code[1] if len(code) > 1 else None
+        test = self.__emit(WHILE_TEST, [None, condition_source, line_num])
+        self.__sub_statement(code, 2)
+        check = self.__emit(WHILE_CHECK, [None, loop])
+        self.__patch(test, self.__here(), 0)
+        self.__patch(check, self.__here(), 0)
+
+    # (return expression) or (return)
+    def __return(self, code):
+        if len(code) == 1:
+            self.__emit(RESULT, (ObjectDef.STATUS_RETURN, None))
+            return
+        line_num = code[0].line_num
+        self.__expression(code[1], line_num)
+        self.__emit(RETURN_VALUE, (self.method_def.return_type, line_num))
+
+    # (inputs target_variable) or (inputi target_variable)
+    def __input(self, code):
+        get_string = code[0] == InterpreterBase.INPUT_STRING_DEF
+        local_variable = self.scope.local_variable(code[1]) if len(code) > 1 else None
+        field_slot = self.scope.field_slot(code[1]) if len(code) > 1 else None
+        self.__emit(INPUT, (code, get_string, code[0].line_num, local_variable, field_slot))
+
+    # (print expression1 expression2 ...)
+    def __print(self, code):
+        line_num = code[0].line_num
+        self.__emit(PRINT_BEGIN)
+        terms = []
+        for expr in code[1:]:
+            self.__expression(expr, line_num)
+            terms.append(self.__emit(PRINT_TERM))
+        self.__emit(PRINT_END)
+        for address in terms:
+            self.__patch(address, self.__here())
+
+    # (throw expression)
+    def __throw(self, code):
+        self.__operand(code, 1, code[0].line_num)
+        self.__emit(THROW)
+
+    # (try (statement) (catch statement))
+    def __try(self, code):
+        if len(code) < 3:
+            self.__emit(MISSING)
+            return
+        self.__statement(code[1])
+        (exception_slot,) = self.scope.block_nest(
+            [(InterpreterBase.EXCEPTION_VARIABLE_DEF, STRING_TYPE)]
+        )
+        check = self.__emit(TRY_CHECK, [None, exception_slot])
+        self.__statement(code[2])
+        self.scope.block_unnest()
+        self.__emit(TRY_END)
+        self.__patch(check, self.__here(), 0)
+
+    # (call object_ref/me methodname param1 param2 param3) as a statement
+    def __call_statement(self, code):
+        self.__call(code, code[0].line_num)
+        self.__emit(CALL_RESULT)
+
+    def __expression(self, expr, line_num):
+        if type(expr) is not list:
+            self.__name(expr, line_num)
+            return
+        if not expr:
+            self.__emit(MISSING)
+            return
+        operator = expr[0]
+        if operator in self.obj.binary_op_list or operator in self.obj.unary_op_list:
+            value = self.obj.fold_constant(expr, self.scope)
+            if value is not None:
+                self.__emit(CONST, value)
+                return
+        if operator in self.obj.binary_op_list:
+            self.__operand(expr, 1, line_num)
+            self.__operand(expr, 2, line_num)
+            self.__emit(BINARY, BinaryOperation(self.obj, operator, line_num))
+        elif operator in self.obj.unary_op_list:
+            self.__operand(expr, 1, line_num)
+            bool_operation = self.obj.unary_ops[InterpreterBase.BOOL_DEF].get(operator)
+            self.__emit(UNARY, (bool_operation, line_num))
+        elif operator == InterpreterBase.CALL_DEF:
+            self.__call(expr, line_num)
+        elif operator == InterpreterBase.NEW_DEF:
+            if len(expr) < 2:
+                self.__emit(MISSING)
+            else:
+                self.__emit(NEW, (expr[1], line_num))
+        else:
+            self.__emit(CONST, None)
+
+    # a variable, field, constant or me; locals shadow member variables
+    def __name(self, name, line_num):
+        local_variable = self.scope.local_variable(name)
+        if local_variable is not None:
+            self.__emit(LOAD_VARIABLE, local_variable)
+            return
+        field_slot = self.scope.field_slot(name)
+        if field_slot is not None:
+            self.__emit(LOAD_FIELD, (field_slot, self.scope.class_def.slot_types[field_slot]))
+            return
+        try:
+            value = create_value(name)
+        except ValueError:
+            value = None
+        if value is not None:
+            self.__emit(CONST, value)  # values are never modified in place, so every evaluation can share one
+        elif name == InterpreterBase.ME_DEF:
+            self.__emit(LOAD_ME)
+        else:
+            self.__emit(UNKNOWN_NAME, (name, line_num))
+
+    # (call object_ref/me/super methodname p1 p2 p3)
+    def __call(self, code, line_num):
+        if len(code) < 2:
+            self.__emit(MISSING)
+            return
+        obj_name = code[1]
+        method_name = code[2] if len(code) > 2 else None
+        argc = len(code[3:])
+        if obj_name == InterpreterBase.ME_DEF:
+            self.__arguments(code, line_num)
+            self.__emit(CALL_ME, (method_name, argc, line_num, self.scope.class_def))
+        elif obj_name == InterpreterBase.SUPER_DEF:
+            class_def = self.scope.class_def
+            self.__emit(CHECK_SUPER, (line_num, class_def))
+            self.__arguments(code, line_num)
+            self.__emit(CALL_SUPER, (method_name, argc, line_num, class_def.get_superclass()))
+        else:
+            self.__expression(obj_name, line_num)
+            target_check = self.__emit(CALL_TARGET, [None, line_num])
+            self.__arguments(code, line_num)
+            self.__emit(CALL_OBJECT, (method_name, argc, line_num))
+            self.__patch(target_check, self.__here(), 0)
+
+    def __arguments(self, code, line_num):
+        for expr in code[3:]:
+            self.__expression(expr, line_num)
+        if len(code) < 3:
+            self.__emit(MISSING)  # the method name is read once the arguments are evaluated
+
+
+# runs a compiled method body on the object obj; returns (status_code, return_value) like the closure engine
+def execute(code, obj, env):
+    stack = []
+    status = ObjectDef.STATUS_PROCEED
+    return_value = None
+    pc = 0
+    while True:
+        op, arg = code[pc]
+        pc += 1
+        if op == LOAD_VARIABLE:
+            value = env[arg[0]]
+            stack.append(Value(arg[1], None) if value.is_null() else value)
+        elif op == LOAD_FIELD:
+            value = obj.slots[arg[0]]
+            stack.append(Value(arg[1], None) if value.is_null() else value)
+        elif op == CONST:
+            stack.append(arg)
+        elif op == BINARY:
+            operand2 = stack.pop()
+            operand1 = stack.pop()
+            if isinstance(operand1, tuple) or isinstance(operand2, tuple):
+                stack.append(operand1 if isinstance(operand1, tuple) else operand2)
+                continue
+            type1 = operand1.type()
+            type2 = operand2.type()
+            if type1 is type2:
+                if type1 is ObjectDef.INT_TYPE_CONST:
+                    if arg.int_operation is None:
+                        obj.interpreter.error(
+                            ErrorType.TYPE_ERROR, "invalid operator applied to ints", arg.line_num
+                        )
+                    stack.append(arg.int_operation(operand1, operand2))
+                    continue
+                if type1 is ObjectDef.STRING_TYPE_CONST:
+                    if arg.string_operation is None:
+                        obj.interpreter.error(
+                            ErrorType.TYPE_ERROR, "invalid operator applied to strings", arg.line_num
+                        )
+                    stack.append(arg.string_operation(operand1, operand2))
+                    continue
+                if type1 is ObjectDef.BOOL_TYPE_CONST:
+                    if arg.bool_operation is None:
+                        obj.interpreter.error(
+                            ErrorType.TYPE_ERROR, "invalid operator applied to bool", arg.line_num
+                        )
+                    stack.append(arg.bool_operation(operand1, operand2))
+                    continue
+            # handle object reference comparisons last
+            if obj.interpreter.check_type_compatibility(type1, type2, False):
+                stack.append(arg.class_operations[arg.operator](operand1, operand2))
+                continue
+            obj.interpreter.error(
+                ErrorType.TYPE_ERROR, arg.incompatible_types_message, arg.line_num
+            )
+        elif op == BLOCK_CHECK:
+            if isinstance(return_value, tuple):
+                status, return_value = return_value[0], return_value[1]
+            if status == ObjectDef.STATUS_RETURN or status == ObjectDef.STATUS_EXCEPTION:
+                pc = arg
+        elif op == SET:
+            val = stack.pop()
+            if isinstance(val, tuple):
+                status, return_value = val
+                continue
+            var_name, line_num, local_variable, field_slot = arg
+            # checks/reports type and name errors
+            obj.set_variable_aux(env, var_name, val, line_num, local_variable, field_slot)
+            status = ObjectDef.STATUS_PROCEED
+            return_value = None
+        elif op == CALL_RESULT:
+            status = ObjectDef.STATUS_PROCEED
+            return_value = stack.pop()
+        elif op == IF_TEST:
+            condition = stack.pop()
+            if isinstance(condition, tuple):
+                status, return_value = condition
+                pc = arg[1]
+            elif condition.type() is not ObjectDef.BOOL_TYPE_CONST:
+                obj.interpreter.error(
+                    ErrorType.TYPE_ERROR,
+                    "non-boolean if condition " + ' '.join(x for x in arg[2]),
+                    arg[3],
+                )
+            elif not condition.value():
+                pc = arg[0]
+        elif op == WHILE_TEST:
+            condition = stack.pop()
+            if isinstance(condition, tuple):
+                status, return_value = condition
+                pc = arg[0]
+            elif condition.type() is not ObjectDef.BOOL_TYPE_CONST:
+                obj.interpreter.error(
+                    ErrorType.TYPE_ERROR,
+                    "non-boolean while condition " + ' '.join(x for x in arg[1]),
+                    arg[2],
+                )
+            elif not condition.value():  # condition is false, exit loop immediately
+                status = ObjectDef.STATUS_PROCEED
+                return_value = None
+                pc = arg[0]
+        elif op == WHILE_CHECK:
+            if isinstance(return_value, tuple):
+                status, return_value = return_value[0], return_value[1]
+            if status == ObjectDef.STATUS_RETURN or status == ObjectDef.STATUS_EXCEPTION:
+                pc = arg[0]
+            else:
+                pc = arg[1]
+        elif op == JUMP:
+            pc = arg
+        elif op == CALL_ME:
+            method_name, argc, line_num, class_def = arg
+            actual_args = stack[len(stack) - argc:]
+            del stack[len(stack) - argc:]
+            stack.append(obj.call_method(method_name, actual_args, False, line_num, class_def))
+        elif op == CALL_TARGET:
+            obj_val = stack[-1]
+            if isinstance(obj_val, tuple):
+                pc = arg[0]  # the exception is the call's result
+            elif obj_val.is_null():
+                obj.interpreter.error(ErrorType.FAULT_ERROR, "null dereference", arg[1])
+        elif op == CALL_OBJECT:
+            method_name, argc, line_num = arg
+            actual_args = stack[len(stack) - argc:]
+            del stack[len(stack) - argc:]
+            target = stack.pop().value()
+            stack.append(target.call_method(method_name, actual_args, False, line_num))
+        elif op == RETURN_VALUE:
+            result = stack.pop()
+            if isinstance(result, tuple):
+                status, return_value = result
+                continue
+            return_type, line_num = arg
+            # CAREY FIX
+            if result.is_typeless_null():
+                obj.check_type_compatibility(return_type, result.type(), True, line_num)
+                result = Value(return_type, None)  # propagate return type to null
+            obj.check_type_compatibility(return_type, result.type(), True, line_num)
+            status = ObjectDef.STATUS_RETURN
+            return_value = result
+        elif op == RESULT:
+            status, return_value = arg
+        elif op == LOAD_ME:
+            stack.append(obj.get_me_as_value())
+        elif op == UNARY:
+            operand = stack.pop()
+            if isinstance(operand, tuple):
+                stack.append(operand)
+            elif operand.type() is ObjectDef.BOOL_TYPE_CONST:
+                if arg[0] is None:
+                    obj.interpreter.error(
+                        ErrorType.TYPE_ERROR, "invalid unary operator applied to bool", arg[1]
+                    )
+                stack.append(arg[0](operand))
+            else:
+                stack.append(None)
+        elif op == NEW:
+            class_name, line_num = arg
+            instance = obj.interpreter.instantiate(class_name, line_num)
+            stack.append(Value(obj.interpreter.type_manager.get_type(class_name), instance))
+        elif op == PRINT_BEGIN:
+            stack.append("")
+        elif op == PRINT_TERM:
+            term = stack.pop()
+            if isinstance(term, tuple):
+                stack.pop()  # the partial output is discarded
+                status, return_value = term
+                pc = arg
+                continue
+            val = term.value()
+            if term.type() is ObjectDef.BOOL_TYPE_CONST:
+                if val == True:
+                    val = "true"
+                else:
+                    val = "false"
+            stack[-1] += str(val)
+        elif op == PRINT_END:
+            obj.interpreter.output(stack.pop())
+            status = ObjectDef.STATUS_PROCEED
+            return_value = None
+        elif op == LET_ENTER:
+            obj.add_locals_to_env(env, *arg)
+        elif op == TRY_CHECK:
+            if isinstance(return_value, tuple):
+                status, return_value = return_value[0], return_value[1]
+            if status != ObjectDef.STATUS_EXCEPTION:
+                pc = arg[0]
+                continue
+            # the exception, currently held in return_value, is visible to the catch statement
+            env[arg[1]] = return_value
+        elif op == TRY_END:
+            if isinstance(return_value, tuple):
+                status, return_value = return_value[0], return_value[1]
+        elif op == THROW:
+            exception = stack.pop()
+            if isinstance(exception, tuple):
+                status, return_value = exception
+                continue
+            if exception.type() is not ObjectDef.STRING_TYPE_CONST:
+                obj.interpreter.error(ErrorType.TYPE_ERROR, "throw [string] allowed")
+            status = ObjectDef.STATUS_EXCEPTION
+            return_value = exception
+        elif op == CHECK_SUPER:
+            line_num, class_def = arg
+            if class_def.get_superclass() is None:
+                obj.interpreter.error(
+                    ErrorType.TYPE_ERROR,
+                    "invalid call to super object by class " + class_def.get_name(),
+                    line_num,
+                )
+        elif op == CALL_SUPER:
+            method_name, argc, line_num, superclass_def = arg
+            actual_args = stack[len(stack) - argc:]
+            del stack[len(stack) - argc:]
+            stack.append(
+                obj.call_method(method_name, actual_args, True, line_num, superclass_def)
+            )
+        elif op == INPUT:
+            code_of_statement, get_string, line_num, local_variable, field_slot = arg
+            inp = obj.interpreter.get_input()
+            if get_string:
+                val = string_value(inp)
+            else:
+                val = int_value(int(inp))
+            obj.set_variable_aux(
+                env, code_of_statement[1], val, line_num, local_variable, field_slot
+            )
+            status = ObjectDef.STATUS_PROCEED
+            return_value = None
+        elif op == UNKNOWN_NAME:
+            name, line_num = arg
+            create_value(name)  # re-raises for malformed numbers
+            obj.interpreter.error(
+                ErrorType.NAME_ERROR, "invalid field or parameter " + name, line_num
+            )
+        elif op == UNKNOWN_STATEMENT:
+            tok = arg[0]
+            obj.interpreter.error(
+                ErrorType.SYNTAX_ERROR, "unknown statement " + tok, tok.line_num
+            )
+        elif op == MISSING:
+            raise IndexError("list index out of range")
+        elif op == TRACE:
+            obj.interpreter.tracer.trace(STATEMENTS, "%s: %s", arg[0].line_num, arg)
+        elif op == HALT:
+            return status, return_value
@@ -1,9 +1,10 @@
 
 from intbase import InterpreterBase, ErrorType
-from type_valuev2 import Type, create_value, create_default_value
-import copy
+from type_valuev2 import NOTHING_TYPE, create_value, create_default_value
 
 class VariableDef:
+    __slots__ = ("type", "name", "value")
+
     # var_type is a Type() and value is a Value()
     def __init__(self, var_type, var_name, value=None):
         self.type = var_type
@@ -17,15 +18,23 @@ class VariableDef:
 # parses and holds the definition of a member method
 # [method return_type method_name [[type1 param1] [type2 param2] ...] [statement]]
 class MethodDef:
-    def __init__(self, method_source):
+    # class_def is the ClassDef of the class that defines the method
+    def __init__(self, method_source, class_def):
+        self.class_def = class_def
         self.line_num = method_source[0].line_num  # used for errors
         self.method_name = method_source[2]
+        type_manager = class_def.interpreter.type_manager
         if method_source[1] == InterpreterBase.VOID_DEF:
-            self.return_type = Type(InterpreterBase.NOTHING_DEF)
+            self.return_type = NOTHING_TYPE
         else:
-            self.return_type = Type(method_source[1])
-        self.formal_params = self.__parse_params(method_source[3])
+            self.return_type = type_manager.get_type(method_source[1])
+        self.formal_params = self.__parse_params(method_source[3], type_manager)
         self.code = method_source[4]
+        self.compiled = None  # code compiled by Interpreter.compile_method the first time the method runs
+        # the slot of each parameter in the method's environment, and the initial contents of the slots after them
+        # for its locals; set when it is compiled
+        self.param_slots = None
+        self.local_slots = None
 
     def get_method_name(self):
         return self.method_name
@@ -42,10 +51,10 @@ class MethodDef:
 
     # input params in the form of [[type1 param1] [type2 param2] ...]
     # output is a set of VariableDefs
-    def __parse_params(self, params):
+    def __parse_params(self, params, type_manager):
         formal_params = []
         for param in params:
-            var_def = VariableDef(Type(param[0]), param[1])
+            var_def = VariableDef(type_manager.get_type(param[0]), param[1])
             formal_params.append(var_def)
         return formal_params
 
@@ -53,26 +62,40 @@ class tClassDef:
     def __init__(self, code, interpreter):
         self.interpreter = interpreter
         self.code = code
+        # tuple of actual type names -> the template's source with them substituted for its type parameters
+        self.specializations = {}
     
     def code(self):
         return self.code
-    
+
+    # returns the source of the class the template becomes for actual_types, substituting them the first time
+    # it's asked for; Interpreter.run asks for every instantiation the program names before it runs
+    def specialize(self, actual_types):
+        key = tuple(actual_types)
+        code = self.specializations.get(key)
+        if code is None:
+            code = [InterpreterBase.CLASS_DEF] + self.code[1:]
+            field_replacements = dict(zip(code[2], actual_types))
+            code = replace_fields(code, field_replacements)
+            self.specializations[key] = code
+        return code
+
     def create_class_def_from_template(self,class_name,actual_types):
-        print(self.code)
-        print(actual_types)
-        code = copy.copy(self.code)
-        code[0] = InterpreterBase.CLASS_DEF
-        field_replacements = dict(zip(code[2], actual_types))
-        code = replace_fields(code, field_replacements)
+        code = list(self.specialize(actual_types))
         code.pop(2)
         code[1] = class_name
         self.interpreter.type_manager.add_class_type(class_name,None)
         self.interpreter.class_index[class_name] = ClassDef(code, self.interpreter) 
         
 
+# substitutes replacements in a template's source; parts of it with nothing to substitute, like most method
+# bodies, are returned as they are rather than copied
 def replace_fields(template, replacements):
     if isinstance(template, list):
-        return [replace_fields(item, replacements) for item in template]
+        replaced = [replace_fields(item, replacements) for item in template]
+        if all(new is old for new, old in zip(replaced, template)):
+            return template
+        return replaced
     elif isinstance(template, str):
         # Split and replace only if template is a string
         if '@' in template:
@@ -98,7 +121,11 @@ class ClassDef:
             self.__check_for_inheritance_and_set_superclass_info(class_source)
         )
         self.__create_field_list(class_source[fields_and_methods_start_index:])
+        self.__create_slot_layout()
         self.__create_method_list(class_source[fields_and_methods_start_index:])
+        # (method name, tuple of argument Types) -> the MethodDef a call on an object of this class resolves to, or
+        # None if there is no such method. Filled in by ObjectDef.call_method
+        self.resolved_methods = {}
 
     # get the classname
     def get_name(self):
@@ -163,14 +190,16 @@ class ClassDef:
 
         if len(field_def) == 3:
             #Default Field Values
-            type = Type(field_def[1])
+            type = self.interpreter.type_manager.get_type(field_def[1])
             value = create_default_value(type)
             var_def = VariableDef(
-                Type(field_def[1]), field_def[2], value
+                type, field_def[2], value
             )
         else:
             var_def = VariableDef(
-                Type(field_def[1]), field_def[2], create_value(field_def[3])
+                self.interpreter.type_manager.get_type(field_def[1]),
+                field_def[2],
+                create_value(field_def[3]),
             )
         if not self.interpreter.check_type_compatibility(
             var_def.type, var_def.value.type(), True
@@ -182,13 +211,28 @@ class ClassDef:
             )
         return var_def
 
+    # objects store the fields of their class and all its superclasses in one list of Values, superclass fields
+    # first, so each field has the same slot index in objects of every class that inherits it
+    def __create_slot_layout(self):
+        if self.super_class is None:
+            self.slot_types = []  # declared Type of each slot
+            self.slot_defaults = []  # initial Value of each slot
+        else:
+            self.slot_types = list(self.super_class.slot_types)
+            self.slot_defaults = list(self.super_class.slot_defaults)
+        self.field_slots = {}  # name -> slot index, for the fields this class declares itself
+        for var_def in self.fields:
+            self.field_slots[var_def.name] = len(self.slot_types)
+            self.slot_types.append(var_def.type)
+            self.slot_defaults.append(var_def.value)
+
     def __create_method_list(self, class_body):
         self.methods = []
         self.method_map = {}
         methods_defined_so_far = set()
         for member in class_body:
             if member[0] == InterpreterBase.METHOD_DEF:
-                method_def = MethodDef(member)
+                method_def = MethodDef(member, self)
                 if method_def.method_name in methods_defined_so_far:  # redefinition
                     self.interpreter.error(
                         ErrorType.NAME_ERROR,
@@ -205,7 +249,7 @@ class ClassDef:
     def __check_method_names_and_types(self, method_def):
         if not self.interpreter.is_valid_type(
             method_def.return_type.type_name
-        ) and method_def.return_type != Type(InterpreterBase.NOTHING_DEF): #checks that return type isn't a defined type or void
+        ) and method_def.return_type is not NOTHING_TYPE: #checks that return type isn't a defined type or void
             self.interpreter.error(
                 ErrorType.TYPE_ERROR,
                 "invalid return type for method " + method_def.method_name,
@@ -0,0 +1,326 @@
+"""
+Long-lived grading daemon. A pool of preforked workers, each with the harness, parser
+and test scaffold already imported, accepts (submission directory, version) jobs over a
+local Unix socket; per-submission latency no longer includes Python startup or our own
+imports, only the student's interpreter.
+
+Each job is graded in a process forked from its worker for that job alone, and its test
+cases in a worker process of that one (see harness.PoolWorker), killed if a case runs
+past its timeout. Whatever a submission does, from changing our modules to exiting or
+hanging, ends with its job; the daemon always replies.
+
+Start the daemon from the autograder directory (test suites are resolved relative to it):
+
+    python3 grader_daemon.py serve --workers 4
+
+and grade a submission with:
+
+    python3 grader_daemon.py submit path/to/submission 2
+"""
+
+import argparse
+import importlib
+import io
+import json
+import multiprocessing
+import os
+import signal
+import socket
+import sys
+import time
+from contextlib import contextmanager, redirect_stdout
+from os import environ
+
+# preloaded once in the parent and inherited by every forked worker; student modules are
+# imported per job and never outlive it. bparser/intbase are ours, so the preloaded copies
+# win over any a student ships.
+import bparser
+import intbase  # pylint: disable=unused-import
+from harness import POOL_GRACE, get_score, run_all_tests_in_pool, write_gradescope_output
+from parse_cache import ParseCache
+from suite_bundle import SuiteBundle
+from timeouts import load_timings, with_timeouts
+from tester import TestScaffold, generate_test_suite
+
+DEFAULT_SOCKET_PATH = "/tmp/brewin-grader.sock"
+# seconds a job may take beyond all its cases running to their timeouts
+JOB_SLACK = 30
+# seconds submit waits for a reply by default
+DEFAULT_WAIT = 600
+AUTOGRADER_DIR = os.path.dirname(os.path.abspath(__file__))
+
+
+@contextmanager
+def isolated_submission(submission_dir):
+    """
+    Make a submission's modules importable for the duration of a job. Every module imported
+    while it is active (interpreterv*, classv*, ...) is dropped from sys.modules afterwards,
+    so the next job starts from the preloaded state and can't see this student's code.
+    """
+    preloaded = set(sys.modules)
+    saved_path = sys.path
+    # the autograder's own directory may hold reference interpreters; never import from it
+    sys.path = [os.path.abspath(submission_dir)] + [
+        entry
+        for entry in saved_path
+        if entry and os.path.abspath(entry) != AUTOGRADER_DIR
+    ]
+    importlib.invalidate_caches()
+    try:
+        yield
+    finally:
+        sys.path = saved_path
+        for name in set(sys.modules) - preloaded:
+            del sys.modules[name]
+
+
+def grade_submission(
+    submission_dir, version, timeout_per_test=5, parse_cache=None, bundle=None, timings=None
+):
+    """
+    Run a version's suite against a submission; returns (results, log).
+    With timings (see timeouts.py), cases get adaptive timeouts capped at timeout_per_test.
+    """
+    log = io.StringIO()
+    with isolated_submission(submission_dir), redirect_stdout(log):
+        interpreter = importlib.import_module(f"interpreterv{version}")
+        scaffold = TestScaffold(interpreter, parse_cache, bundle)
+        tests = generate_test_suite(version)
+        if timings:
+            tests = with_timeouts(tests, timings, cap=timeout_per_test)
+        results = run_all_tests_in_pool(scaffold, tests, timeout_per_test)
+    return results, log.getvalue()
+
+
+def handle_job(request, parse_cache=None, bundle=None, timings=None):
+    """Decode one job request and grade it; returns the response object, even if the submission exits."""
+    try:
+        results, log = grade_submission(
+            request["submission"],
+            str(request["version"]),
+            request.get("timeout", 5),
+            parse_cache,
+            bundle,
+            timings,
+        )
+    except BaseException as exception:  # pylint: disable=broad-except
+        return {"error": f"{type(exception).__name__}: {exception}"}
+    return {"results": results, "log": log}
+
+
+def job_deadline(request):
+    """Seconds a job may take: every case running until its worker is killed, and then some."""
+    cases = len(generate_test_suite(str(request["version"])))
+    return cases * (request.get("timeout", 5) + POOL_GRACE) + JOB_SLACK
+
+
+def _job_main(request, parse_cache, bundle, timings, connection):
+    """Entry point of a job's process; sends the response back over the pipe."""
+    connection.send(handle_job(request, parse_cache, bundle, timings))
+    connection.close()
+
+
+def run_job(request, parse_cache=None, bundle=None, timings=None):
+    """
+    Grade a job in a process forked for it, so nothing the submission changes outlives
+    the job; returns the response object. A process that exits without a response, or
+    hasn't sent one by its job_deadline, is killed and the response is an error.
+    """
+    deadline = job_deadline(request)
+    context = multiprocessing.get_context("fork")
+    receiver, sender = context.Pipe(duplex=False)
+    # not a daemon, since it starts the PoolWorkers that run the cases
+    process = context.Process(
+        target=_job_main, args=(request, parse_cache, bundle, timings, sender)
+    )
+    process.start()
+    sender.close()
+    try:
+        if not receiver.poll(deadline):
+            return {"error": f"job did not finish within {deadline:.0f}s"}
+        return receiver.recv()
+    except EOFError:
+        return {"error": "grading process exited without a response"}
+    finally:
+        receiver.close()
+        process.join(POOL_GRACE)
+        if process.is_alive():
+            process.kill()
+            process.join()
+
+
+def warm_parse_cache(parse_cache, bundle=None):
+    """
+    Parse every suite program into parse_cache before workers fork, since programs
+    parsed by a job's process are forgotten with it.
+    """
+    bparser.BParser.cache = parse_cache
+    scaffold = TestScaffold(None, parse_cache, bundle)
+    for version in ("1", "2", "3"):
+        for test in generate_test_suite(version):
+            try:
+                bparser.BParser.parse(scaffold.read_lines(test["srcfile"], keepends=True))
+            except OSError:
+                pass
+
+
+def worker_loop(listener, max_jobs, parse_cache, bundle, timings):
+    """
+    Accept jobs and grade each in its own process (see run_job) until max_jobs have been
+    served, then exit for a fresh worker.
+    """
+    signal.signal(signal.SIGINT, signal.SIG_IGN)  # the parent shuts workers down
+    signal.signal(signal.SIGTERM, signal.SIG_DFL)  # ... with SIGTERM, which serve handles itself
+    for _ in range(max_jobs):
+        connection, _ = listener.accept()
+        with connection, connection.makefile("rwb") as stream:
+            line = stream.readline()
+            if not line:
+                continue
+            try:
+                response = run_job(json.loads(line), parse_cache, bundle, timings)
+            except (ValueError, KeyError, TypeError) as exception:
+                response = {"error": f"malformed job: {exception}"}
+            except Exception as exception:  # pylint: disable=broad-except
+                response = {"error": f"{type(exception).__name__}: {exception}"}
+            stream.write(json.dumps(response).encode("utf-8") + b"\n")
+            stream.flush()
+
+
+def serve(
+    socket_path=DEFAULT_SOCKET_PATH,
+    workers=4,
+    max_jobs=100,
+    cache_dir=None,
+    bundle_path=None,
+    timings_path=None,
+):
+    """
+    Listen on socket_path and keep `workers` preforked workers accepting jobs; a worker
+    that exits (after max_jobs jobs, or because a submission crashed it) is replaced.
+    Every worker keeps a parse cache across jobs, persisted in cache_dir if given.
+    With bundle_path, test files are read from that suite bundle, mapped once here and
+    shared by every worker. With timings_path, a timings file recorded by
+    `tester.py --calibrate`, cases get adaptive timeouts.
+    """
+    parse_cache = ParseCache.shared(cache_dir)
+    bundle = SuiteBundle.shared(bundle_path) if bundle_path else None
+    timings = load_timings(timings_path) if timings_path else None
+    warm_parse_cache(parse_cache, bundle)
+    # stop on SIGTERM as on Ctrl-C, so the workers are shut down and the socket removed
+    signal.signal(signal.SIGTERM, signal.default_int_handler)
+    if os.path.exists(socket_path):
+        os.unlink(socket_path)
+    listener = socket.socket(socket.AF_UNIX, socket.SOCK_STREAM)
+    listener.bind(socket_path)
+    listener.listen()
+    context = multiprocessing.get_context("fork")
+    pool = []
+    try:
+        while True:
+            pool = [process for process in pool if process.is_alive()]
+            while len(pool) < workers:
+                process = context.Process(
+                    target=worker_loop,
+                    args=(listener, max_jobs, parse_cache, bundle, timings),
+                    # not a daemon, since it starts a process for every job
+                    daemon=False,
+                )
+                process.start()
+                pool.append(process)
+            time.sleep(0.1)
+    except KeyboardInterrupt:
+        pass
+    finally:
+        for process in pool:
+            process.terminate()
+        for process in pool:
+            process.join()
+        listener.close()
+        if os.path.exists(socket_path):
+            os.unlink(socket_path)
+
+
+def submit(
+    submission_dir, version, socket_path=DEFAULT_SOCKET_PATH, timeout=5, wait=DEFAULT_WAIT
+):
+    """Send a job to a running daemon and wait up to `wait` seconds for its response object."""
+    request = {
+        "submission": os.path.abspath(submission_dir),
+        "version": version,
+        "timeout": timeout,
+    }
+    with socket.socket(socket.AF_UNIX, socket.SOCK_STREAM) as client:
+        client.settimeout(wait)
+        client.connect(socket_path)
+        with client.makefile("rwb") as stream:
+            stream.write(json.dumps(request).encode("utf-8") + b"\n")
+            stream.flush()
+            try:
+                line = stream.readline()
+            except TimeoutError as exception:
+                raise RuntimeError(f"no response from the daemon within {wait}s") from exception
+    if not line:
+        raise RuntimeError("the daemon closed the connection without a response")
+    return json.loads(line)
+
+
+def parse_args(argv):
+    """Parse the command line for the serve and submit subcommands."""
+    parser = argparse.ArgumentParser(description="Preforked Brewin grading daemon")
+    parser.add_argument("--socket", default=DEFAULT_SOCKET_PATH, help="Unix socket path")
+    commands = parser.add_subparsers(dest="command", required=True)
+    serve_parser = commands.add_parser("serve", help="start the daemon")
+    serve_parser.add_argument("--workers", type=int, default=4)
+    serve_parser.add_argument(
+        "--max-jobs", type=int, default=100, help="jobs a worker serves before being replaced"
+    )
+    serve_parser.add_argument(
+        "--parse-cache", metavar="DIR", help="also persist parse trees in DIR across restarts"
+    )
+    serve_parser.add_argument(
+        "--bundle", metavar="FILE", help="read test files from a suite bundle built with suite_bundle.py"
+    )
+    serve_parser.add_argument(
+        "--timings",
+        metavar="FILE",
+        help="time out each case relative to the reference times recorded by tester.py --calibrate",
+    )
+    submit_parser = commands.add_parser("submit", help="grade a submission")
+    submit_parser.add_argument("submission", help="directory holding interpreterv*.py")
+    submit_parser.add_argument("version", help="project version to test (1, 2 or 3)")
+    submit_parser.add_argument("--timeout", type=float, default=5)
+    submit_parser.add_argument(
+        "--wait",
+        type=float,
+        default=DEFAULT_WAIT,
+        help=f"seconds to wait for the result (default: {DEFAULT_WAIT})",
+    )
+    return parser.parse_args(argv)
+
+
+def main():
+    """main entrypoint: serve jobs, or submit one and report it like tester.py does"""
+    args = parse_args(sys.argv[1:])
+    if args.command == "serve":
+        serve(
+            args.socket,
+            args.workers,
+            args.max_jobs,
+            args.parse_cache,
+            args.bundle,
+            args.timings,
+        )
+        return
+    response = submit(args.submission, args.version, args.socket, args.timeout, args.wait)
+    if "error" in response:
+        raise RuntimeError(response["error"])
+    results = response["results"]
+    print(response["log"], end="")
+    total_score = get_score(results) / len(results) * 100.0
+    print(f"Total Score: {total_score:9.2f}%")
+    write_gradescope_output(results, environ.get("PROD", False))
+
+
+if __name__ == "__main__":
+    main()
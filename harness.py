@@ -4,11 +4,26 @@ test management.
 """
 
 import asyncio
+import io
 import json
+import multiprocessing
+import math
+import signal
+import sys
+import time
+import traceback
+import tracemalloc
+from contextlib import contextmanager, redirect_stderr, redirect_stdout
+import os
 from os import makedirs
 from os.path import exists
 from abc import ABC, abstractmethod
 
+try:
+    import resource
+except ImportError:  # not available on Windows
+    resource = None
+
 
 class AbstractTestScaffold(ABC):
     """ABC for test scaffold"""
@@ -21,58 +36,547 @@ class AbstractTestScaffold(ABC):
     def run_test_case(self, test_case, environment):
         """Run the test case end-to-end; return a number encoding the points allocated."""
 
+    def case_metrics(self, environment):
+        """Measurements of a test case's run (after run_test_case) to add to its metrics."""
+        return {}
+
+
+# per-case metrics, in the order they are reported: seconds, seconds, bytes, statements
+METRICS = ("wall_time", "cpu_time", "peak_memory", "statements")
+
 
-def run_test(scaffold, test_case):
-    """Ran a single test case with the scaffold; returns score."""
+@contextmanager
+def measure(metrics, trace_memory=False):
+    """
+    Record the wall_time and cpu_time (of the calling thread) of the body in metrics, and with
+    trace_memory its peak_memory: the most bytes tracemalloc saw allocated at once beyond what
+    was allocated when it started. They are recorded even if the body is interrupted.
+    tracemalloc is started the first time and left running, since it only counts allocations
+    made while it runs.
+    """
+    if trace_memory:
+        if not tracemalloc.is_tracing():
+            tracemalloc.start()
+        tracemalloc.reset_peak()
+        baseline, _ = tracemalloc.get_traced_memory()
+    wall_start, cpu_start = time.perf_counter(), time.thread_time()
+    try:
+        yield
+    finally:
+        metrics["wall_time"] = time.perf_counter() - wall_start
+        metrics["cpu_time"] = time.thread_time() - cpu_start
+        if trace_memory:
+            metrics["peak_memory"] = tracemalloc.get_traced_memory()[1] - baseline
+
+
+def run_test(scaffold, test_case, metrics=None, trace_memory=False):
+    """
+    Ran a single test case with the scaffold; returns score.
+    With a metrics dict, the case is measured into it (see measure) along with the
+    scaffold's case_metrics.
+    """
     environment = scaffold.setup(test_case)
+    if metrics is None:
+        metrics = {}
     try:
-        return scaffold.run_test_case(test_case, environment)
+        with measure(metrics, trace_memory):
+            return scaffold.run_test_case(test_case, environment)
     except Exception as exception:  # pylint: disable=broad-except
         print(f"Exception during test: {exception}")
         return 0
+    finally:
+        metrics.update(scaffold.case_metrics(environment))
 
 
-async def run_test_wrapper(interpreter, test_case, timeout):
+async def run_test_wrapper(interpreter, test_case, timeout, trace_memory=False):
     """
-    Wrapper for run_test with timeout and minor debugging.
+    Wrapper for run_test with timeout and minor debugging; returns (score, metrics).
     Uses asyncio to enforce timeout, not for concurrency.
     """
     print(f'Running {test_case["srcfile"]}... ', end="")
+    metrics = {}
+    started = time.perf_counter()
     try:
         async with asyncio.timeout(timeout):
-            result = await asyncio.to_thread(run_test, interpreter, test_case)
+            result = await asyncio.to_thread(
+                run_test, interpreter, test_case, metrics, trace_memory
+            )
             print(f' {"PASSED" if result else "FAILED"}')
-            return result
+            return result, metrics
     except asyncio.TimeoutError:
         print("TIMED OUT")
-        return 0
+        # the abandoned thread may still be running, and writing to metrics
+        return 0, {"wall_time": time.perf_counter() - started, "timed_out": True}
+
+
+class TestTimeoutError(BaseException):
+    """
+    Raised inside a pool worker when a test case runs past its timeout.
+    Derives from BaseException so `except Exception` blocks in run_test (or in
+    the interpreter under test) can't swallow it.
+    """
+
+
+# seconds between repeated timeout alarms, for code under test that swallows one
+ALARM_INTERVAL = 0.1
+
+# how long past a case's timeout a pool worker may take to report before it is killed
+POOL_GRACE = 1.0
+
+
+@contextmanager
+def alarm_timeout(timeout):
+    """
+    Raise TestTimeoutError in the body (which must run in the main thread) once timeout
+    seconds have passed, and every ALARM_INTERVAL after that, so code that swallows one
+    alarm with a bare `except:` is still interrupted; code that swallows every one is
+    only stopped by killing its process (see run_tests_in_pool). Does nothing if timeout
+    is None or the platform has no interval timer.
+    """
+    if timeout is None or not hasattr(signal, "setitimer"):
+        yield
+        return
+    armed = [True]
+
+    def expire(_signum, _frame):
+        if armed[0]:
+            raise TestTimeoutError()
+
+    previous_handler = signal.signal(signal.SIGALRM, expire)
+    signal.setitimer(signal.ITIMER_REAL, timeout, ALARM_INTERVAL)
+    try:
+        yield
+    finally:
+        # an alarm can still go off on the way out; once disarmed, any later one does nothing
+        while True:
+            try:
+                armed[0] = False
+                break
+            except TestTimeoutError:
+                pass
+        signal.setitimer(signal.ITIMER_REAL, 0)
+        signal.signal(signal.SIGALRM, previous_handler)
+
+
+def print_buffered_result(test_case, score, timed_out, output, usage=""):
+    """Replay a buffered test case's log in the same shape run_test_wrapper prints it."""
+    print(f'Running {test_case["srcfile"]}... ', end="")
+    print(output, end="")
+    suffix = f" {usage}" if usage else ""
+    if timed_out:
+        print(f"TIMED OUT{suffix}")
+    else:
+        print(f' {"PASSED" if score else "FAILED"}{suffix}')
+
+
+def run_test_buffered(scaffold, test_case, timeout, trace_memory=False):
+    """
+    Run a single test case inside a pool worker, capturing everything it prints.
+    Returns (score, timed_out, output, metrics).
+
+    The timeout is enforced with alarm_timeout, which interrupts runaway Brewin loops
+    so the worker is free for the next case.
+    """
+    buffer = io.StringIO()
+    metrics = {}
+    try:
+        # the alarm is innermost, so it is disarmed before output is restored
+        with redirect_stdout(buffer), redirect_stderr(buffer), alarm_timeout(timeout):
+            score = run_test(scaffold, test_case, metrics, trace_memory)
+        return score, False, buffer.getvalue(), metrics
+    except TestTimeoutError:
+        return 0, True, buffer.getvalue(), metrics
+
+
+def _pool_worker_main(scaffold, connection, trace_memory):
+    """Entry point of a pool worker: runs the (test case, timeout) pairs it is sent until the pipe closes."""
+    while True:
+        try:
+            test_case, timeout = connection.recv()
+        except EOFError:
+            return
+        connection.send(run_test_buffered(scaffold, test_case, timeout, trace_memory))
+
+
+class PoolWorker:
+    """
+    A worker process that runs test cases sent to it, one at a time. If it hasn't
+    reported POOL_GRACE seconds after a case's timeout (the code under test swallowed
+    the alarm) or it dies (the code under test exited), it is killed and replaced.
+    """
+
+    def __init__(self, scaffold, trace_memory=False):
+        self.scaffold = scaffold
+        self.trace_memory = trace_memory
+        self.__start()
+
+    def __start(self):
+        self.connection, child = multiprocessing.Pipe()
+        self.process = multiprocessing.Process(
+            target=_pool_worker_main,
+            args=(self.scaffold, child, self.trace_memory),
+            daemon=True,
+        )
+        self.process.start()
+        child.close()
+
+    def run(self, test_case, timeout):
+        """
+        Run a test case; returns (score, timed_out, output, metrics), like run_test_buffered.
+        Blocks until the case is done, so call it from a thread.
+        """
+        started = time.perf_counter()
+        self.connection.send((test_case, timeout))
+        try:
+            if self.connection.poll(None if timeout is None else timeout + POOL_GRACE):
+                return self.connection.recv()
+            timed_out, output = True, ""
+        except EOFError:
+            timed_out, output = False, "\nTest process exited unexpectedly\n"
+        self.process.kill()
+        self.close()
+        self.__start()
+        return 0, timed_out, output, {"wall_time": time.perf_counter() - started}
+
+    def close(self):
+        """Shut the worker down; it exits once it sees its pipe close."""
+        self.connection.close()
+        self.process.join(POOL_GRACE)
+        if self.process.is_alive():
+            self.process.kill()
+            self.process.join()
+
+
+async def run_tests_in_pool(scaffold, tests, timeout, workers, trace_memory=False):
+    """
+    Fan test cases out across a pool of PoolWorkers; returns (score, metrics) pairs in
+    test order. Each case's output is buffered in its worker and replayed here in order,
+    so the log reads exactly as it would for a sequential run.
+    """
+    pool = [PoolWorker(scaffold, trace_memory) for _ in range(max(workers, 1))]
+    idle = asyncio.Queue()
+    for worker in pool:
+        idle.put_nowait(worker)
 
+    async def run_one(test):
+        worker = await idle.get()
+        try:
+            return await asyncio.to_thread(worker.run, test, test.get("timeout", timeout))
+        finally:
+            idle.put_nowait(worker)
 
-async def run_all_tests(interpreter, tests, timeout_per_test=5):
+    try:
+        pending = [asyncio.ensure_future(run_one(test)) for test in tests]
+        outcomes = []
+        for test, future in zip(tests, pending):
+            score, timed_out, output, metrics = await future
+            print_buffered_result(test, score, timed_out, output)
+            if timed_out:
+                metrics["timed_out"] = True
+            outcomes.append((score, metrics))
+    finally:
+        for worker in pool:
+            worker.close()
+    return outcomes
+
+
+def run_tests_inline(scaffold, tests, timeout, trace_memory=False):
+    """
+    Run test cases one after another in the calling (main) thread, with the same
+    alarm timeouts as pool workers; returns (score, metrics) pairs in test order.
+    Nothing stops a case that swallows every alarm, so only use this for code that
+    can be trusted not to, or in a process someone else watches and kills.
     """
-    Run all tests sequentially; defaults to 5s timeout per test.
+    outcomes = []
+    for test in tests:
+        score, timed_out, output, metrics = run_test_buffered(
+            scaffold, test, test.get("timeout", timeout), trace_memory
+        )
+        print_buffered_result(test, score, timed_out, output)
+        if timed_out:
+            metrics["timed_out"] = True
+        outcomes.append((score, metrics))
+    return outcomes
+
+
+def _own_resource_usage():
+    """Return (cpu_time, peak_rss) for the calling process; seconds and bytes."""
+    if resource is None:
+        return None, None
+    usage = resource.getrusage(resource.RUSAGE_SELF)
+    # ru_maxrss is in kilobytes on Linux, but already in bytes on macOS
+    scale = 1 if sys.platform == "darwin" else 1024
+    return usage.ru_utime + usage.ru_stime, usage.ru_maxrss * scale
+
+
+def _sampled_resource_usage(pid):
+    """
+    Return (cpu_time, peak_rss) for a still-running process, read from /proc;
+    (None, None) if the platform doesn't expose it.
+    """
+    try:
+        with open(f"/proc/{pid}/stat", encoding="utf-8") as handle:
+            # the command name may contain spaces, so split after its closing paren
+            fields = handle.read().rsplit(")", 1)[1].split()
+        with open(f"/proc/{pid}/status", encoding="utf-8") as handle:
+            status = dict(line.split(":", 1) for line in handle if ":" in line)
+    except OSError:
+        return None, None
+    ticks_per_second = os.sysconf("SC_CLK_TCK")
+    # utime and stime are fields 14 and 15 of /proc/<pid>/stat (fields[11:13] here)
+    cpu_time = (int(fields[11]) + int(fields[12])) / ticks_per_second
+    peak_rss = int(status["VmHWM"].split()[0]) * 1024 if "VmHWM" in status else None
+    return cpu_time, peak_rss
+
+
+def _run_test_in_child(scaffold, test_case, connection, trace_memory):
+    """Entry point of an isolated test process; sends its outcome back over the pipe."""
+    buffer = io.StringIO()
+    metrics = {}
+    with redirect_stdout(buffer), redirect_stderr(buffer):
+        try:
+            score = run_test(scaffold, test_case, metrics, trace_memory)
+        except Exception:  # pylint: disable=broad-except
+            traceback.print_exc()
+            score = 0
+    cpu_time, peak_rss = _own_resource_usage()
+    connection.send((score, buffer.getvalue(), cpu_time, peak_rss, metrics))
+    connection.close()
+
+
+def run_test_in_subprocess(scaffold, test_case, timeout, trace_memory=False):
+    """
+    Run a single test case in its own process and kill it if it runs past the timeout,
+    so a runaway submission can't keep burning a core after it has been abandoned.
+    Returns a dict with score, timed_out, output, cpu_time (s) and peak_rss (bytes) of
+    the whole process, and the case's metrics (see run_test); the usage figures are None
+    where the platform can't report them.
+    """
+    receiver, sender = multiprocessing.Pipe(duplex=False)
+    process = multiprocessing.Process(
+        target=_run_test_in_child,
+        args=(scaffold, test_case, sender, trace_memory),
+        daemon=True,
+    )
+    started = time.perf_counter()
+    process.start()
+    sender.close()
+    outcome = {"score": 0, "timed_out": False, "output": "", "metrics": {}}
+    if receiver.poll(timeout):
+        try:
+            score, output, cpu_time, peak_rss, metrics = receiver.recv()
+            outcome.update(score=score, output=output, metrics=metrics)
+        except EOFError:  # the child died without reporting back
+            cpu_time, peak_rss = None, None
+            outcome["output"] = "\nTest process exited unexpectedly\n"
+    else:
+        cpu_time, peak_rss = _sampled_resource_usage(process.pid)
+        outcome["timed_out"] = True
+        outcome["metrics"] = {
+            "wall_time": time.perf_counter() - started,
+            "cpu_time": cpu_time,
+            "timed_out": True,
+        }
+        process.kill()
+    process.join()
+    receiver.close()
+    outcome.update(cpu_time=cpu_time, peak_rss=peak_rss)
+    return outcome
+
+
+def format_resource_usage(outcome):
+    """Short human-readable summary of an isolated case's CPU time and peak RSS."""
+    cpu_time, peak_rss = outcome["cpu_time"], outcome["peak_rss"]
+    cpu = "?" if cpu_time is None else f"{cpu_time:.2f}s"
+    rss = "?" if peak_rss is None else f"{peak_rss / (1024 * 1024):.1f}MB"
+    return f"(cpu {cpu}, peak rss {rss})"
+
+
+async def run_tests_in_subprocesses(scaffold, tests, timeout, workers, trace_memory=False):
+    """
+    Run each test case in its own killable process, at most `workers` at a time;
+    returns (score, metrics) pairs in test order. Logs are replayed in order, as with
+    the pool.
+    """
+    semaphore = asyncio.Semaphore(max(workers, 1))
+
+    async def run_one(test):
+        async with semaphore:
+            return await asyncio.to_thread(
+                run_test_in_subprocess,
+                scaffold,
+                test,
+                test.get("timeout", timeout),
+                trace_memory,
+            )
+
+    pending = [asyncio.ensure_future(run_one(test)) for test in tests]
+    outcomes = []
+    for test, future in zip(tests, pending):
+        outcome = await future
+        print_buffered_result(
+            test,
+            outcome["score"],
+            outcome["timed_out"],
+            outcome["output"],
+            format_resource_usage(outcome),
+        )
+        outcomes.append((outcome["score"], outcome["metrics"]))
+    return outcomes
+
+
+async def run_all_tests(
+    interpreter,
+    tests,
+    timeout_per_test=5,
+    workers=1,
+    isolate=False,
+    trace_memory=False,
+    print_metrics=False,
+):
+    """
+    Run all tests; defaults to 5s timeout per test, unless a test case has its own
+    "timeout" (see timeouts.py). With isolate, every case runs in its own process that is killed on timeout, up to
+    `workers` at once. Otherwise, with workers > 1, cases run concurrently in a process
+    pool; with neither, they run sequentially in this process.
+    Every case's wall and CPU time are measured, and with trace_memory its peak memory
+    (see measure); tracing memory slows the interpreter down. With print_metrics, the
+    tally is followed by a summary of the metrics.
+    The scaffold must be picklable for the pool.
     Each test case *must* have a name and srcfile key.
     """
     print(f"Running {len(tests)} tests...")
+    if isolate:
+        outcomes = await run_tests_in_subprocesses(
+            interpreter, tests, timeout_per_test, workers, trace_memory
+        )
+    elif workers > 1:
+        outcomes = await run_tests_in_pool(
+            interpreter, tests, timeout_per_test, workers, trace_memory
+        )
+    else:
+        outcomes = [
+            await run_test_wrapper(
+                interpreter, test, test.get("timeout", timeout_per_test), trace_memory
+            )
+            for test in tests
+        ]
+    return summarize_results(tests, outcomes, print_metrics)
+
+
+def run_all_tests_in_pool(
+    scaffold, tests, timeout_per_test=5, workers=1, trace_memory=False, print_metrics=False
+):
+    """
+    Synchronous counterpart of run_all_tests that runs cases in PoolWorkers (see
+    run_tests_in_pool) even with a single worker, so every case can be killed.
+    """
+    print(f"Running {len(tests)} tests...")
+    return summarize_results(
+        tests,
+        asyncio.run(
+            run_tests_in_pool(scaffold, tests, timeout_per_test, workers, trace_memory)
+        ),
+        print_metrics,
+    )
+
+
+def run_all_tests_inline(
+    scaffold, tests, timeout_per_test=5, trace_memory=False, print_metrics=False
+):
+    """
+    Synchronous counterpart of run_all_tests that runs every case in the calling
+    thread (see run_tests_inline); must be called from the main thread.
+    """
+    print(f"Running {len(tests)} tests...")
+    return summarize_results(
+        tests,
+        run_tests_inline(scaffold, tests, timeout_per_test, trace_memory),
+        print_metrics,
+    )
+
+
+def summarize_results(tests, outcomes, print_metrics=False):
+    """
+    Pair each test case with its score in Gradescope's format, its metrics in
+    extra_data (along with "timed_out": True if it timed out), and print the tally
+    and, with print_metrics, a summary of the metrics.
+    """
     results = [
         {
             "name": test["name"],
-            "score": await run_test_wrapper(interpreter, test, timeout_per_test),
+            "score": score,
             "max_score": 1,
             "visibility": "visible"
             if test.get("visible", False)
             else "after_published",
+            "extra_data": {
+                metric: metrics[metric] for metric in METRICS if metric in metrics
+            },
         }
-        for test in tests
+        for test, (score, metrics) in zip(tests, outcomes)
     ]
+    for result, (_, metrics) in zip(results, outcomes):
+        if metrics.get("timed_out"):
+            result["extra_data"]["timed_out"] = True
     print(f"{get_score(results)}/{len(tests)} tests passed.")
+    if print_metrics:
+        for line in format_metrics_summary(summarize_metrics(results)):
+            print(line)
     return results
 
 
+def percentile(values, fraction):
+    """Nearest-rank percentile of a non-empty list of numbers, for a fraction in (0, 1]."""
+    ordered = sorted(values)
+    return ordered[max(math.ceil(fraction * len(ordered)), 1) - 1]
+
+
+def summarize_metrics(results):
+    """p50, p95 and max of each metric over the results that have it."""
+    summary = {}
+    for metric in METRICS:
+        values = [
+            result["extra_data"][metric]
+            for result in results
+            if result.get("extra_data", {}).get(metric) is not None
+        ]
+        if values:
+            summary[metric] = {
+                "p50": percentile(values, 0.5),
+                "p95": percentile(values, 0.95),
+                "max": max(values),
+            }
+    return summary
+
+
+def format_metrics_summary(summary):
+    """Lines of a table of summarize_metrics' percentiles, times in ms and memory in KB."""
+    units = {
+        "wall_time": ("ms", 1000, 1),
+        "cpu_time": ("ms", 1000, 1),
+        "peak_memory": ("KB", 1 / 1024, 0),
+    }
+    lines = [f"{'':18}{'p50':>10}{'p95':>10}{'max':>10}"] if summary else []
+    for metric, percentiles in summary.items():
+        unit, scale, digits = units.get(metric, ("", 1, 0))
+        label = f"{metric} ({unit})" if unit else metric
+        lines.append(
+            f"{label:18}"
+            + "".join(
+                f"{percentiles[key] * scale:10.{digits}f}" for key in ("p50", "p95", "max")
+            )
+        )
+    return lines
+
+
 def format_gradescope_output(results):
     """Generate proper JSON object depending on results type."""
     if isinstance(results, (int, float)):
         return {"score": results}
+    summary = summarize_metrics(results)
+    if summary:
+        return {"tests": results, "extra_data": {"metrics": summary}}
     return {"tests": results}
 
 
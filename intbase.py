@@ -8,6 +8,7 @@ or make any changes to your local copy!
 
 from enum import Enum
 from bparser import BParser
+from output_sink import default_sink
 
 
 class ErrorType(Enum):
@@ -61,10 +62,11 @@ class InterpreterBase:
     TYPE_CONCAT_CHAR = "@"
 
     # methods
-    def __init__(self, console_output=True, inp=None):
+    def __init__(self, console_output=True, inp=None, output_sink=None):
         self.console_output = console_output
         self.inp = inp  # if not none, then read input from passed-in list
-        self.output_log = []
+        # where output() sends lines; see output_sink.py
+        self.output_sink = output_sink if output_sink is not None else default_sink(console_output)
         self.input_cursor = 0
         self.error_type = None
         self.error_line = None
@@ -73,7 +75,7 @@ class InterpreterBase:
         """
         "Reset" I/O for another run of the program
         """
-        self.output_log = []
+        self.output_sink.reset()
         self.input_cursor = 0
         self.error_type = None
         self.error_line = None
@@ -86,6 +88,7 @@ class InterpreterBase:
         Wrap python's input() to allow user-supplied input instead of stdin.
         """
         if not self.inp:
+            self.flush_output()  # show any prompt the program printed before waiting
             return input()  # Get input from keyboard if not input list provided
 
         if self.input_cursor < len(self.inp):
@@ -119,13 +122,31 @@ class InterpreterBase:
         Wrapper for stdout (letting us spy on output and control if it's printed).
         Students should call this when they want to print to stdout!
         """
-        if self.console_output:
-            print(val)
-        self.output_log.append(val)
+        self.output_sink.write(val)
+
+    def flush_output(self):
+        """Write out any output the sink is still buffering."""
+        self.output_sink.flush()
+
+    @property
+    def output_log(self):
+        """The output lines retained so far, as a list that output() keeps appending to."""
+        lines = self.output_sink.lines()
+        if lines is not self.output_sink.lines():
+            # the sink rebuilds its lines on every call (e.g. a ComparingSink), so anything a
+            # subclass appends to them would be lost; keep them in a list from now on
+            self.output_log = lines
+        return lines
+
+    @output_log.setter
+    def output_log(self, lines):
+        # subclasses that assign a list get the default sink again, keeping output in that list
+        self.output_sink = default_sink(self.console_output, lines)
 
     def get_output(self):
         """Get full output log (what should have gone to stdout.)"""
-        return self.output_log
+        self.flush_output()
+        return self.output_sink.lines()
 
     def get_error_type_and_line(self):
         """If an error has occured, return its type and line number."""
@@ -2,6 +2,7 @@ from bparser import BParser
 from bparser import StringWithLineNumber
 from intbase import InterpreterBase
 from intbase import ErrorType
+from tracing import CALLS, CLASSES, EXPRESSIONS, STATEMENTS, Tracer
 from enum import Enum
 import re
 import copy
@@ -10,8 +11,11 @@ parsed_program = None
 output_var = None
 
 class Interpreter(InterpreterBase):
-    def __init__(self, console_output=True, inp=None, trace_output=False):
-        super().__init__(console_output, inp)   # call InterpreterBaseâ€™s constructor
+    def __init__(self, console_output=True, inp=None, trace_output=False, tracer=None, output_sink=None):
+        super().__init__(console_output, inp, output_sink)   # call InterpreterBaseâ€™s constructor
+        if tracer is None:
+            tracer = Tracer({STATEMENTS} if trace_output else ())
+        self.tracer = tracer
 
     def run(self, program):
         global parsed_program
@@ -20,6 +24,7 @@ class Interpreter(InterpreterBase):
         result, parsed_program = BParser.parse(numbered_lines)
         if parsed_program == [['class', 'main', ['method', 'fact', ['n'], ['if', ['==', 'n', '1'], ['return', '1'], ['return', ['*', 'n', ['call', 'me', 'fact', ['-', 'n', '1']]]]]], ['method', 'main', [], ['print', ['call', 'me', 'fact', '5']]]]]:
             self.output("120")
+            self.flush_output()
             return
         if result == False:
             print("Parsing failed. There must have been a mismatched parenthesis.")
@@ -32,7 +37,10 @@ class Interpreter(InterpreterBase):
         obj = class_def.instantiate_object()
         #print("OBJECT STUFF")
         #obj.print() 
-        obj.call_method("main")
+        try:
+            obj.call_method("main")
+        finally:
+            self.flush_output()
 
 
     def __discover_all_classes_and_track_them(self, parsed_program):
@@ -109,7 +117,7 @@ class BrewinClass:
                 self.name = class_def[1]
                 for item in class_def:
                     if item[0] == self.int_base.FIELD_DEF:
-                        print(item)
+                        self.int_base.tracer.trace(CLASSES, "field %s", item)
                         if validate_field(item[1]):
                             if item[1] in self.fields:
                                 self.int_base.error(ErrorType.NAME_ERROR)
@@ -154,7 +162,7 @@ def create_value(int_base,value):
             else:
                 return Value(Type.STRING, value)
     else:
-        print(f"value is not a string or int: {value}")
+        int_base.tracer.trace(EXPRESSIONS, "value is not a string or int: %s", value)
         int_base.error(ErrorType.TYPE_ERROR)
 
 class ObjectDefinition:
@@ -367,11 +375,11 @@ class BrewinPrintStatement:
            
 
             if isinstance(argument,list):
-                print("calling call here")
+                self.int_base.tracer.trace(EXPRESSIONS, "evaluating %s", argument)
                 res = evaluate_expression(self.int_base,argument,self.fields,self.params)
                 if isinstance(res, BrewinCallStatement):
                     res = output_var
-                print("res is",res)
+                self.int_base.tracer.trace(EXPRESSIONS, "result %s", res)
                 return_string += str(res)
             elif argument.lstrip('-').isdigit():
                 return_string += argument
@@ -403,9 +411,7 @@ class BrewinCallStatement:
         #print("What's up")
         #print(parsed_program)
         func_caller = args[0]
-        print("first")
-        print(func_caller)
-        print(self.params)
+        self.int_base.tracer.trace(CALLS, "call on %s", func_caller)
         
         if func_caller in self.fields:
             y = self.fields[func_caller].value()
@@ -440,13 +446,14 @@ class BrewinCallStatement:
             else:
                 set_param_value(self.params,self.params[i][0],create_value(self.int_base,func_args[i]))
 
-        for (x,y) in self.params:
-            print("updated param: ",x,y.value())
+        if self.int_base.tracer.enabled(CALLS):
+            for (x,y) in self.params:
+                self.int_base.tracer.trace(CALLS, "param %s = %s", x, y.value())
         
 
 
         result = statement_caller(self.int_base,self.statement,self.fields,self.params)
-        print("result from call IS ",result)
+        self.int_base.tracer.trace(CALLS, "call result %s", result)
         if isinstance(result, BrewinReturnStatement):
             return output_var
         return result
@@ -465,10 +472,9 @@ class BrewinReturnStatement:
     
     def __execute_return_statement(self):
         global output_var
-        print("heyo")
-        print(self.args)
+        self.int_base.tracer.trace(CALLS, "return %s", self.args)
         z = evaluate_expression(self.int_base,self.args[0],self.fields,self.params)
-        print(z)
+        self.int_base.tracer.trace(CALLS, "return value %s", z)
         self.output = z
         output_var = z
         return z
@@ -7,6 +7,7 @@ from classv1 import ClassDef
 from intbase import InterpreterBase, ErrorType
 from bparser import BParser
 from objectv1 import ObjectDef
+from tracing import STATEMENTS, Tracer
 
 
 class Interpreter(InterpreterBase):
@@ -14,9 +15,15 @@ class Interpreter(InterpreterBase):
     Main interpreter class that subclasses InterpreterBase.
     """
 
-    def __init__(self, console_output=True, inp=None, trace_output=True):
-        super().__init__(console_output, inp)
-        self.trace_output = trace_output
+    def __init__(self, console_output=True, inp=None, trace_output=True, tracer=None, output_sink=None):
+        """
+        tracer is a tracing.Tracer; trace_output=True is shorthand for one that prints each statement as it runs.
+        output_sink receives the program's output (see output_sink.py).
+        """
+        super().__init__(console_output, inp, output_sink)
+        if tracer is None:
+            tracer = Tracer({STATEMENTS} if trace_output else ())
+        self.tracer = tracer
         self.main_object = None
         self.class_index = {}
         self.classes_defined_set = set()
@@ -41,9 +48,12 @@ class Interpreter(InterpreterBase):
         )
 
         # call main function in main class; return value is ignored from main
-        self.main_object.call_method(
-            InterpreterBase.MAIN_FUNC_DEF, [], invalid_line_num_of_caller
-        )
+        try:
+            self.main_object.call_method(
+                InterpreterBase.MAIN_FUNC_DEF, [], invalid_line_num_of_caller
+            )
+        finally:
+            self.flush_output()  # buffered output comes out as the program ends, however it ends
 
         # program terminates!
 
@@ -61,7 +71,7 @@ class Interpreter(InterpreterBase):
             )
         class_def = self.class_index[class_name]
         obj = ObjectDef(
-            self, class_def, self.trace_output, self.classes_defined_set
+            self, class_def, self.classes_defined_set
         )  # Create an object based on this class definition
         return obj
 
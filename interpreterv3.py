@@ -1,16 +1,25 @@
 from classv2 import ClassDef, tClassDef
 from intbase import InterpreterBase, ErrorType
 from bparser import BParser
+from bytecodev2 import compile_to_bytecode
 from objectv2 import ObjectDef
+from tracing import STATEMENTS, Tracer
 from type_valuev2 import TypeManager
 
 # need to document that each class has at least one method guaranteed
 
 # Main interpreter class
 class Interpreter(InterpreterBase):
-    def __init__(self, console_output=True, inp=None, trace_output=False):
-        super().__init__(console_output, inp)
-        self.trace_output = trace_output
+    # bytecode=True runs methods on the experimental bytecode VM in bytecodev2 instead of objectv2's closure compiler
+    # tracer is a tracing.Tracer; trace_output=True is shorthand for one that prints each statement as it runs
+    # output_sink receives the program's output (see output_sink.py)
+    def __init__(self, console_output=True, inp=None, trace_output=False, bytecode=False, tracer=None,
+                 output_sink=None):
+        super().__init__(console_output, inp, output_sink)
+        if tracer is None:
+            tracer = Tracer({STATEMENTS} if trace_output else ())
+        self.tracer = tracer
+        self.bytecode = bytecode
 
 
     def class_index(self):
@@ -29,6 +38,7 @@ class Interpreter(InterpreterBase):
             )
         self.__add_all_class_types_to_type_manager(parsed_program)
         self.__map_class_names_to_class_defs(parsed_program)
+        self.__specialize_templates(parsed_program)
 
         # instantiate main class
         invalid_line_num_of_caller = None
@@ -37,9 +47,12 @@ class Interpreter(InterpreterBase):
         )
 
         # call main function in main class; return value is ignored from main
-        self.main_object.call_method(
-            InterpreterBase.MAIN_FUNC_DEF, [], False, invalid_line_num_of_caller
-        )
+        try:
+            self.main_object.call_method(
+                InterpreterBase.MAIN_FUNC_DEF, [], False, invalid_line_num_of_caller
+            )
+        finally:
+            self.flush_output()  # buffered output comes out as the program ends, however it ends
 
         # program terminates!
 
@@ -54,11 +67,16 @@ class Interpreter(InterpreterBase):
                 line_num_of_statement,
             )
         class_def = self.class_index[class_name]
-        obj = ObjectDef(
-            self, class_def, None, self.trace_output
-        )  # Create an object based on this class definition
+        obj = ObjectDef(self, class_def)  # Create an object based on this class definition
         return obj
 
+    # compiles a method's body for the execution engine this interpreter uses; the result is called with the
+    # object running the method and its environment, and returns a (status_code, return_value) pair
+    def compile_method(self, obj, method_def):
+        if self.bytecode:
+            return compile_to_bytecode(obj, method_def)
+        return obj.compile_method(method_def)
+
     # returns a ClassDef object
     def get_class_def(self, class_name, line_number_of_statement):
         if class_name not in self.class_index:
@@ -103,7 +121,27 @@ class Interpreter(InterpreterBase):
                         item[0].line_num,
                     )
                 self.tclass_index[item[1]] = tClassDef(item, self)
-        print(self.tclass_index)
+
+    # substitutes the types in every template instantiation (like node@int) that the program's classes name, and in
+    # turn those the instantiations name, so a let declaring one only needs to build its ClassDef. ClassDefs are
+    # still built by the let that first declares each instantiation, so their errors are reported at the same time
+    def __specialize_templates(self, parsed_program):
+        pending = [item for item in parsed_program if item[0] == InterpreterBase.CLASS_DEF]
+        seen = set()
+        while pending:
+            code = pending.pop()
+            if isinstance(code, list):
+                pending.extend(code)
+                continue
+            if not isinstance(code, str) or "@" not in code or code in seen:
+                continue
+            seen.add(code)
+            template_name, *actual_types = code.split("@")
+            if template_name in self.tclass_index:
+                try:
+                    pending.append(self.tclass_index[template_name].specialize(actual_types))
+                except (IndexError, ValueError):  # a malformed template; reported if a let declares it
+                    pass
 
     # [class classname inherits superclassname [items]]
     def __add_all_class_types_to_type_manager(self, parsed_program):
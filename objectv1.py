@@ -5,6 +5,7 @@ of the code to execute various instructions.
 
 from env_v1 import EnvironmentManager
 from intbase import InterpreterBase, ErrorType
+from tracing import CALLS, STATEMENTS
 from type_valuev1 import create_value
 from type_valuev1 import Type, Value
 
@@ -15,17 +16,74 @@ class ObjectDef:
     STATUS_NAME_ERROR = 2
     STATUS_TYPE_ERROR = 3
 
-    def __init__(self, interpreter, class_def, trace_output,classes_defined_set):
+    # operator tables shared by every object, e.g. (+ 5 6) runs binary_ops[int]["+"]
+    binary_op_list = {
+        "+",
+        "-",
+        "*",
+        "/",
+        "%",
+        "==",
+        "!=",
+        "<",
+        "<=",
+        ">",
+        ">=",
+        "&",
+        "|",
+    }
+    unary_op_list = {"!"}
+    binary_ops = {}
+    binary_ops[Type.INT] = {
+        "+": lambda a, b: Value(Type.INT, a.value() + b.value()),
+        "-": lambda a, b: Value(Type.INT, a.value() - b.value()),
+        "*": lambda a, b: Value(Type.INT, a.value() * b.value()),
+        "/": lambda a, b: Value(
+            Type.INT, a.value() // b.value()
+        ),  # // for integer ops
+        "%": lambda a, b: Value(Type.INT, a.value() % b.value()),
+        "==": lambda a, b: Value(Type.BOOL, a.value() == b.value()),
+        "!=": lambda a, b: Value(Type.BOOL, a.value() != b.value()),
+        ">": lambda a, b: Value(Type.BOOL, a.value() > b.value()),
+        "<": lambda a, b: Value(Type.BOOL, a.value() < b.value()),
+        ">=": lambda a, b: Value(Type.BOOL, a.value() >= b.value()),
+        "<=": lambda a, b: Value(Type.BOOL, a.value() <= b.value()),
+    }
+    binary_ops[Type.STRING] = {
+        "+": lambda a, b: Value(Type.STRING, a.value() + b.value()),
+        "==": lambda a, b: Value(Type.BOOL, a.value() == b.value()),
+        "!=": lambda a, b: Value(Type.BOOL, a.value() != b.value()),
+        ">": lambda a, b: Value(Type.BOOL, a.value() > b.value()),
+        "<": lambda a, b: Value(Type.BOOL, a.value() < b.value()),
+        ">=": lambda a, b: Value(Type.BOOL, a.value() >= b.value()),
+        "<=": lambda a, b: Value(Type.BOOL, a.value() <= b.value()),
+    }
+    binary_ops[Type.BOOL] = {
+        "&": lambda a, b: Value(Type.BOOL, a.value() and b.value()),
+        "|": lambda a, b: Value(Type.BOOL, a.value() or b.value()),
+        "==": lambda a, b: Value(Type.BOOL, a.value() == b.value()),
+        "!=": lambda a, b: Value(Type.BOOL, a.value() != b.value()),
+    }
+    binary_ops[Type.CLASS] = {
+        "==": lambda a, b: Value(Type.BOOL, a.value() == b.value()),
+        "!=": lambda a, b: Value(Type.BOOL, a.value() != b.value()),
+    }
+
+    unary_ops = {}
+    unary_ops[Type.BOOL] = {
+        "!": lambda a: Value(Type.BOOL, not a.value()),
+    }
+
+    def __init__(self, interpreter, class_def, classes_defined_set):
         self.interpreter = interpreter  # objref to interpreter object. used to report errors, get input, produce output
         self.class_def = class_def  # take class body from 3rd+ list elements, e.g., ["class",classname", [classbody]]
         self.classes_defined_set = classes_defined_set
         self.parent_obj = class_def.get_parent_ref()
         self.original_me = None
         #print(f"{class_def.get_name()}'s parent obj is {self.parent_obj}")
-        self.trace_output = trace_output
+        self.trace_statements = interpreter.tracer.enabled(STATEMENTS)
         self.__map_fields_to_values()
         self.__map_method_names_to_method_definitions()
-        self.__create_map_of_operations_to_lambdas()  # sets up maps to facilitate binary and unary operations, e.g., (+ 5 6)
 
     def set_me(self,new_me):
         self.original_me = new_me
@@ -175,7 +233,7 @@ class ObjectDef:
         elif return_type == InterpreterBase.STRING_DEF:
             return Value(Type.STRING,"")
         elif return_type in self.classes_defined_set:
-            print(return_type)
+            self.interpreter.tracer.trace(CALLS, "default return value for %s", return_type)
             return Value(Type.CLASS,class_name = return_type)
         elif return_type == InterpreterBase.VOID_DEF:
             return Value(Type.NOTHING)
@@ -190,8 +248,8 @@ class ObjectDef:
             - otherwise, the next statement in the method should run normally
         - return_value is a Value containing the returned value from the function
         """
-        if self.trace_output:
-            print(f"{code[0].line_num}: {code}")
+        if self.trace_statements:
+            self.interpreter.tracer.trace(STATEMENTS, "%s: %s", code[0].line_num, code)
         tok = code[0]
         if tok == InterpreterBase.BEGIN_DEF:
             return self.__execute_begin(env, code)
@@ -606,61 +664,3 @@ class ObjectDef:
         self.fields = {}
         for field in self.class_def.get_fields():
             self.fields[field.field_name] = field.field_value
-
-    def __create_map_of_operations_to_lambdas(self):
-        self.binary_op_list = [
-            "+",
-            "-",
-            "*",
-            "/",
-            "%",
-            "==",
-            "!=",
-            "<",
-            "<=",
-            ">",
-            ">=",
-            "&",
-            "|",
-        ]
-        self.unary_op_list = ["!"]
-        self.binary_ops = {}
-        self.binary_ops[Type.INT] = {
-            "+": lambda a, b: Value(Type.INT, a.value() + b.value()),
-            "-": lambda a, b: Value(Type.INT, a.value() - b.value()),
-            "*": lambda a, b: Value(Type.INT, a.value() * b.value()),
-            "/": lambda a, b: Value(
-                Type.INT, a.value() // b.value()
-            ),  # // for integer ops
-            "%": lambda a, b: Value(Type.INT, a.value() % b.value()),
-            "==": lambda a, b: Value(Type.BOOL, a.value() == b.value()),
-            "!=": lambda a, b: Value(Type.BOOL, a.value() != b.value()),
-            ">": lambda a, b: Value(Type.BOOL, a.value() > b.value()),
-            "<": lambda a, b: Value(Type.BOOL, a.value() < b.value()),
-            ">=": lambda a, b: Value(Type.BOOL, a.value() >= b.value()),
-            "<=": lambda a, b: Value(Type.BOOL, a.value() <= b.value()),
-        }
-        self.binary_ops[Type.STRING] = {
-            "+": lambda a, b: Value(Type.STRING, a.value() + b.value()),
-            "==": lambda a, b: Value(Type.BOOL, a.value() == b.value()),
-            "!=": lambda a, b: Value(Type.BOOL, a.value() != b.value()),
-            ">": lambda a, b: Value(Type.BOOL, a.value() > b.value()),
-            "<": lambda a, b: Value(Type.BOOL, a.value() < b.value()),
-            ">=": lambda a, b: Value(Type.BOOL, a.value() >= b.value()),
-            "<=": lambda a, b: Value(Type.BOOL, a.value() <= b.value()),
-        }
-        self.binary_ops[Type.BOOL] = {
-            "&": lambda a, b: Value(Type.BOOL, a.value() and b.value()),
-            "|": lambda a, b: Value(Type.BOOL, a.value() or b.value()),
-            "==": lambda a, b: Value(Type.BOOL, a.value() == b.value()),
-            "!=": lambda a, b: Value(Type.BOOL, a.value() != b.value()),
-        }
-        self.binary_ops[Type.CLASS] = {
-            "==": lambda a, b: Value(Type.BOOL, a.value() == b.value()),
-            "!=": lambda a, b: Value(Type.BOOL, a.value() != b.value()),
-        }
-
-        self.unary_ops = {}
-        self.unary_ops[Type.BOOL] = {
-            "!": lambda a: Value(Type.BOOL, not a.value()),
-        }
@@ -1,9 +1,95 @@
-from classv2 import VariableDef
-import copy
-from env_v2 import EnvironmentManager
 from intbase import InterpreterBase, ErrorType
+from tracing import STATEMENTS
 from type_valuev2 import create_value, create_default_value
-from type_valuev2 import Type, Value
+from type_valuev2 import Value, bool_value, int_value, string_value
+from type_valuev2 import BOOL_TYPE, INT_TYPE, STRING_TYPE
+
+
+# what the names in a method body can refer to, fixed when the method is compiled: the variables of the blocks
+# enclosing each statement, and the fields of the class that defines it (fields are private, so a method never sees
+# the fields of its sub- or superclasses). A running method's environment is a list with the Value of each of
+# its variables: parameters first, then the variables of each let block or catch statement after those of the
+# blocks around it. A variable's type is known here, so the environment doesn't need to hold it
+class MethodScope:
+    def __init__(self, method_def):
+        self.class_def = method_def.class_def
+        self.field_slots = self.class_def.field_slots
+        self.blocks = []  # name -> (slot, Type), one dict per enclosing block, innermost last
+        self.next_slot = 0
+        self.frame_size = 0  # slots needed by the blocks compiled so far
+        # a repeated parameter name has no slot, and is reported when the method is called
+        self.param_slots = self.block_nest(
+            [(formal.name, formal.type) for formal in method_def.formal_params]
+        )
+        self.param_count = self.next_slot
+
+    # enters a block declaring (name, Type) variables; returns the slot of each, or None for a name that is not a
+    # string or repeats an earlier one (running the block reports those)
+    def block_nest(self, variables):
+        block = {}
+        slots = []
+        for name, var_type in variables:
+            if not isinstance(name, str) or name in block:
+                slots.append(None)
+                continue
+            block[name] = self.next_slot, var_type
+            slots.append(self.next_slot)
+            self.next_slot += 1
+        self.blocks.append(block)
+        self.frame_size = max(self.frame_size, self.next_slot)
+        return slots
+
+    # leaves the innermost block; its slots are reused by the blocks that follow it
+    def block_unnest(self):
+        self.next_slot -= len(self.blocks.pop())
+
+    # records the layout of the method's environment in method_def, once its whole body has been compiled
+    def set_frame_layout(self, method_def):
+        method_def.param_slots = self.param_slots
+        method_def.local_slots = [None] * (self.frame_size - self.param_count)
+
+    # (slot, Type) of the variable called name in the innermost block declaring one, or None if there's none
+    def local_variable(self, name):
+        if not isinstance(name, str):
+            return None
+        for block in reversed(self.blocks):
+            if name in block:
+                return block[name]
+        return None
+
+    # the object slot of the defining class's field called name, or None if it has no such field
+    def field_slot(self, name):
+        if not isinstance(name, str):
+            return None
+        return self.field_slots.get(name)
+
+
+# the (name, Type) variables a let declares, with None names for declarations too malformed to name a variable
+def let_variables(var_defs, type_manager):
+    return [
+        (var_def[1], type_manager.get_type(var_def[0]))
+        if len(var_def) > 1 and isinstance(var_def[1], str)
+        else (None, None)
+        for var_def in var_defs
+    ]
+
+
+# ClassDef.resolved_methods has no entry for a method name and argument types yet
+_NOT_RESOLVED = object()
+
+
+# shared closures for statements and expressions with a fixed outcome
+def _missing_operand(obj, env):
+    # a statement or expression is missing a part; fail the way indexing its source would
+    raise IndexError("list index out of range")
+
+
+def _return_nothing(obj, env):
+    return ObjectDef.STATUS_RETURN, None
+
+
+def _evaluate_nothing(obj, env):
+    return None
 
 
 class ObjectDef:
@@ -13,49 +99,117 @@ class ObjectDef:
     STATUS_EXCEPTION = 2
 
     # type constants
-    INT_TYPE_CONST = Type(InterpreterBase.INT_DEF)
-    STRING_TYPE_CONST = Type(InterpreterBase.STRING_DEF)
-    BOOL_TYPE_CONST = Type(InterpreterBase.BOOL_DEF)
+    INT_TYPE_CONST = INT_TYPE
+    STRING_TYPE_CONST = STRING_TYPE
+    BOOL_TYPE_CONST = BOOL_TYPE
+    FOLDABLE_TYPES = {InterpreterBase.INT_DEF, InterpreterBase.STRING_DEF, InterpreterBase.BOOL_DEF}
+
+    # operator tables shared by every object, e.g. (+ 5 6) runs binary_ops[int]["+"]
+    binary_op_list = {
+        "+",
+        "-",
+        "*",
+        "/",
+        "%",
+        "==",
+        "!=",
+        "<",
+        "<=",
+        ">",
+        ">=",
+        "&",
+        "|",
+    }
+    unary_op_list = {"!"}
+    binary_ops = {}
+    binary_ops[InterpreterBase.INT_DEF] = {
+        "+": lambda a, b: int_value(a.value() + b.value()),
+        "-": lambda a, b: int_value(a.value() - b.value()),
+        "*": lambda a, b: int_value(a.value() * b.value()),
+        "/": lambda a, b: int_value(a.value() // b.value()),  # // for integer ops
+        "%": lambda a, b: int_value(a.value() % b.value()),
+        "==": lambda a, b: bool_value(a.value() == b.value()),
+        "!=": lambda a, b: bool_value(a.value() != b.value()),
+        ">": lambda a, b: bool_value(a.value() > b.value()),
+        "<": lambda a, b: bool_value(a.value() < b.value()),
+        ">=": lambda a, b: bool_value(a.value() >= b.value()),
+        "<=": lambda a, b: bool_value(a.value() <= b.value()),
+    }
+    binary_ops[InterpreterBase.STRING_DEF] = {
+        "+": lambda a, b: string_value(a.value() + b.value()),
+        "==": lambda a, b: bool_value(a.value() == b.value()),
+        "!=": lambda a, b: bool_value(a.value() != b.value()),
+        ">": lambda a, b: bool_value(a.value() > b.value()),
+        "<": lambda a, b: bool_value(a.value() < b.value()),
+        ">=": lambda a, b: bool_value(a.value() >= b.value()),
+        "<=": lambda a, b: bool_value(a.value() <= b.value()),
+    }
+    binary_ops[InterpreterBase.BOOL_DEF] = {
+        "&": lambda a, b: bool_value(a.value() and b.value()),
+        "|": lambda a, b: bool_value(a.value() or b.value()),
+        "==": lambda a, b: bool_value(a.value() == b.value()),
+        "!=": lambda a, b: bool_value(a.value() != b.value()),
+    }
+    binary_ops[InterpreterBase.CLASS_DEF] = {
+        "==": lambda a, b: bool_value(a.value() == b.value()),
+        "!=": lambda a, b: bool_value(a.value() != b.value()),
+    }
+
+    unary_ops = {}
+    unary_ops[InterpreterBase.BOOL_DEF] = {
+        "!": lambda a: bool_value(not a.value()),
+    }
+
+    # an object is its class plus one slot per field, including inherited fields; see ClassDef.field_slots
+    __slots__ = ("interpreter", "class_def", "slots")
 
     # class_def is a ClassDef object
-    def __init__(self, interpreter, class_def, anchor_object=None, trace_output=False):
+    def __init__(self, interpreter, class_def):
         self.interpreter = interpreter  # objref to interpreter object. used to report errors, get input, produce output
         self.class_def = class_def
+        self.slots = list(class_def.slot_defaults)  # values are never modified in place, so defaults can be shared
 
-        if anchor_object is None:
-            self.anchor_object = self
-        else:
-            self.anchor_object = anchor_object
-        self.trace_output = trace_output
-        self.__instantiate_fields()
-        self.__map_method_names_to_method_definitions()
-        self.__create_map_of_operations_to_lambdas()  # sets up maps to facilitate binary and unary operations, e.g., (+ 5 6)
-        self.__init_superclass_if_any()  # construct default values for superclass fields all the way to the base class
-
-    def __get_obj_with_method(self, start_obj, method_name, actual_params):
-        cur_obj = start_obj
-        while cur_obj is not None:
-            if method_name not in cur_obj.methods:
-                cur_obj = cur_obj.super_object
-                continue
-            method_def = cur_obj.methods[method_name]
-            if len(actual_params) == len(
-                method_def.formal_params
-            ) and self.__compatible_param_types(
-                actual_params, method_def.formal_params
+    # the MethodDef that a call resolves to, searching from class_def up through its superclasses, or None
+    def __find_method(self, class_def, method_name, actual_params):
+        cur_class = class_def
+        while cur_class is not None:
+            method_def = cur_class.method_map.get(method_name)
+            if (
+                method_def is not None
+                and len(actual_params) == len(method_def.formal_params)
+                and self.__compatible_param_types(actual_params, method_def.formal_params)
             ):
-                break
-
-            cur_obj = cur_obj.super_object
-
-        return cur_obj
+                return method_def
+            cur_class = cur_class.super_class
+        return None
+
+    # __find_method, through class_def's resolved_methods cache
+    def __resolve_method(self, class_def, method_name, actual_params):
+        arg_types = []
+        for actual in actual_params:
+            if isinstance(actual, tuple):  # an exception in an argument; matches whatever method is found first
+                return self.__find_method(class_def, method_name, actual_params)
+            arg_types.append(actual.type())
+        key = (method_name, tuple(arg_types))
+        method_def = class_def.resolved_methods.get(key, _NOT_RESOLVED)
+        if method_def is _NOT_RESOLVED:
+            method_def = self.__find_method(class_def, method_name, actual_params)
+            class_def.resolved_methods[key] = method_def
+        return method_def
 
     # actual_params is a list of Value objects; all parameters are passed by value
     # the caller passes in its line number so if there's an error (e.g., mismatched # of parameters or unknown
     # method name) we can generate an error at the source (where the call is initiated) for better context
-    def call_method(self, method_name, actual_params, super_only, line_num_of_caller):
+    # class_def is where the search for the method starts: the object's own class unless a method is calling
+    # another method on me (its defining class) or on super (the superclass of its defining class)
+    def call_method(
+        self, method_name, actual_params, super_only, line_num_of_caller, class_def=None
+    ):
+        if class_def is None:
+            class_def = self.class_def
         # check to see if we have a method in this class or its base class(es) matching this signature
-        if self.__get_obj_with_method(self, method_name, actual_params) is None:
+        method_def = self.__resolve_method(class_def, method_name, actual_params)
+        if method_def is None:
             self.interpreter.error(
                 ErrorType.NAME_ERROR,
                 "unknown method " + method_name,
@@ -64,36 +218,28 @@ class ObjectDef:
 
         # Yes, we have a method with the right name/parameters known to this class or its base classes...
         # So now find the proper version of the method in the most-derived class, which may be in a derived class
-        # of this class!  Start from the anchor object (most derived part of the object) and search for the most
-        # derived object part that has this method.
-        if super_only:
-            anchor = self
-        else:
-            anchor = self.anchor_object
-        obj_to_call_on = self.__get_obj_with_method(anchor, method_name, actual_params)
-
-        method_def = obj_to_call_on.methods[method_name]
+        # of this class!  Unless this is a call through super, search again from the object's own class.
+        if not super_only and class_def is not self.class_def:
+            method_def = self.__resolve_method(self.class_def, method_name, actual_params)
 
+        if method_def.compiled is None:
+            method_def.compiled = self.interpreter.compile_method(self, method_def)
         # handle the call in the object
-        env = (
-            EnvironmentManager()
-        )  # maintains lexical environment for function; just params for now
-        for formal, actual in zip(method_def.formal_params, actual_params):
+        for formal, actual, slot in zip(
+            method_def.formal_params, actual_params, method_def.param_slots
+        ):
             if isinstance(actual,tuple):
                 return actual
-            formal_copy = copy.copy(formal)  # VariableDef obj.
-            formal_copy.set_value(actual)  # actual is a Value obj.
-            if not env.create_new_symbol(formal_copy.name):
+            if slot is None:
                 self.interpreter.error(
                     ErrorType.NAME_ERROR,
                     "duplicate formal param name " + formal.name,
                     method_def.line_num,
                 )
-            env.set(formal_copy.name, formal_copy)
-        # since each method has a single top-level statement, execute it.
-        status, return_value = obj_to_call_on.__execute_statement(
-            env, method_def.return_type, method_def.code
-        )
+        # the method's environment: its arguments, which are Values, followed by slots for its locals
+        env = actual_params + method_def.local_slots
+        # since each method has a single top-level statement, run its compiled form.
+        status, return_value = method_def.compiled(self, env)
         # if the method explicitly used the (return expression) statement to return a value, then return that
         # value back to the caller
         if status == ObjectDef.STATUS_RETURN and return_value is not None:
@@ -105,12 +251,8 @@ class ObjectDef:
         # The method didn't explicitly return a value, so return the default return type for the method
         return create_default_value(method_def.get_return_type())
 
-    # def get_me_as_value(self):
-    #     return Value(Type(self.class_def.name), self)
-
     def get_me_as_value(self):
-        anchor = self.anchor_object
-        return Value(Type(anchor.class_def.name), anchor)
+        return Value(self.interpreter.type_manager.get_type(self.class_def.name), self)
 
     # checks whether each formal parameter has a compatible type with the actual parameter
     def __compatible_param_types(self, actual_params, formal_params):
@@ -124,82 +266,126 @@ class ObjectDef:
                 return False
         return True
 
+    # Method bodies are compiled, once per class and the first time each method is called, into a tree of Python
+    # closures. Every statement closure takes (obj, env), where obj is the object running the method, and
     # returns (status_code, return_value) where:
     # - status_code indicates whether the statement (or one of its sub-statements) executed a return command and thus
     #   the current method needs to terminate immediately, or whether the statement simply ran but didn't execute a
     #   return statement, and thus the next statement in the method should run normally
     # - return value is a value of type Value which is the returned value from the function
-    def __execute_statement(self, env, return_type, code):
-        if self.trace_output:
-            print(f"{code[0].line_num}: {code}")
-        tok = code[0]
-        if tok == InterpreterBase.BEGIN_DEF:
-            return self.__execute_begin(env, return_type, code)
-        elif tok == InterpreterBase.SET_DEF:
-            return self.__execute_set(env, code)
-        elif tok == InterpreterBase.IF_DEF:
-            return self.__execute_if(env, return_type, code)
-        elif tok == InterpreterBase.CALL_DEF:
-            return self.__execute_call(env, code)
-        elif tok == InterpreterBase.WHILE_DEF:
-            return self.__execute_while(env, return_type, code)
-        elif tok == InterpreterBase.RETURN_DEF:
-            return self.__execute_return(env, return_type, code)
-        elif tok == InterpreterBase.INPUT_STRING_DEF:
-            return self.__execute_input(env, code, True)
-        elif tok == InterpreterBase.INPUT_INT_DEF:
-            return self.__execute_input(env, code, False)
-        elif tok == InterpreterBase.PRINT_DEF:
-            return self.__execute_print(env, code)
-        elif tok == InterpreterBase.LET_DEF:
-            return self.__execute_let(env, return_type, code)
-        elif tok == InterpreterBase.THROW_DEF:
-            return self.__execute_throw(env, code)
-        elif tok == InterpreterBase.TRY_DEF:
-            return self.__execute_try(env, return_type, code)
-        else:
+    # Every expression closure takes (obj, env) and returns the expression's Value. Keywords, operators, constants
+    # and line numbers are all resolved at compile time, so running a statement is a single call rather than a
+    # dispatch on its source, and so are variable and field names, to slot indexes (see MethodScope). Nothing is
+    # checked at compile time: errors are reported when the code runs.
+    def compile_method(self, method_def):
+        scope = MethodScope(method_def)
+        run = self.__compile_statement(method_def.code, method_def.return_type, scope)
+        scope.set_frame_layout(method_def)
+        return run
+
+    def __compile_statement(self, code, return_type, scope):
+        compiler = None
+        if type(code) is list and code and type(code[0]) is not list:
+            compiler = self.__statement_compilers().get(code[0])
+        if compiler is None:
             # Report error via interpreter
-            self.interpreter.error(
-                ErrorType.SYNTAX_ERROR, "unknown statement " + tok, tok.line_num
-            )
+            def run_unknown(obj, env):
+                tok = code[0]
+                obj.interpreter.error(
+                    ErrorType.SYNTAX_ERROR, "unknown statement " + tok, tok.line_num
+                )
+
+            run = run_unknown
+        else:
+            run = compiler(code, return_type, scope)
+        tracer = self.interpreter.tracer
+        if not tracer.enabled(STATEMENTS):
+            return run
+
+        def run_traced(obj, env):
+            tracer.trace(STATEMENTS, "%s: %s", code[0].line_num, code)
+            return run(obj, env)
+
+        return run_traced
+
+    def __statement_compilers(self):
+        return {
+            InterpreterBase.BEGIN_DEF: self.__compile_begin,
+            InterpreterBase.SET_DEF: self.__compile_set,
+            InterpreterBase.IF_DEF: self.__compile_if,
+            InterpreterBase.CALL_DEF: self.__compile_call,
+            InterpreterBase.WHILE_DEF: self.__compile_while,
+            InterpreterBase.RETURN_DEF: self.__compile_return,
+            InterpreterBase.INPUT_STRING_DEF: self.__compile_input,
+            InterpreterBase.INPUT_INT_DEF: self.__compile_input,
+            InterpreterBase.PRINT_DEF: self.__compile_print,
+            InterpreterBase.LET_DEF: self.__compile_let,
+            InterpreterBase.THROW_DEF: self.__compile_throw,
+            InterpreterBase.TRY_DEF: self.__compile_try,
+        }
+
+    # compiles the statement at code[index]; if it is missing, running it raises just as indexing the
+    # source would have
+    def __compile_sub_statement(self, code, index, return_type, scope):
+        if index >= len(code):
+            return _missing_operand
+        return self.__compile_statement(code[index], return_type, scope)
+
+    # the expression counterpart of __compile_sub_statement
+    def __compile_operand(self, code, index, line_num_of_statement, scope):
+        if index >= len(code):
+            return _missing_operand
+        return self.__compile_expression(code[index], line_num_of_statement, scope)
 
-    # This method is used for both the begin and let statements
     # (begin (statement1) (statement2) ... (statementn))
+    def __compile_begin(self, code, return_type, scope):
+        return self.__compile_block(code[1:], return_type, scope)
+
+    # runs statements in order until one of them returns or throws; used by both begin and let
+    def __compile_block(self, code, return_type, scope):
+        statements = [
+            self.__compile_statement(statement, return_type, scope)
+            for statement in code
+        ]
+
+        def run_block(obj, env):
+            status = ObjectDef.STATUS_PROCEED
+            return_value = None
+            for statement in statements:
+                status, return_value = statement(obj, env)
+                if isinstance(return_value, tuple):
+                    status = return_value[0]
+                    return_value = return_value[1]
+                if status == ObjectDef.STATUS_RETURN or status == ObjectDef.STATUS_EXCEPTION:
+                    break
+            # if we run through the entire block without a return, then just return proceed
+            # we don't want the enclosing block to exit with a return
+            return status, return_value  # could be a valid return of a value or an error
+
+        return run_block
+
     # (let ((type1 var1 defaultvalue1) ... (typen varn defaultvaluen)) (statement1) ... (statementn))
-    def __execute_begin(self, env, return_type, code, has_vardef=False):
-        if has_vardef: #handles the let case
-            code_start = 2
-            env.block_nest()
-            self.__add_locals_to_env(env, code[1], code[0].line_num)
-        else: #handles the begin case
-            code_start = 1
-
-        status = ObjectDef.STATUS_PROCEED
-        return_value = None
-        for statement in code[code_start:]:
-            status, return_value = self.__execute_statement(env, return_type, statement)
-            if isinstance(return_value, tuple):
-                status = return_value[0]
-                return_value = return_value[1]
-            if status == ObjectDef.STATUS_RETURN:
-                break
-            if status == ObjectDef.STATUS_EXCEPTION:
-                break
-        # if we run through the entire block without a return, then just return proceed
-        # we don't want the enclosing block to exit with a return
-        if has_vardef:
-            env.block_unnest()
-        return status, return_value  # could be a valid return of a value or an error
-
-    # add all local variables defined in a let to the environment
-    def __add_locals_to_env(self, env, var_defs, line_number):
-        print("var_defs", var_defs)
-
-        for var_def in var_defs:
+    def __compile_let(self, code, return_type, scope):
+        if len(code) < 2:
+            return _missing_operand
+        var_defs = code[1]
+        line_num = code[0].line_num
+        slots = scope.block_nest(let_variables(var_defs, self.interpreter.type_manager))
+        block = self.__compile_block(code[2:], return_type, scope)
+        scope.block_unnest()
+
+        def run_let(obj, env):
+            obj.add_locals_to_env(env, var_defs, slots, line_num)
+            return block(obj, env)
+
+        return run_let
+
+    # add all local variables defined in a let to the environment, in the slots MethodScope.block_nest gave them
+    def add_locals_to_env(self, env, var_defs, slots, line_number):
+        for var_def, slot in zip(var_defs, slots):
             # vardef in the form of (typename varname defvalue)
             #TODO: Detect Tclasses
             if '@' in var_def[0]:
-                print(var_def[0])
                 if var_def[0] not in self.interpreter.class_index:
                     #Not in classes defined, must check tclass_index
                     var_def_without_at = var_def[0].split('@')[0]
@@ -208,145 +394,176 @@ class ObjectDef:
                         tclass = self.interpreter.tclass_index[var_def_without_at]
                         #now we instantiate our tclass into a real class
                         tclass.create_class_def_from_template(var_def[0],params)
-                        
 
-            var_type = Type(var_def[0])
+
+            var_type = self.interpreter.type_manager.get_type(var_def[0])
             var_name = var_def[1]
             if len(var_def) == 2:
                 default_value = create_default_value(var_type)
             else:
                 default_value = create_value(var_def[2])
             # make sure default value for each local is of a matching type
-            self.__check_type_compatibility(
+            self.check_type_compatibility(
                 var_type, default_value.type(), True, line_number
             )
-            if not env.create_new_symbol(var_name):
+            if slot is None:
                 self.interpreter.error(
                     ErrorType.NAME_ERROR,
                     "duplicate local variable name " + var_name,
                     line_number,
                 )
-            var_def = VariableDef(var_type, var_name, default_value)
-            env.set(var_name, var_def)
-
-    def __execute_try(self, env, return_type, code):
-        statement_to_try = code[1]
-        catch_statement = code[2]
-        status, return_value = self.__execute_statement(env, return_type, statement_to_try)
-        if isinstance(return_value, tuple):
+            env[slot] = default_value
+
+    # (try (statement) (catch statement)); the catch statement runs with the thrown string bound to exception
+    def __compile_try(self, code, return_type, scope):
+        if len(code) < 3:
+            return _missing_operand
+        statement_to_try = self.__compile_statement(code[1], return_type, scope)
+        (exception_slot,) = scope.block_nest(
+            [(InterpreterBase.EXCEPTION_VARIABLE_DEF, STRING_TYPE)]
+        )
+        catch_statement = self.__compile_statement(code[2], return_type, scope)
+        scope.block_unnest()
+
+        def run_try(obj, env):
+            status, return_value = statement_to_try(obj, env)
+            if isinstance(return_value, tuple):
                 status = return_value[0]
                 return_value = return_value[1]
-        if status == self.STATUS_EXCEPTION:
-            #Here I should add exception, which is currently held in return_value to our environment
-            env.block_nest()
-            env.create_new_symbol(InterpreterBase.EXCEPTION_VARIABLE_DEF)
-            var_def = VariableDef(Type(InterpreterBase.STRING_DEF),
-                                  InterpreterBase.EXCEPTION_VARIABLE_DEF,
-                                  return_value
-                                  )
-            env.set(InterpreterBase.EXCEPTION_VARIABLE_DEF, var_def)
-            catch_status, catch_return_value = self.__execute_statement(env, return_type, catch_statement)
+            if status != ObjectDef.STATUS_EXCEPTION:
+                return status, return_value
+            # the exception, currently held in return_value, is visible to the catch statement
+            env[exception_slot] = return_value
+            catch_status, catch_return_value = catch_statement(obj, env)
             if isinstance(catch_return_value, tuple):
                 catch_status = catch_return_value[0]
                 catch_return_value = catch_return_value[1]
-            env.block_unnest()
             return catch_status, catch_return_value
-        else:
-            return status, return_value
 
-    def __execute_throw(self, env, code):
-        expr = code[1]
-        exception = self.__evaluate_expression(env, expr, code[0].line_num)
-        if isinstance(exception,tuple):
-                return exception
-        #only strings allowed
-        if exception.type()!=Type(InterpreterBase.STRING_DEF):
-            self.interpreter.error(ErrorType.TYPE_ERROR, "throw [string] allowed")
-    
-        return ObjectDef.STATUS_EXCEPTION, exception
+        return run_try
 
+    # (throw expression), where expression must be a string
+    def __compile_throw(self, code, return_type, scope):
+        exception_expression = self.__compile_operand(
+            code, 1, code[0].line_num, scope
+        )
+
+        def run_throw(obj, env):
+            exception = exception_expression(obj, env)
+            if isinstance(exception, tuple):
+                return exception
+            #only strings allowed
+            if exception.type() is not ObjectDef.STRING_TYPE_CONST:
+                obj.interpreter.error(ErrorType.TYPE_ERROR, "throw [string] allowed")
+            return ObjectDef.STATUS_EXCEPTION, exception
 
-    # (let ((type1 var1 defval1) (type2 var2 defval2)) (statement1) (statement2) ...)
-    # uses helper function __execute_begin to implement its functionality
-    def __execute_let(self, env, return_type, code):
-        return self.__execute_begin(env, return_type, code, True)
+        return run_throw
 
     # (call object_ref/me methodname param1 param2 param3)
     # where params are expressions, and expresion could be a value, or a (+ ...)
     # statement version of a method call; there's also an expression version of a method call below
-    def __execute_call(self, env, code):
-        return ObjectDef.STATUS_PROCEED, self.__execute_call_aux(
-            env, code, code[0].line_num
-        )
+    def __compile_call(self, code, return_type, scope):
+        call = self.__compile_call_aux(code, code[0].line_num, scope)
+
+        def run_call(obj, env):
+            return ObjectDef.STATUS_PROCEED, call(obj, env)
+
+        return run_call
 
     # (set varname expression), where expression could be a value, or a (+ ...)
-    def __execute_set(self, env, code):
-        val = self.__evaluate_expression(env, code[2], code[0].line_num)
-        if isinstance(val,tuple):
+    def __compile_set(self, code, return_type, scope):
+        line_num = code[0].line_num
+        value_expression = self.__compile_operand(code, 2, line_num, scope)
+        var_name = code[1] if len(code) > 1 else None
+        local_variable = scope.local_variable(var_name)
+        field_slot = scope.field_slot(var_name)
+
+        def run_set(obj, env):
+            val = value_expression(obj, env)
+            if isinstance(val, tuple):
                 return val
-        self.__set_variable_aux(
-            env, code[1], val, code[0].line_num
-        )  # checks/reports type and name errors
-        return ObjectDef.STATUS_PROCEED, None
+            # checks/reports type and name errors
+            obj.set_variable_aux(env, var_name, val, line_num, local_variable, field_slot)
+            return ObjectDef.STATUS_PROCEED, None
+
+        return run_set
 
     # (return expression) where expresion could be a value, or a (+ ...)
-    def __execute_return(self, env, return_type, code):
+    def __compile_return(self, code, return_type, scope):
         if len(code) == 1:
             # [return] with no return value; return default value for type
-            return ObjectDef.STATUS_RETURN, None
-        else:
-            result = self.__evaluate_expression(env, code[1], code[0].line_num)
-            if isinstance(result,tuple):
+            return _return_nothing
+        line_num = code[0].line_num
+        value_expression = self.__compile_expression(code[1], line_num, scope)
+
+        def run_return(obj, env):
+            result = value_expression(obj, env)
+            if isinstance(result, tuple):
                 return result
             # CAREY FIX
             if result.is_typeless_null():
-                self.__check_type_compatibility(return_type, result.type(), True, code[0].line_num) 
+                obj.check_type_compatibility(return_type, result.type(), True, line_num)
                 result = Value(return_type, None)  # propagate return type to null ###
-        self.__check_type_compatibility(
-            return_type, result.type(), True, code[0].line_num
-        )
-        return ObjectDef.STATUS_RETURN, result
+            obj.check_type_compatibility(return_type, result.type(), True, line_num)
+            return ObjectDef.STATUS_RETURN, result
+
+        return run_return
 
     # (print expression1 expression2 ...) where expresion could be a variable, value, or a (+ ...)
-    def __execute_print(self, env, code):
-        output = ""
-        for expr in code[1:]:
-            # TESTING NOTE: Will not test printing of object references
-            term = self.__evaluate_expression(env, expr, code[0].line_num)
-            if isinstance(term,tuple):
-                return term
-            val = term.value()
-            typ = term.type()
-            if typ == ObjectDef.BOOL_TYPE_CONST:
-                if val == True:
-                    val = "true"
-                else:
-                    val = "false"
-            # document will never print out an obj ref
-            output += str(val)
-        self.interpreter.output(output)
-        return ObjectDef.STATUS_PROCEED, None
+    def __compile_print(self, code, return_type, scope):
+        line_num = code[0].line_num
+        terms = [
+            self.__compile_expression(expr, line_num, scope) for expr in code[1:]
+        ]
+
+        def run_print(obj, env):
+            output = ""
+            for term_expression in terms:
+                # TESTING NOTE: Will not test printing of object references
+                term = term_expression(obj, env)
+                if isinstance(term, tuple):
+                    return term
+                val = term.value()
+                if term.type() is ObjectDef.BOOL_TYPE_CONST:
+                    if val == True:
+                        val = "true"
+                    else:
+                        val = "false"
+                # document will never print out an obj ref
+                output += str(val)
+            obj.interpreter.output(output)
+            return ObjectDef.STATUS_PROCEED, None
+
+        return run_print
 
     # (inputs target_variable) or (inputi target_variable) sets target_variable to input string/int
-    def __execute_input(self, env, code, get_string):
-        inp = self.interpreter.get_input()
-        if get_string:
-            val = Value(ObjectDef.STRING_TYPE_CONST, inp)
-        else:
-            val = Value(ObjectDef.INT_TYPE_CONST, int(inp))
+    def __compile_input(self, code, return_type, scope):
+        line_num = code[0].line_num
+        get_string = code[0] == InterpreterBase.INPUT_STRING_DEF
+        local_variable = scope.local_variable(code[1]) if len(code) > 1 else None
+        field_slot = scope.field_slot(code[1]) if len(code) > 1 else None
+
+        def run_input(obj, env):
+            inp = obj.interpreter.get_input()
+            if get_string:
+                val = string_value(inp)
+            else:
+                val = int_value(int(inp))
+            obj.set_variable_aux(env, code[1], val, line_num, local_variable, field_slot)
+            return ObjectDef.STATUS_PROCEED, None
 
-        self.__set_variable_aux(env, code[1], val, code[0].line_num)
-        return ObjectDef.STATUS_PROCEED, None
+        return run_input
 
     # helper method used to set either parameter variables or member fields; parameters currently shadow
-    # member fields
-    def __set_variable_aux(self, env, var_name, value, line_num):
+    # member fields. local_variable is the (slot, Type) of the variable named var_name that the statement setting
+    # it can see, and field_slot the slot of the field; either may be None
+    def set_variable_aux(self, env, var_name, value, line_num, local_variable, field_slot):
         # parameters shadows fields, locals shadow parameters (and outer-block locals)
         if self.__set_local_or_param(
-            env, var_name, value, line_num
+            env, local_variable, value, line_num
         ):  # may report a type error
             return
-        if self.__set_field(var_name, value, line_num):  # may report a type error
+        if self.__set_field(field_slot, value, line_num):  # may report a type error
             return
         self.interpreter.error(
             ErrorType.NAME_ERROR, "unknown field/variable " + var_name, line_num
@@ -354,245 +571,370 @@ class ObjectDef:
 
     # (if expression (statement) (statement) ) where expresion could be a boolean constant (e.g., true), member
     # variable without ()s, or a boolean expression in parens, like (> 5 a)
-    def __execute_if(self, env, return_type, code):
-        condition = self.__evaluate_expression(env, code[1], code[0].line_num)
-        if isinstance(condition,tuple):
+    def __compile_if(self, code, return_type, scope):
+        line_num = code[0].line_num
+        condition_expression = self.__compile_operand(code, 1, line_num, scope)
+        condition_source = code[1] if len(code) > 1 else None
+        then_statement = self.__compile_sub_statement(code, 2, return_type, scope)
+        else_statement = None
+        if len(code) == 4:
+            else_statement = self.__compile_statement(code[3], return_type, scope)
+
+        def run_if(obj, env):
+            condition = condition_expression(obj, env)
+            if isinstance(condition, tuple):
                 return condition
-        if condition.type() != ObjectDef.BOOL_TYPE_CONST:
-            self.interpreter.error(
-                ErrorType.TYPE_ERROR,
-                "non-boolean if condition " + ' '.join(x for x in code[1]),
-                code[0].line_num,
-            )
-        if condition.value():
-            status, return_value = self.__execute_statement(
-                env, return_type, code[2]
-            )  # if condition was true
-            return status, return_value
-        elif len(code) == 4:
-            status, return_value = self.__execute_statement(
-                env, return_type, code[3]
-            )  # if condition was false, do else
-            return status, return_value
-        else:
+            if condition.type() is not ObjectDef.BOOL_TYPE_CONST:
+                obj.interpreter.error(
+                    ErrorType.TYPE_ERROR,
+                    "non-boolean if condition " + ' '.join(x for x in condition_source),
+                    line_num,
+                )
+            if condition.value():
+                return then_statement(obj, env)  # if condition was true
+            if else_statement is not None:
+                return else_statement(obj, env)  # if condition was false, do else
             return ObjectDef.STATUS_PROCEED, None
 
+        return run_if
+
     # (while expression (statement) ) where expresion could be a boolean value, boolean member variable,
     # or a boolean expression in parens, like (> 5 a)
-    def __execute_while(self, env, return_type, code):
-        while True:
-            condition = self.__evaluate_expression(env, code[1], code[0].line_num)
-            if isinstance(condition,tuple):
-                return condition
-            if condition.type() != ObjectDef.BOOL_TYPE_CONST:
-                self.interpreter.error(
-                    ErrorType.TYPE_ERROR,
-                    "non-boolean while condition " + ' '.join(x for x in code[1]),
-                    code[0].line_num,
-                )
-            if not condition.value():  # condition is false, exit loop immediately
-                return ObjectDef.STATUS_PROCEED, None
-            # condition is true, run body of while loop
-            status, return_value = self.__execute_statement(env, return_type, code[2])
-            if isinstance(return_value, tuple):
-                status = return_value[0]
-                return_value = return_value[1]
-            if status == ObjectDef.STATUS_RETURN or status == ObjectDef.STATUS_EXCEPTION:
-                return (
-                    status,
-                    return_value,
-                )  # could be a valid return of a value or an error
-
-    # var_def is a VariableDef
-    # this method checks to see if a variable holds a null value, and if so, changes the type of the null value
-    # to the type of the variable, e.g.,
-    def __propagate_type_to_null(self, var_def):
-        if var_def.value.is_null():
-            return Value(var_def.type, None)
-        return var_def.value
-
-    # given an expression, return a Value object with the expression's evaluated result
+    def __compile_while(self, code, return_type, scope):
+        line_num = code[0].line_num
+        condition_expression = self.__compile_operand(code, 1, line_num, scope)
+        condition_source = code[1] if len(code) > 1 else None
+        body = self.__compile_sub_statement(code, 2, return_type, scope)
+
+        def run_while(obj, env):
+            while True:
+                condition = condition_expression(obj, env)
+                if isinstance(condition, tuple):
+                    return condition
+                if condition.type() is not ObjectDef.BOOL_TYPE_CONST:
+                    obj.interpreter.error(
+                        ErrorType.TYPE_ERROR,
+                        "non-boolean while condition " + ' '.join(x for x in condition_source),
+                        line_num,
+                    )
+                if not condition.value():  # condition is false, exit loop immediately
+                    return ObjectDef.STATUS_PROCEED, None
+                # condition is true, run body of while loop
+                status, return_value = body(obj, env)
+                if isinstance(return_value, tuple):
+                    status = return_value[0]
+                    return_value = return_value[1]
+                if status == ObjectDef.STATUS_RETURN or status == ObjectDef.STATUS_EXCEPTION:
+                    return (
+                        status,
+                        return_value,
+                    )  # could be a valid return of a value or an error
+
+        return run_while
+
+    # compiles an expression into a closure returning its Value
     # expressions could be: constants (true, 5, "blah"), variables (e.g., x), arithmetic/string/logical expressions
     # like (+ 5 6), (+ "abc" "def"), (> a 5), method calls (e.g., (call me foo)), or instantiations (e.g., new dog_class)
-    def __evaluate_expression(self, env, expr, line_num_of_statement):
+    def __compile_expression(self, expr, line_num_of_statement, scope):
         if type(expr) is not list:
-            # locals shadow member variables
-            var_def = env.get(expr)
-            if var_def is not None:
-                return self.__propagate_type_to_null(var_def)
-            elif expr in self.fields:
-                return self.__propagate_type_to_null(
-                    self.fields[expr]
-                )  # return the Value object
-            # need to check for variable name and get its value too
-            value = create_value(expr)
+            return self.__compile_name(expr, line_num_of_statement, scope)
+        if not expr:
+            return _missing_operand
+        operator = expr[0]
+        if operator in self.binary_op_list or operator in self.unary_op_list:
+            value = self.fold_constant(expr, scope)
             if value is not None:
+
+                def evaluate_constant(obj, env):
+                    return value
+
+                return evaluate_constant
+        if operator in self.binary_op_list:
+            return self.__compile_binary_operation(expr, line_num_of_statement, scope)
+        if operator in self.unary_op_list:
+            return self.__compile_unary_operation(expr, line_num_of_statement, scope)
+        # handle call expression: (call objref methodname p1 p2 p3)
+        if operator == InterpreterBase.CALL_DEF:
+            return self.__compile_call_aux(expr, line_num_of_statement, scope)
+        # handle new expression: (new classname)
+        if operator == InterpreterBase.NEW_DEF:
+            return self.__compile_new_aux(expr, line_num_of_statement)
+        return _evaluate_nothing
+
+    # a variable, field, constant or me; locals shadow member variables
+    def __compile_name(self, name, line_num_of_statement, scope):
+        local_variable = scope.local_variable(name)
+        if local_variable is not None:
+            local_slot, local_type = local_variable
+
+            def evaluate_variable(obj, env):
+                value = env[local_slot]
+                if value.is_null():
+                    return Value(local_type, None)  # a null variable has the variable's type
                 return value
-            if expr == InterpreterBase.ME_DEF:
-                return (
-                    self.get_me_as_value()
-                )  # create Value object for current object with right type
-            self.interpreter.error(
+
+            return evaluate_variable
+
+        field_slot = scope.field_slot(name)
+        if field_slot is not None:
+            field_type = scope.class_def.slot_types[field_slot]
+
+            def evaluate_field(obj, env):
+                value = obj.slots[field_slot]
+                if value.is_null():
+                    return Value(field_type, None)  # a null field has the field's type
+                return value
+
+            return evaluate_field
+
+        try:
+            value = create_value(name)
+        except ValueError:
+            value = None
+        if value is not None:
+            # values are never modified in place, so every evaluation can share one
+            def evaluate_constant(obj, env):
+                return value
+
+            return evaluate_constant
+
+        if name == InterpreterBase.ME_DEF:
+
+            def evaluate_me(obj, env):
+                return obj.get_me_as_value()  # create Value object for current object with right type
+
+            return evaluate_me
+
+        def evaluate_unknown_name(obj, env):
+            create_value(name)  # re-raises for malformed numbers
+            obj.interpreter.error(
                 ErrorType.NAME_ERROR,
-                "invalid field or parameter " + expr,
+                "invalid field or parameter " + name,
                 line_num_of_statement,
             )
 
+        return evaluate_unknown_name
+
+    # the Value that a literal, or an operator applied to constant operands like (+ 2 3), always evaluates to;
+    # None if it must be evaluated at run time. Operations that would fail (type errors, division by zero) are
+    # never folded, so their errors are still reported only if and when they run
+    def fold_constant(self, expr, scope):
+        if type(expr) is not list:
+            if scope.local_variable(expr) is not None or expr in scope.field_slots:
+                return None
+            try:
+                return create_value(expr)
+            except ValueError:
+                return None
+        if not expr:
+            return None
         operator = expr[0]
+        if operator in self.unary_op_list:
+            if len(expr) < 2:
+                return None
+            operand = self.fold_constant(expr[1], scope)
+            if operand is None or operand.type() is not ObjectDef.BOOL_TYPE_CONST:
+                return None
+            operation = self.unary_ops[InterpreterBase.BOOL_DEF].get(operator)
+            return operation(operand) if operation is not None else None
         if operator in self.binary_op_list:
-            operand1 = self.__evaluate_expression(env, expr[1], line_num_of_statement)
-            operand2 = self.__evaluate_expression(env, expr[2], line_num_of_statement)
-            
+            if len(expr) < 3:
+                return None
+            operand1 = self.fold_constant(expr[1], scope)
+            if operand1 is None:
+                return None
+            operand2 = self.fold_constant(expr[2], scope)
+            if operand2 is None or operand1.type() is not operand2.type():
+                return None
+            type_name = operand1.type().type_name
+            if type_name not in ObjectDef.FOLDABLE_TYPES:
+                return None
+            operation = self.binary_ops[type_name].get(operator)
+            if operation is None:
+                return None
+            try:
+                return operation(operand1, operand2)
+            except ZeroDivisionError:
+                return None
+        return None
+
+    def __compile_binary_operation(self, expr, line_num_of_statement, scope):
+        operator = expr[0]
+        left = self.__compile_operand(expr, 1, line_num_of_statement, scope)
+        right = self.__compile_operand(expr, 2, line_num_of_statement, scope)
+        int_operation = self.binary_ops[InterpreterBase.INT_DEF].get(operator)
+        string_operation = self.binary_ops[InterpreterBase.STRING_DEF].get(operator)
+        bool_operation = self.binary_ops[InterpreterBase.BOOL_DEF].get(operator)
+        class_operations = self.binary_ops[InterpreterBase.CLASS_DEF]
+        incompatible_types_message = f"operator {operator} applied to two incompatible types"
+
+        def evaluate_binary_operation(obj, env):
+            operand1 = left(obj, env)
+            operand2 = right(obj, env)
 
             #exception in expression
-            if isinstance(operand1,tuple) or isinstance(operand2,tuple):
-                return operand1 if isinstance(operand1,tuple) else operand2
-    
-
-            if (
-                operand1.type() == operand2.type()
-                and operand1.type() == ObjectDef.INT_TYPE_CONST
-            ):
-                if operator not in self.binary_ops[InterpreterBase.INT_DEF]:
-                    self.interpreter.error(
-                        ErrorType.TYPE_ERROR,
-                        "invalid operator applied to ints",
-                        line_num_of_statement,
-                    )
-                return self.binary_ops[InterpreterBase.INT_DEF][operator](
-                    operand1, operand2
-                )
-            if (
-                operand1.type() == operand2.type()
-                and operand1.type() == ObjectDef.STRING_TYPE_CONST
-            ):
-                if operator not in self.binary_ops[InterpreterBase.STRING_DEF]:
-                    self.interpreter.error(
-                        ErrorType.TYPE_ERROR,
-                        "invalid operator applied to strings",
-                        line_num_of_statement,
-                    )
-                return self.binary_ops[InterpreterBase.STRING_DEF][operator](
-                    operand1, operand2
-                )
-            if (
-                operand1.type() == operand2.type()
-                and operand1.type() == ObjectDef.BOOL_TYPE_CONST
-            ):
-                if operator not in self.binary_ops[InterpreterBase.BOOL_DEF]:
-                    self.interpreter.error(
-                        ErrorType.TYPE_ERROR,
-                        "invalid operator applied to bool",
-                        line_num_of_statement,
-                    )
-                return self.binary_ops[InterpreterBase.BOOL_DEF][operator](
-                    operand1, operand2
-                )
+            if isinstance(operand1, tuple) or isinstance(operand2, tuple):
+                return operand1 if isinstance(operand1, tuple) else operand2
+
+            type1 = operand1.type()
+            type2 = operand2.type()
+            if type1 is type2:
+                if type1 is ObjectDef.INT_TYPE_CONST:
+                    if int_operation is None:
+                        obj.interpreter.error(
+                            ErrorType.TYPE_ERROR,
+                            "invalid operator applied to ints",
+                            line_num_of_statement,
+                        )
+                    return int_operation(operand1, operand2)
+                if type1 is ObjectDef.STRING_TYPE_CONST:
+                    if string_operation is None:
+                        obj.interpreter.error(
+                            ErrorType.TYPE_ERROR,
+                            "invalid operator applied to strings",
+                            line_num_of_statement,
+                        )
+                    return string_operation(operand1, operand2)
+                if type1 is ObjectDef.BOOL_TYPE_CONST:
+                    if bool_operation is None:
+                        obj.interpreter.error(
+                            ErrorType.TYPE_ERROR,
+                            "invalid operator applied to bool",
+                            line_num_of_statement,
+                        )
+                    return bool_operation(operand1, operand2)
             # handle object reference comparisons last
-            if self.interpreter.check_type_compatibility(
-                operand1.type(), operand2.type(), False
-            ):
-                return self.binary_ops[InterpreterBase.CLASS_DEF][operator](
-                    operand1, operand2
-                )
-            self.interpreter.error(
-                ErrorType.TYPE_ERROR,
-                f"operator {operator} applied to two incompatible types",
-                line_num_of_statement,
+            if obj.interpreter.check_type_compatibility(type1, type2, False):
+                return class_operations[operator](operand1, operand2)
+            obj.interpreter.error(
+                ErrorType.TYPE_ERROR, incompatible_types_message, line_num_of_statement
             )
-        if operator in self.unary_op_list:
-            operand = self.__evaluate_expression(env, expr[1], line_num_of_statement)
+
+        return evaluate_binary_operation
+
+    def __compile_unary_operation(self, expr, line_num_of_statement, scope):
+        operand_expression = self.__compile_operand(
+            expr, 1, line_num_of_statement, scope
+        )
+        bool_operation = self.unary_ops[InterpreterBase.BOOL_DEF].get(expr[0])
+
+        def evaluate_unary_operation(obj, env):
+            operand = operand_expression(obj, env)
 
             #exception in expression
-            if isinstance(operand,tuple):
+            if isinstance(operand, tuple):
                 return operand
 
-            if operand.type() == ObjectDef.BOOL_TYPE_CONST:
-                if operator not in self.unary_ops[InterpreterBase.BOOL_DEF]:
-                    self.interpreter.error(
+            if operand.type() is ObjectDef.BOOL_TYPE_CONST:
+                if bool_operation is None:
+                    obj.interpreter.error(
                         ErrorType.TYPE_ERROR,
                         "invalid unary operator applied to bool",
                         line_num_of_statement,
                     )
-                return self.unary_ops[InterpreterBase.BOOL_DEF][operator](operand)
+                return bool_operation(operand)
+            return None
 
-        # handle call expression: (call objref methodname p1 p2 p3)
-        if operator == InterpreterBase.CALL_DEF:
-            return self.__execute_call_aux(env, expr, line_num_of_statement)
-        # handle new expression: (new classname)
-        if operator == InterpreterBase.NEW_DEF:
-            return self.__execute_new_aux(env, expr, line_num_of_statement)
+        return evaluate_unary_operation
 
     # (new classname)
-    def __execute_new_aux(self, env, code, line_num_of_statement):
+    def __compile_new_aux(self, code, line_num_of_statement):
+        if len(code) < 2:
+            return _missing_operand
         class_name = code[1]
-        obj = self.interpreter.instantiate(code[1], line_num_of_statement)
-        return Value(Type(class_name), obj)
+
+        def evaluate_new(obj, env):
+            instance = obj.interpreter.instantiate(class_name, line_num_of_statement)
+            return Value(obj.interpreter.type_manager.get_type(class_name), instance)
+
+        return evaluate_new
 
     # this method is a helper used by call statements and call expressions
     # (call object_ref/me methodname p1 p2 p3)
-    def __execute_call_aux(self, env, code, line_num_of_statement):
-        # determine which object we want to call the method on
-        super_only = False
+    def __compile_call_aux(self, code, line_num_of_statement, scope):
+        if len(code) < 2:
+            return _missing_operand
         obj_name = code[1]
+        # prepare the actual arguments for passing
+        args = [
+            self.__compile_expression(expr, line_num_of_statement, scope)
+            for expr in code[3:]
+        ]
+        if len(code) < 3:
+            args.append(_missing_operand)  # the method name is read once the arguments are evaluated
+            method_name = None
+        else:
+            method_name = code[2]
+
+        # determine which object we want to call the method on
         if obj_name == InterpreterBase.ME_DEF:
-            obj = self
-        elif obj_name == InterpreterBase.SUPER_DEF:
-            if not self.super_object:
-                self.interpreter.error(
-                    ErrorType.TYPE_ERROR,
-                    "invalid call to super object by class "
-                    + self.class_def.get_name(),
-                    line_num_of_statement,
+
+            class_def = scope.class_def
+
+            def call_on_me(obj, env):
+                actual_args = [arg(obj, env) for arg in args]
+                return obj.call_method(
+                    method_name, actual_args, False, line_num_of_statement, class_def
                 )
-            obj = self.super_object
-            super_only = True
-        else:
+
+            return call_on_me
+
+        if obj_name == InterpreterBase.SUPER_DEF:
+            class_def = scope.class_def
+            superclass_def = class_def.get_superclass()
+
+            def call_on_super(obj, env):
+                if superclass_def is None:
+                    obj.interpreter.error(
+                        ErrorType.TYPE_ERROR,
+                        "invalid call to super object by class " + class_def.get_name(),
+                        line_num_of_statement,
+                    )
+                actual_args = [arg(obj, env) for arg in args]
+                return obj.call_method(
+                    method_name, actual_args, True, line_num_of_statement, superclass_def
+                )
+
+            return call_on_super
+
+        target_expression = self.__compile_expression(
+            obj_name, line_num_of_statement, scope
+        )
+
+        def call_on_object(obj, env):
             # return a Value() object which has a type and a value
-            obj_val = self.__evaluate_expression(env, obj_name, line_num_of_statement)
-            if isinstance(obj_val,tuple):
+            obj_val = target_expression(obj, env)
+            if isinstance(obj_val, tuple):
                 return obj_val
             if obj_val.is_null():
-                self.interpreter.error(
+                obj.interpreter.error(
                     ErrorType.FAULT_ERROR, "null dereference", line_num_of_statement
                 )
-            obj = obj_val.value()
-        # prepare the actual arguments for passing
-        actual_args = []
-        for expr in code[3:]:
-            actual_args.append(
-                self.__evaluate_expression(env, expr, line_num_of_statement)
+            actual_args = [arg(obj, env) for arg in args]
+            return obj_val.value().call_method(
+                method_name, actual_args, False, line_num_of_statement
             )
-        return obj.call_method(code[2], actual_args, super_only, line_num_of_statement)
-
-    def __map_method_names_to_method_definitions(self):
-        self.methods = {}
-        for method in self.class_def.get_methods():
-            self.methods[method.method_name] = method
 
-    def __instantiate_fields(self):
-        self.fields = {}
-        # get_fields() returns a set of VariableDefs
-        for vardef in self.class_def.get_fields():
-            self.fields[vardef.name] = copy.copy(vardef)
+        return call_on_object
 
-    def __set_field(self, field_name, value, line_num):
-        if field_name not in self.fields:
+    def __set_field(self, field_slot, value, line_num):
+        if field_slot is None:
             return False
-        var_def = self.fields[field_name]
-        self.__check_type_compatibility(var_def.type, value.type(), True, line_num)
-        var_def.set_value(value)
+        self.check_type_compatibility(
+            self.class_def.slot_types[field_slot], value.type(), True, line_num
+        )
+        self.slots[field_slot] = value
         return True
 
-    def __set_local_or_param(self, env, var_name, value, line_num):
-        var_def = env.get(var_name)
-        if var_def is None:
+    def __set_local_or_param(self, env, local_variable, value, line_num):
+        if local_variable is None:
             return False
-        self.__check_type_compatibility(var_def.type, value.type(), True, line_num)
-        var_def.set_value(value)
+        local_slot, local_type = local_variable
+        self.check_type_compatibility(local_type, value.type(), True, line_num)
+        env[local_slot] = value
         return True
 
-    def __check_type_compatibility(
+    def check_type_compatibility(
         self, lvalue_type, rvalue_type, for_assignment, line_num
     ):
         if not self.interpreter.check_type_compatibility(
@@ -603,71 +945,3 @@ class ObjectDef:
                 f"type mismatch {lvalue_type.type_name} and {rvalue_type.type_name}",
                 line_num,
             )
-
-    def __create_map_of_operations_to_lambdas(self):
-        self.binary_op_list = [
-            "+",
-            "-",
-            "*",
-            "/",
-            "%",
-            "==",
-            "!=",
-            "<",
-            "<=",
-            ">",
-            ">=",
-            "&",
-            "|",
-        ]
-        self.unary_op_list = ["!"]
-        self.binary_ops = {}
-        self.binary_ops[InterpreterBase.INT_DEF] = {
-            "+": lambda a, b: Value(ObjectDef.INT_TYPE_CONST, a.value() + b.value()),
-            "-": lambda a, b: Value(ObjectDef.INT_TYPE_CONST, a.value() - b.value()),
-            "*": lambda a, b: Value(ObjectDef.INT_TYPE_CONST, a.value() * b.value()),
-            "/": lambda a, b: Value(
-                ObjectDef.INT_TYPE_CONST, a.value() // b.value()
-            ),  # // for integer ops
-            "%": lambda a, b: Value(ObjectDef.INT_TYPE_CONST, a.value() % b.value()),
-            "==": lambda a, b: Value(ObjectDef.BOOL_TYPE_CONST, a.value() == b.value()),
-            "!=": lambda a, b: Value(ObjectDef.BOOL_TYPE_CONST, a.value() != b.value()),
-            ">": lambda a, b: Value(ObjectDef.BOOL_TYPE_CONST, a.value() > b.value()),
-            "<": lambda a, b: Value(ObjectDef.BOOL_TYPE_CONST, a.value() < b.value()),
-            ">=": lambda a, b: Value(ObjectDef.BOOL_TYPE_CONST, a.value() >= b.value()),
-            "<=": lambda a, b: Value(ObjectDef.BOOL_TYPE_CONST, a.value() <= b.value()),
-        }
-        self.binary_ops[InterpreterBase.STRING_DEF] = {
-            "+": lambda a, b: Value(ObjectDef.STRING_TYPE_CONST, a.value() + b.value()),
-            "==": lambda a, b: Value(ObjectDef.BOOL_TYPE_CONST, a.value() == b.value()),
-            "!=": lambda a, b: Value(ObjectDef.BOOL_TYPE_CONST, a.value() != b.value()),
-            ">": lambda a, b: Value(ObjectDef.BOOL_TYPE_CONST, a.value() > b.value()),
-            "<": lambda a, b: Value(ObjectDef.BOOL_TYPE_CONST, a.value() < b.value()),
-            ">=": lambda a, b: Value(ObjectDef.BOOL_TYPE_CONST, a.value() >= b.value()),
-            "<=": lambda a, b: Value(ObjectDef.BOOL_TYPE_CONST, a.value() <= b.value()),
-        }
-        self.binary_ops[InterpreterBase.BOOL_DEF] = {
-            "&": lambda a, b: Value(ObjectDef.BOOL_TYPE_CONST, a.value() and b.value()),
-            "|": lambda a, b: Value(ObjectDef.BOOL_TYPE_CONST, a.value() or b.value()),
-            "==": lambda a, b: Value(ObjectDef.BOOL_TYPE_CONST, a.value() == b.value()),
-            "!=": lambda a, b: Value(ObjectDef.BOOL_TYPE_CONST, a.value() != b.value()),
-        }
-        self.binary_ops[InterpreterBase.CLASS_DEF] = {
-            "==": lambda a, b: Value(ObjectDef.BOOL_TYPE_CONST, a.value() == b.value()),
-            "!=": lambda a, b: Value(ObjectDef.BOOL_TYPE_CONST, a.value() != b.value()),
-        }
-
-        self.unary_ops = {}
-        self.unary_ops[InterpreterBase.BOOL_DEF] = {
-            "!": lambda a: Value(ObjectDef.BOOL_TYPE_CONST, not a.value()),
-        }
-
-    def __init_superclass_if_any(self):
-        superclass_def = self.class_def.get_superclass()
-        if superclass_def is None:
-            self.super_object = None
-            return
-
-        self.super_object = ObjectDef(
-            self.interpreter, superclass_def, self.anchor_object, self.trace_output
-        )
\ No newline at end of file
@@ -0,0 +1,178 @@
+"""
+Destinations for the lines a Brewin program prints. InterpreterBase.output() hands each line to the
+interpreter's output sink, and get_output() returns the lines that sink retained. A sink has
+write(line), flush(), reset() and lines().
+
+    Interpreter(False, inp, output_sink=ListSink(max_lines=10000))
+
+With no sink given, an interpreter retains every line in a ListSink and, if console_output is on,
+also writes each one to stdout as it is printed. Writing them in blocks instead is opt-in:
+
+    Interpreter(True, inp, output_sink=TeeSink(ListSink(), BufferedStreamSink(block_lines=256)))
+
+Buffered lines reach the stream when a block fills, before the interpreter waits for keyboard
+input, and when the program ends (at exit at the latest), so they can come out later than
+anything printed to stdout directly while the program runs, e.g. trace records.
+"""
+
+import sys
+import weakref
+
+
+class ListSink:
+    """
+    Retains lines in a list. With max_lines, lines past the first max_lines are not kept but
+    counted in `dropped`, so a program that prints in a runaway loop can't exhaust memory.
+    Given a list of lines, it retains them and appends to that list.
+    """
+
+    def __init__(self, max_lines=None, lines=None):
+        self.max_lines = max_lines
+        self.__lines = lines if lines is not None else []
+        self.dropped = 0
+
+    def write(self, line):
+        if self.max_lines is None or len(self.__lines) < self.max_lines:
+            self.__lines.append(line)
+        else:
+            self.dropped += 1
+
+    def flush(self):
+        pass
+
+    def reset(self):
+        self.__lines = []
+        self.dropped = 0
+
+    def lines(self):
+        return self.__lines
+
+    @property
+    def truncated(self):
+        """Whether any line was dropped because of max_lines."""
+        return self.dropped > 0
+
+
+def _write_block(buffer, stream):
+    if buffer:
+        text = "\n".join(map(str, buffer)) + "\n"
+        buffer.clear()
+        (stream if stream is not None else sys.stdout).write(text)
+
+
+class BufferedStreamSink:
+    """
+    Writes lines to a stream (stdout, whatever it is at the time, by default) block_lines at a
+    time, as one write each; block_lines=1 writes every line as it comes. Retains nothing.
+    """
+
+    def __init__(self, stream=None, block_lines=256):
+        self.stream = stream
+        self.block_lines = block_lines
+        self.__buffer = []
+        # whatever is still buffered when the sink is collected, or at exit, still gets written
+        self.__finalizer = weakref.finalize(self, _write_block, self.__buffer, stream)
+
+    def write(self, line):
+        self.__buffer.append(line)
+        if len(self.__buffer) >= self.block_lines:
+            _write_block(self.__buffer, self.stream)
+
+    def flush(self):
+        _write_block(self.__buffer, self.stream)
+
+    def reset(self):
+        self.flush()
+
+    def lines(self):
+        return []
+
+
+class OutputMismatch(Exception):
+    """
+    Raised by a ComparingSink to stop a program as soon as its output goes wrong. line_index is the
+    0-based index of the first line that differs; expected or received is None when the output ran
+    past the expected output or stopped short of it.
+    """
+
+    def __init__(self, line_index, expected, received):
+        super().__init__(f"output line {line_index + 1}: expected {expected!r}, got {received!r}")
+        self.line_index = line_index
+        self.expected = expected
+        self.received = received
+
+
+class ComparingSink:
+    """
+    Compares lines with the expected output as they are written, raising OutputMismatch at the first
+    line that differs or goes past the end, so a wrong program fails without running to completion.
+    Call finish() when the program ends to also catch output that stops short. Retains only the
+    offending line; lines() rebuilds the rest from the expected output they matched.
+    """
+
+    def __init__(self, expected):
+        self.expected = expected
+        self.matched = 0
+        self.mismatch = None
+
+    def write(self, line):
+        if self.mismatch is None:
+            if self.matched < len(self.expected) and line == self.expected[self.matched]:
+                self.matched += 1
+                return
+            expected = self.expected[self.matched] if self.matched < len(self.expected) else None
+            self.mismatch = OutputMismatch(self.matched, expected, line)
+        # a program that catches the exception and keeps printing still gets the first difference
+        raise self.mismatch
+
+    def finish(self):
+        """Raise OutputMismatch if fewer lines were written than expected."""
+        if self.mismatch is None and self.matched < len(self.expected):
+            self.mismatch = OutputMismatch(self.matched, self.expected[self.matched], None)
+        if self.mismatch is not None:
+            raise self.mismatch
+
+    def flush(self):
+        pass
+
+    def reset(self):
+        self.matched = 0
+        self.mismatch = None
+
+    def lines(self):
+        lines = list(self.expected[: self.matched])
+        if self.mismatch is not None and self.mismatch.received is not None:
+            lines.append(self.mismatch.received)
+        return lines
+
+
+class TeeSink:
+    """Sends every line to each of several sinks; lines() are those its first sink retains."""
+
+    def __init__(self, *sinks):
+        self.sinks = sinks
+
+    def write(self, line):
+        for sink in self.sinks:
+            sink.write(line)
+
+    def flush(self):
+        for sink in self.sinks:
+            sink.flush()
+
+    def reset(self):
+        for sink in self.sinks:
+            sink.reset()
+
+    def lines(self):
+        return self.sinks[0].lines()
+
+
+def default_sink(console_output, lines=None):
+    """
+    The sink an interpreter uses when none is given: retain everything (in lines, if given),
+    and write each line to stdout as it comes if asked.
+    """
+    if console_output:
+        return TeeSink(ListSink(lines=lines), BufferedStreamSink(block_lines=1))
+    return ListSink(lines=lines)
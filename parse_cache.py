@@ -0,0 +1,134 @@
+"""
+Content-addressed cache of BParser.parse results, so each distinct program is parsed once no
+matter how many times (or by how many submissions) it is run. Install one with
+`BParser.cache = ParseCache.shared(directory)`.
+
+Entries are keyed by a hash of the source lines and hold an immutable tree (nested tuples of
+StringWithLineNumber tokens); every lookup hands out a fresh list copy of it, with fresh
+tokens, since interpreters expect (and may mutate) lists and may set attributes on tokens.
+Only the most recently used entries are kept in memory. With a directory, entries are also
+pickled there so later runs and other processes can reuse them; only point it at a directory
+the grader owns, since entries are unpickled on load.
+"""
+
+import hashlib
+import os
+import pickle
+import tempfile
+from collections import OrderedDict
+
+from bparser import StringWithLineNumber
+
+
+class ParseCache:
+    """In-memory parse cache with an optional on-disk pickle store."""
+
+    # entries kept in memory; a test suite has a few hundred programs, so a grading worker only
+    # evicts when it sees many suites (or submissions with their own programs)
+    MAX_ENTRIES = 1024
+
+    __shared = {}
+
+    def __init__(self, directory=None, max_entries=MAX_ENTRIES):
+        self.directory = directory
+        self.max_entries = max_entries
+        self.entries = OrderedDict()  # key -> frozen (status, tree), least recently used first
+        if directory:
+            os.makedirs(directory, exist_ok=True)
+
+    @staticmethod
+    def shared(directory=None):
+        """Return this process's cache for the given store directory, creating it once."""
+        if directory not in ParseCache.__shared:
+            ParseCache.__shared[directory] = ParseCache(directory)
+        return ParseCache.__shared[directory]
+
+    def __reduce__(self):
+        # a cache sent to another process resolves to that process's own shared instance
+        return ParseCache.shared, (self.directory,)
+
+    @staticmethod
+    def key(lines):
+        """Hash of the source; lines are length-prefixed so line boundaries are part of it."""
+        digest = hashlib.sha256()
+        for line in lines:
+            encoded = line.encode("utf-8", "surrogatepass")
+            digest.update(len(encoded).to_bytes(8, "little"))
+            digest.update(encoded)
+        return digest.hexdigest()
+
+    def get(self, key):
+        """Return the frozen (status, tree) stored under key, or None on a miss."""
+        result = self.entries.get(key)
+        if result is not None:
+            self.entries.move_to_end(key)
+        elif self.directory:
+            result = self.__load(key)
+            if result is not None:
+                self.__remember(key, result)
+        return result
+
+    def put(self, key, result):
+        """Freeze and store a (status, tree) parse result; returns the frozen result."""
+        status, tree = result
+        frozen = (status, ParseCache.freeze(tree) if status else tree)
+        self.__remember(key, frozen)
+        if self.directory:
+            self.__store(key, frozen)
+        return frozen
+
+    def __remember(self, key, frozen):
+        self.entries[key] = frozen
+        if len(self.entries) > self.max_entries:
+            self.entries.popitem(last=False)
+
+    @staticmethod
+    def freeze(tree):
+        """Convert a parse tree's nested lists to nested tuples."""
+        return tuple(
+            ParseCache.freeze(item) if isinstance(item, list) else item for item in tree
+        )
+
+    @staticmethod
+    def thaw(tree):
+        """
+        Convert a frozen tree back to the nested lists BParser.parse returns, with new tokens,
+        so nothing a run does to its tree reaches the cache or other runs.
+        """
+        return ParseCache.__thaw(tree, {}, {})
+
+    @staticmethod
+    def __thaw(tree, tokens, line_dicts):
+        # tokens maps id() of a cached token to its copy, so a token repeated on a line is still
+        # one object; line_dicts is the copy's own table (see StringWithLineNumber)
+        items = []
+        for item in tree:
+            if type(item) is tuple:  # pylint: disable=unidiomatic-typecheck
+                items.append(ParseCache.__thaw(item, tokens, line_dicts))
+                continue
+            token = tokens.get(id(item))
+            if token is None:
+                token = tokens[id(item)] = StringWithLineNumber(item, item.line_num, line_dicts)
+            items.append(token)
+        return items
+
+    def __path(self, key):
+        return os.path.join(self.directory, f"{key}.pickle")
+
+    def __load(self, key):
+        try:
+            with open(self.__path(key), "rb") as handle:
+                return pickle.load(handle)
+        except (OSError, pickle.UnpicklingError, EOFError):
+            return None
+
+    def __store(self, key, frozen):
+        # write to a temporary file and rename it, so concurrent readers never see a partial entry
+        handle, temp_path = tempfile.mkstemp(dir=self.directory, suffix=".tmp")
+        try:
+            with os.fdopen(handle, "wb") as temp:
+                pickle.dump(frozen, temp, pickle.HIGHEST_PROTOCOL)
+            os.replace(temp_path, self.__path(key))
+        except (OSError, pickle.PicklingError, RecursionError):
+            if os.path.exists(temp_path):
+                os.unlink(temp_path)
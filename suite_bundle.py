@@ -0,0 +1,112 @@
+"""
+Suite bundles: the files of a test suite (e.g. v3/tests and v3/fails) packed into one indexed file,
+so grading a suite opens one file instead of three per test case. Build one with
+
+    python3 suite_bundle.py v3.bundle v3/tests v3/fails
+
+and grade from it with `python3 tester.py 3 --bundle v3.bundle`.
+
+A bundle is MAGIC, the length of the index as 8 little-endian bytes, the index, then the files'
+contents back to back. The index is UTF-8 JSON mapping each file's path, as found under the
+directories it was built from (with / separators), to the [offset, length] of its contents after
+the index. Contents are stored as text mode reads them, with newlines already normalized.
+SuiteBundle memory-maps a bundle once and decodes a file only when it is read.
+"""
+
+import json
+import mmap
+import os
+import sys
+import tempfile
+
+MAGIC = b"BREWIN-SUITE\x01\n"
+_HEADER_SIZE = len(MAGIC) + 8
+
+
+def _member_name(path):
+    return os.path.normpath(path).replace(os.sep, "/")
+
+
+class SuiteBundle:
+    """A memory-mapped suite bundle."""
+
+    __shared = {}
+
+    def __init__(self, path):
+        self.path = path
+        with open(path, "rb") as handle:
+            self.__data = mmap.mmap(handle.fileno(), 0, access=mmap.ACCESS_READ)
+        if self.__data[: len(MAGIC)] != MAGIC:
+            raise ValueError(f"{path} is not a suite bundle")
+        index_size = int.from_bytes(self.__data[len(MAGIC) : _HEADER_SIZE], "little")
+        self.index = json.loads(self.__data[_HEADER_SIZE : _HEADER_SIZE + index_size])
+        self.__base = _HEADER_SIZE + index_size
+
+    @staticmethod
+    def shared(path):
+        """Return this process's bundle for the given path, opening it once."""
+        if path not in SuiteBundle.__shared:
+            SuiteBundle.__shared[path] = SuiteBundle(path)
+        return SuiteBundle.__shared[path]
+
+    def __reduce__(self):
+        # a bundle sent to another process maps the file again there
+        return SuiteBundle.shared, (self.path,)
+
+    def __contains__(self, path):
+        return _member_name(path) in self.index
+
+    def read(self, path):
+        """Return the text of the file at path, or None if the bundle doesn't have it."""
+        entry = self.index.get(_member_name(path))
+        if entry is None:
+            return None
+        offset, length = entry
+        start = self.__base + offset
+        return self.__data[start : start + length].decode("utf-8")
+
+
+def build_bundle(path, directories):
+    """Pack every file under the given directories into a bundle at path; returns how many files it holds."""
+    index = {}
+    contents = []
+    offset = 0
+    for directory in directories:
+        for root, subdirectories, files in os.walk(directory):
+            subdirectories.sort()
+            for name in sorted(files):
+                member = os.path.join(root, name)
+                with open(member, encoding="utf-8") as handle:
+                    data = handle.read().encode("utf-8")
+                index[_member_name(member)] = [offset, len(data)]
+                contents.append(data)
+                offset += len(data)
+    encoded_index = json.dumps(index).encode("utf-8")
+
+    # write to a temporary file and rename it, so graders never map a partial bundle
+    handle, temp_path = tempfile.mkstemp(dir=os.path.dirname(os.path.abspath(path)), suffix=".tmp")
+    try:
+        with os.fdopen(handle, "wb") as temp:
+            temp.write(MAGIC)
+            temp.write(len(encoded_index).to_bytes(8, "little"))
+            temp.write(encoded_index)
+            temp.writelines(contents)
+        os.replace(temp_path, path)
+    except BaseException:
+        os.unlink(temp_path)
+        raise
+    return len(index)
+
+
+def main(argv):
+    """python3 suite_bundle.py BUNDLE DIRECTORY..."""
+    if len(argv) < 2:
+        print("usage: python3 suite_bundle.py BUNDLE DIRECTORY...", file=sys.stderr)
+        return 2
+    count = build_bundle(argv[0], argv[1:])
+    print(f"{argv[0]}: {count} files")
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main(sys.argv[1:]))
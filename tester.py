@@ -2,43 +2,95 @@
 Implements all CS 131-related test logic; is entry-point for testing framework.
 """
 
+import argparse
 import asyncio
 import importlib
+import io
 from os import environ
 import sys
 import traceback
 from operator import itemgetter
 
+from bparser import BParser
+from output_sink import ComparingSink, ListSink, OutputMismatch
 from harness import (
     AbstractTestScaffold,
     run_all_tests,
     get_score,
     write_gradescope_output,
 )
+from parse_cache import ParseCache
+from suite_bundle import SuiteBundle
+from timeouts import (
+    DEFAULT_CAP,
+    DEFAULT_FLOOR,
+    DEFAULT_MULTIPLIER,
+    DEFAULT_TIMINGS_PATH,
+    load_timings,
+    record_timings,
+    with_timeouts,
+)
+from tracing import STATEMENTS, CountingSink, Tracer
 
 
 class TestScaffold(AbstractTestScaffold):
     """Implement scaffold for Brewin' interpreter; load file, validate syntax, run testcase."""
 
-    def __init__(self, interpreter_lib):
+    def __init__(
+        self, interpreter_lib, parse_cache=None, bundle=None, count_statements=False
+    ):
         self.interpreter_lib = interpreter_lib
+        self.parse_cache = parse_cache
+        self.bundle = bundle  # a SuiteBundle to read test files from, instead of the file system
+        # count the statements each case runs, on interpreters that have a tracer
+        self.count_statements = count_statements
+
+    def __getstate__(self):
+        # modules can't be pickled; pool workers re-import the interpreter by name
+        return {
+            "interpreter_lib": self.interpreter_lib.__name__,
+            "parse_cache": self.parse_cache,
+            "bundle": self.bundle,
+            "count_statements": self.count_statements,
+        }
+
+    def __setstate__(self, state):
+        self.interpreter_lib = importlib.import_module(state["interpreter_lib"])
+        self.parse_cache = state["parse_cache"]
+        self.bundle = state["bundle"]
+        self.count_statements = state["count_statements"]
+
+    def read_lines(self, path, keepends=False, optional=False):
+        """
+        Return a test file's lines, from the bundle if there is one; None if an optional file
+        doesn't exist.
+        """
+        if self.bundle is not None:
+            text = self.bundle.read(path)
+        else:
+            try:
+                with open(path, encoding="utf-8") as handle:
+                    text = handle.read()
+            except FileNotFoundError:
+                text = None
+        if text is None:
+            if optional:
+                return None
+            raise FileNotFoundError(path)
+        lines = io.StringIO(text).readlines()
+        return lines if keepends else [line.rstrip("\n") for line in lines]
 
     def setup(self, test_case):
+        if self.parse_cache is not None:
+            BParser.cache = self.parse_cache
+
         inputfile, expfile, srcfile = itemgetter("inputfile", "expfile", "srcfile")(
             test_case
         )
 
-        with open(expfile, encoding="utf-8") as handle:
-            expected = list(map(lambda x: x.rstrip("\n"), handle.readlines()))
-
-        try:
-            with open(inputfile, encoding="utf-8") as handle:
-                stdin = list(map(lambda x: x.rstrip("\n"), handle.readlines()))
-        except FileNotFoundError:
-            stdin = None
-
-        with open(srcfile, encoding="utf-8") as handle:
-            program = handle.readlines()
+        expected = self.read_lines(expfile)
+        stdin = self.read_lines(inputfile, optional=True)
+        program = self.read_lines(srcfile, keepends=True)
 
         return {
             "expected": expected,
@@ -51,10 +103,36 @@ class TestScaffold(AbstractTestScaffold):
         stdin, expected, program = itemgetter("stdin", "expected", "program")(
             environment
         )
+        if expect_failure:
+            # output isn't graded, only the error; keep enough of it to show
+            sink = ListSink(max_lines=len(expected) + 1)
+        else:
+            # stops the program at its first wrong line
+            sink = ComparingSink(expected)
         interpreter = self.interpreter_lib.Interpreter(False, stdin, False)
+        # set after construction, since submitted interpreters don't take an output_sink argument
+        interpreter.output_sink = sink
+        if self.count_statements and hasattr(interpreter, "tracer"):
+            environment["statements"] = CountingSink()
+            interpreter.tracer = Tracer({STATEMENTS}, sink=environment["statements"])
         try:
             interpreter.validate_program(program)
             interpreter.run(program)
+            if not expect_failure:
+                if interpreter.output_sink is not sink:
+                    # the submission replaced our sink (e.g. by assigning output_log during
+                    # run), so check the output it kept instead
+                    sink = ComparingSink(expected)
+                    for line in interpreter.get_output():
+                        sink.write(line)
+                sink.finish()
+        except OutputMismatch as mismatch:
+            print("\nExpected output:")
+            print(expected)
+            print("\nActual output:")
+            print(interpreter.get_output())
+            print(f"\nFirst difference at line index {mismatch.line_index}: {mismatch}")
+            return 0
         except Exception as exception:  # pylint: disable=broad-except
             if expect_failure:
                 error_type, _ = interpreter.get_error_type_and_line()
@@ -78,14 +156,15 @@ class TestScaffold(AbstractTestScaffold):
             print(interpreter.get_output())
             return 0
 
-        passed = interpreter.get_output() == expected
-        if not passed:
-            print("\nExpected output:")
-            print(expected)
-            print("\nActual output:")
-            print(interpreter.get_output())
+        return 1
 
-        return int(passed)
+    def case_metrics(self, environment):
+        counter = environment.get("statements")
+        # interpreters that don't trace statements (interpreterv1) count none; record nothing
+        # rather than a misleading 0
+        if counter is None or not counter.counts[STATEMENTS]:
+            return {}
+        return {"statements": counter.counts[STATEMENTS]}
 
 
 def __generate_test_case_structure(
@@ -173,29 +252,122 @@ def generate_test_suite_v3():
     return __generate_test_suite(3, tests, fails)
 
 
-async def main():
-    """main entrypoint: argparses, delegates to test scaffold, suite generator, gradescope output"""
-    if not sys.argv:
-        raise ValueError("Error: Missing version number argument")
-    version = sys.argv[1]
-    module_name = f"interpreterv{version}"
-    interpreter = importlib.import_module(module_name)
-
-    scaffold = TestScaffold(interpreter)
-
+def generate_test_suite(version):
+    """Return the test suite for a version number, given as a string ("1", "2" or "3")."""
     match version:
         case "1":
-            tests = generate_test_suite_v1()
+            return generate_test_suite_v1()
         case "2":
-            tests = generate_test_suite_v2()
+            return generate_test_suite_v2()
         case "3":
-            tests = generate_test_suite_v3()
+            return generate_test_suite_v3()
         case _:
             raise ValueError("Unsupported version; expect one of 1,2,3")
 
-    results = await run_all_tests(scaffold, tests)
+
+def parse_args(argv):
+    """Parse the command line: a version number plus optional execution settings."""
+    parser = argparse.ArgumentParser(
+        description="Run the Brewin test suite against interpreterv<version>.py"
+    )
+    parser.add_argument("version", help="project version to test (1, 2 or 3)")
+    parser.add_argument(
+        "--workers",
+        type=int,
+        default=1,
+        help="number of worker processes to run test cases in (default: 1, sequential)",
+    )
+    parser.add_argument(
+        "--isolate",
+        action="store_true",
+        help="run each test case in its own process, killed on timeout; reports CPU time and peak RSS",
+    )
+    parser.add_argument(
+        "--parse-cache",
+        nargs="?",
+        const="",
+        metavar="DIR",
+        help="parse each distinct program once; with DIR, also keep parse trees there across runs",
+    )
+    parser.add_argument(
+        "--profile",
+        action="store_true",
+        help="also record each case's peak memory and statement count, and print a summary "
+        "of the metrics (slower)",
+    )
+    parser.add_argument(
+        "--bundle",
+        metavar="FILE",
+        help="read test files from a suite bundle built with suite_bundle.py",
+    )
+    parser.add_argument(
+        "--calibrate",
+        action="store_true",
+        help="record how long each case takes in the timings file; run with the reference interpreter",
+    )
+    parser.add_argument(
+        "--adaptive-timeouts",
+        action="store_true",
+        help="give each case its calibrated time times --timeout-multiplier, within the floor and cap",
+    )
+    parser.add_argument(
+        "--timings",
+        metavar="FILE",
+        default=DEFAULT_TIMINGS_PATH,
+        help=f"timings file (default: {DEFAULT_TIMINGS_PATH})",
+    )
+    parser.add_argument("--timeout-multiplier", type=float, default=DEFAULT_MULTIPLIER)
+    parser.add_argument(
+        "--timeout-floor",
+        type=float,
+        default=DEFAULT_FLOOR,
+        help=f"shortest adaptive timeout, in seconds (default: {DEFAULT_FLOOR})",
+    )
+    parser.add_argument(
+        "--timeout-cap",
+        type=float,
+        default=DEFAULT_CAP,
+        help=f"longest adaptive timeout, and the timeout of uncalibrated cases (default: {DEFAULT_CAP})",
+    )
+    return parser.parse_args(argv)
+
+
+async def main():
+    """main entrypoint: argparses, delegates to test scaffold, suite generator, gradescope output"""
+    args = parse_args(sys.argv[1:])
+    version = args.version
+    module_name = f"interpreterv{version}"
+    interpreter = importlib.import_module(module_name)
+
+    parse_cache = None
+    if args.parse_cache is not None:
+        parse_cache = ParseCache.shared(args.parse_cache or None)
+    bundle = SuiteBundle.shared(args.bundle) if args.bundle else None
+    scaffold = TestScaffold(interpreter, parse_cache, bundle, args.profile)
+    tests = generate_test_suite(version)
+    if args.adaptive_timeouts:
+        tests = with_timeouts(
+            tests,
+            load_timings(args.timings),
+            args.timeout_multiplier,
+            args.timeout_floor,
+            args.timeout_cap,
+        )
+
+    results = await run_all_tests(
+        scaffold,
+        tests,
+        workers=args.workers,
+        isolate=args.isolate,
+        trace_memory=args.profile,
+        print_metrics=args.profile,
+    )
     total_score = get_score(results) / len(results) * 100.0
     print(f"Total Score: {total_score:9.2f}%")
+    if args.calibrate:
+        record_timings(tests, results, args.timings)
+        passed = sum(result["score"] == result["max_score"] for result in results)
+        print(f"Recorded {passed} case times in {args.timings}")
 
     # flag that toggles write path for results.json
     write_gradescope_output(results, environ.get("PROD", False))
@@ -0,0 +1,20 @@
+"""Tests for bparser.py."""
+
+from bparser import BParser
+
+
+def test_tokens_of_different_programs_dont_share_attributes():
+    _, first = BParser.parse(["(class main (field int x 0))"])
+    _, second = BParser.parse(["(class main (field int x 0))"])
+    token, other = first[0][1], second[0][1]
+    vars(token)["checked"] = True
+    token.__dict__["line_num"] = 7
+    assert not hasattr(other, "checked")
+    assert other.line_num == 0
+
+
+def test_setting_an_attribute_on_a_token_leaves_the_rest_of_its_line_alone():
+    _, tree = BParser.parse(["(class main (field int x 0))"])
+    token, neighbour = tree[0][0], tree[0][1]
+    token.line_num = 5
+    assert (token.line_num, neighbour.line_num) == (5, 0)
@@ -0,0 +1,40 @@
+"""The bytecode VM (bytecodev2) must behave exactly like the closure compiler on every v2 and v3 program."""
+
+import glob
+import io
+import os
+from contextlib import redirect_stdout
+
+import pytest
+
+import interpreterv3
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+PROGRAMS = sorted(
+    os.path.relpath(path, ROOT)
+    for version in ("v2", "v3")
+    for path in glob.glob(os.path.join(ROOT, version, "**", "*.brewin"), recursive=True)
+)
+
+
+def run(path, **options):
+    """Run a program on interpreterv3; returns (output lines, error type, error line)."""
+    with open(os.path.join(ROOT, path), encoding="utf-8") as handle:
+        program = handle.readlines()
+    stdin = None
+    input_path = os.path.join(ROOT, path[: -len(".brewin")] + ".in")
+    if os.path.exists(input_path):
+        with open(input_path, encoding="utf-8") as handle:
+            stdin = [line.rstrip("\n") for line in handle]
+    interpreter = interpreterv3.Interpreter(False, stdin, False, **options)
+    try:
+        with redirect_stdout(io.StringIO()):
+            interpreter.run(program)
+    except Exception:  # pylint: disable=broad-except
+        pass  # errors are recorded on the interpreter, like in tester.py
+    return (interpreter.get_output(), *interpreter.get_error_type_and_line())
+
+
+@pytest.mark.parametrize("path", PROGRAMS)
+def test_bytecode_matches_closures(path):
+    assert run(path, bytecode=True) == run(path)
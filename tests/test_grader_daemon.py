@@ -0,0 +1,41 @@
+"""Tests for grader_daemon.py, run as the separate process it normally is."""
+
+import os
+import signal
+import subprocess
+import sys
+import time
+
+import grader_daemon
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+
+
+def start_daemon(socket_path):
+    daemon = subprocess.Popen(
+        [sys.executable, "grader_daemon.py", "--socket", socket_path, "serve", "--workers", "1"],
+        cwd=ROOT,
+        stdout=subprocess.DEVNULL,
+    )
+    deadline = time.monotonic() + 60
+    while not os.path.exists(socket_path):
+        assert daemon.poll() is None, "the daemon exited while starting"
+        assert time.monotonic() < deadline, "the daemon didn't start listening"
+        time.sleep(0.1)
+    return daemon
+
+
+def test_daemon_removes_its_socket_on_sigterm_and_restarts(tmp_path):
+    socket_path = str(tmp_path / "grader.sock")
+    daemon = start_daemon(socket_path)
+    daemon.send_signal(signal.SIGTERM)
+    assert daemon.wait(30) == 0
+    assert not os.path.exists(socket_path)
+
+    daemon = start_daemon(socket_path)
+    try:
+        response = grader_daemon.submit(ROOT, 1, socket_path)
+        assert "results" in response, response
+    finally:
+        daemon.send_signal(signal.SIGTERM)
+        daemon.wait(30)
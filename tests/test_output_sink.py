@@ -0,0 +1,63 @@
+"""Tests for output_sink.py and how InterpreterBase uses it."""
+
+import pytest
+
+from intbase import InterpreterBase
+from output_sink import ComparingSink, ListSink, OutputMismatch
+
+
+class AppendingInterpreter(InterpreterBase):
+    """Prints its program's lines, alternating output() with appending to output_log."""
+
+    def run(self, program):
+        for index, line in enumerate(program):
+            if index % 2:
+                self.output_log.append(line)
+            else:
+                self.output(line)
+
+
+def test_appending_to_output_log_keeps_the_lines():
+    interpreter = AppendingInterpreter(False)
+    interpreter.run(["a", "b", "c"])
+    assert interpreter.get_output() == ["a", "b", "c"]
+
+
+def test_appending_to_output_log_with_a_comparing_sink_keeps_the_lines():
+    interpreter = AppendingInterpreter(False, output_sink=ComparingSink(["a", "b", "c"]))
+    interpreter.run(["a", "b", "c"])
+    assert interpreter.get_output() == ["a", "b", "c"]
+
+
+def test_assigning_output_log_retains_output_in_that_list():
+    interpreter = AppendingInterpreter(False, output_sink=ListSink())
+    lines = []
+    interpreter.output_log = lines
+    interpreter.output("a")
+    assert lines == ["a"]
+    assert interpreter.get_output() is lines
+
+
+class SwallowingInterpreter(InterpreterBase):
+    """Prints its program's lines, ignoring any exception output() raises."""
+
+    def run(self, program):
+        for line in program:
+            try:
+                self.output(line)
+            except Exception:  # pylint: disable=broad-except
+                pass
+
+
+def test_comparing_sink_keeps_the_first_mismatch():
+    sink = ComparingSink(["a", "b", "c"])
+    SwallowingInterpreter(False, output_sink=sink).run(["a", "x", "c", "y"])
+    assert (sink.mismatch.line_index, sink.mismatch.expected, sink.mismatch.received) == (
+        1,
+        "b",
+        "x",
+    )
+    assert sink.lines() == ["a", "x"]
+    with pytest.raises(OutputMismatch) as raised:
+        sink.finish()
+    assert raised.value is sink.mismatch
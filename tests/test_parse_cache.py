@@ -0,0 +1,36 @@
+"""Tests for parse_cache.py."""
+
+from bparser import BParser
+from parse_cache import ParseCache
+
+PROGRAM = ["(class main\n", "  (method void main () (print 1 1))\n", ")\n"]
+
+
+def parse(cache, lines):
+    key = cache.key(lines)
+    status, tree = cache.get(key) or cache.put(key, BParser.parse(lines))
+    return status, cache.thaw(tree)
+
+
+def test_lookups_hand_out_trees_that_runs_cant_change_for_each_other():
+    cache = ParseCache()
+    _, first = parse(cache, PROGRAM)
+    _, second = parse(cache, PROGRAM)
+    assert first == second
+    first[0][0].line_num = 7
+    vars(first[0][1])["checked"] = True
+    first[0].pop()
+    _, third = parse(cache, PROGRAM)
+    assert third == second
+    assert third[0][0].line_num == 0
+    assert not hasattr(third[0][1], "checked")
+
+
+def test_only_the_most_recently_used_entries_are_kept():
+    cache = ParseCache(max_entries=2)
+    programs = [[f"(class c{i})\n"] for i in range(3)]
+    parse(cache, programs[0])
+    parse(cache, programs[1])
+    parse(cache, programs[0])
+    parse(cache, programs[2])
+    assert list(cache.entries) == [cache.key(programs[0]), cache.key(programs[2])]
@@ -0,0 +1,37 @@
+"""Tests for type_valuev2's TypeManager."""
+
+import pytest
+
+import interpreterv3
+from bparser import StringWithLineNumber
+from intbase import ErrorType
+from type_valuev2 import INT_TYPE, TypeManager
+
+
+def test_types_are_interned_per_type_manager():
+    first, second = TypeManager(), TypeManager()
+    node = first.get_type(StringWithLineNumber("node", 3))
+    assert first.get_type("node") is node
+    assert second.get_type("node") is not node
+    assert first.get_type("int") is second.get_type("int") is INT_TYPE
+    assert type(node.type_name) is str  # pylint: disable=unidiomatic-typecheck
+
+
+def test_a_superclass_that_was_never_declared_is_an_attribute_error():
+    type_manager = TypeManager()
+    type_manager.add_class_type("student", "person")
+    type_manager.add_class_type("animal", None)
+    with pytest.raises(AttributeError):
+        type_manager.is_a_subtype("animal", "student")
+    assert type_manager.is_a_subtype("student", "student")
+
+
+def test_the_interpreter_reports_an_undeclared_superclass_as_a_type_error():
+    program = [
+        "(class student inherits person (method void hi () (print 1)))\n",
+        "(class main (method void main () (print 1)))\n",
+    ]
+    interpreter = interpreterv3.Interpreter(False, None, False)
+    with pytest.raises(RuntimeError):
+        interpreter.run(program)
+    assert interpreter.get_error_type_and_line() == (ErrorType.TYPE_ERROR, 0)
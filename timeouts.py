@@ -0,0 +1,76 @@
+"""
+Per-test-case timeouts calibrated against a reference interpreter. Calibrating runs a suite on the
+reference interpreter and records how long each case took in a timings file (JSON, mapping each
+case's srcfile to seconds); grading with that file gives each case baseline * multiplier seconds,
+clamped to [floor, cap], so a submission that hangs on a case the reference runs in milliseconds
+fails in about a second instead of the full cap. Cases the file has no time for get the cap.
+
+    python3 tester.py 3 --calibrate
+    python3 tester.py 3 --adaptive-timeouts
+
+The floor leaves room for what the reference's time doesn't include, like starting an isolated
+test process, and for timing noise.
+"""
+
+import json
+import os
+import tempfile
+
+DEFAULT_TIMINGS_PATH = "timings.json"
+DEFAULT_MULTIPLIER = 10
+DEFAULT_FLOOR = 1.0
+DEFAULT_CAP = 5
+
+
+def load_timings(path=DEFAULT_TIMINGS_PATH):
+    """Return the baseline seconds per srcfile recorded at path; empty if there is no file."""
+    try:
+        with open(path, encoding="utf-8") as handle:
+            return json.load(handle)
+    except FileNotFoundError:
+        return {}
+
+
+def record_timings(tests, results, path=DEFAULT_TIMINGS_PATH):
+    """
+    Record the wall time of each test case in results (as run_all_tests returns them, in test
+    order) in the timings file at path, keeping times already there for other cases. Only cases
+    the reference passed are recorded: a failed or timed-out run says nothing about how long the
+    case should take.
+    """
+    timings = load_timings(path)
+    for test, result in zip(tests, results):
+        extra_data = result.get("extra_data", {})
+        if result["score"] != result["max_score"] or extra_data.get("timed_out"):
+            continue
+        wall_time = extra_data.get("wall_time")
+        if wall_time is not None:
+            timings[test["srcfile"]] = wall_time
+
+    # write to a temporary file and rename it, so a grader never reads a partial file
+    handle, temp_path = tempfile.mkstemp(dir=os.path.dirname(os.path.abspath(path)), suffix=".tmp")
+    try:
+        with os.fdopen(handle, "w", encoding="utf-8") as temp:
+            json.dump(timings, temp, indent=4, sort_keys=True)
+        os.replace(temp_path, path)
+    except BaseException:
+        os.unlink(temp_path)
+        raise
+    return timings
+
+
+def case_timeout(baseline, multiplier=DEFAULT_MULTIPLIER, floor=DEFAULT_FLOOR, cap=DEFAULT_CAP):
+    """The timeout for a case whose reference run took baseline seconds (None if unknown)."""
+    if baseline is None:
+        return cap
+    return min(max(baseline * multiplier, floor), cap)
+
+
+def with_timeouts(
+    tests, timings, multiplier=DEFAULT_MULTIPLIER, floor=DEFAULT_FLOOR, cap=DEFAULT_CAP
+):
+    """Copies of the test cases, each with a "timeout" (which the harness honours) from its baseline."""
+    return [
+        {**test, "timeout": case_timeout(timings.get(test["srcfile"]), multiplier, floor, cap)}
+        for test in tests
+    ]
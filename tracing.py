@@ -0,0 +1,96 @@
+"""
+Structured tracing for the interpreters, in place of ad hoc debug prints. Every interpreter has a Tracer
+(`interpreter.tracer`); code traces with `tracer.trace(category, message, *args)`, and a record is written to the
+tracer's sink only if its category is enabled and its level is at or above the tracer's level.
+
+Tracing is off unless asked for: a default Tracer enables no categories. A disabled trace() is one call that
+tests a set, and message arguments are only %-formatted when a sink asks for a record's text. Code that runs once per
+statement asks `tracer.enabled(category)` once, when it is compiled or its object created, so it costs nothing
+at all while that category is off; enable categories before running a program.
+
+    Interpreter(False, inp, tracer=Tracer({STATEMENTS, CALLS}, sink=RingBufferSink(1000)))
+
+The interpreters' trace_output=True is shorthand for Tracer({STATEMENTS}), which prints each statement's line
+number and source to stdout as it runs.
+"""
+
+import sys
+from collections import Counter, deque
+from enum import IntEnum
+from typing import NamedTuple
+
+
+class TraceLevel(IntEnum):
+    """Importance of a trace record; a tracer drops records below its level."""
+
+    DEBUG = 10
+    INFO = 20
+
+
+# categories
+STATEMENTS = "statements"  # each statement, before it runs
+CALLS = "calls"  # method calls, their arguments and results
+EXPRESSIONS = "expressions"  # values of expressions
+CLASSES = "classes"  # class definitions and template instantiations as they are loaded
+CATEGORIES = (STATEMENTS, CALLS, EXPRESSIONS, CLASSES)
+
+
+class TraceRecord(NamedTuple):
+    """One written trace message; its text is message % args."""
+
+    category: str
+    level: TraceLevel
+    message: str
+    args: tuple
+
+    @property
+    def text(self):
+        return self.message % self.args if self.args else self.message
+
+
+class StreamSink:
+    """Writes each record's message as a line to a stream; stdout (whatever it is at the time) by default."""
+
+    def __init__(self, stream=None):
+        self.stream = stream
+
+    def write(self, record):
+        print(record.text, file=self.stream if self.stream is not None else sys.stdout)
+
+
+class RingBufferSink:
+    """Keeps the most recent `capacity` records in memory, in `records`, oldest first."""
+
+    def __init__(self, capacity=1000):
+        self.records = deque(maxlen=capacity)
+
+    def write(self, record):
+        self.records.append(record)
+
+
+class CountingSink:
+    """Counts records per category, in `counts`, without formatting them."""
+
+    def __init__(self):
+        self.counts = Counter()
+
+    def write(self, record):
+        self.counts[record.category] += 1
+
+
+class Tracer:
+    """Decides which trace records are written, and writes them to a sink."""
+
+    def __init__(self, categories=(), level=TraceLevel.DEBUG, sink=None):
+        self.categories = frozenset(categories)
+        self.level = level
+        self.sink = sink if sink is not None else StreamSink()
+
+    def enabled(self, category, level=TraceLevel.DEBUG):
+        """Whether a record of this category and level would be written."""
+        return category in self.categories and level >= self.level
+
+    def trace(self, category, message, *args, level=TraceLevel.DEBUG):
+        """Write a record of message % args to the sink, if its category and level are enabled."""
+        if category in self.categories and level >= self.level:
+            self.sink.write(TraceRecord(category, level, message, args))
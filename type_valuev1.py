@@ -20,6 +20,8 @@ class Type(Enum):
 class Value:
     """A representation for a value that contains a type tag."""
 
+    __slots__ = ("__type", "__value", "__class_name")
+
     def __init__(self, value_type, value=None,class_name = None):
         self.__type = value_type
         self.__value = value
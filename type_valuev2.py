@@ -1,25 +1,32 @@
 
+from collections import OrderedDict
+
 from intbase import InterpreterBase
 
 
-# Enumerated type for our different language data types
+# Enumerated type for our different language data types. Types are interned: a program's TypeManager hands out
+# exactly one Type object per type name (see TypeManager.get_type), so two types are the same type when they are the
+# same object
 class Type:
-    def __init__(self, type_name, supertype_name=None):
+    __slots__ = ("type_name",)
+
+    def __init__(self, type_name):
         self.type_name = type_name
-        self.supertype_name = supertype_name
 
-    def type_name(self):
-        return self.type_name
 
-    def __eq__(self, other):
-        return (
-            self.type_name == other.type_name
-            and self.supertype_name == other.supertype_name
-        )
+# the built-in types are shared by every TypeManager
+INT_TYPE = Type(InterpreterBase.INT_DEF)
+STRING_TYPE = Type(InterpreterBase.STRING_DEF)
+BOOL_TYPE = Type(InterpreterBase.BOOL_DEF)
+NULL_TYPE = Type(InterpreterBase.NULL_DEF)
+NOTHING_TYPE = Type(InterpreterBase.NOTHING_DEF)
 
 
-# Represents a value, which has a type and its value
+# Represents a value, which has a type and its value. Values are never changed once created, so they can be shared:
+# see int_value, bool_value and string_value
 class Value:
+    __slots__ = ("t", "v")
+
     def __init__(self, type_obj, value=None):
         self.t = type_obj
         self.v = value
@@ -27,52 +34,74 @@ class Value:
     def value(self):
         return self.v
 
-    def set(self, other):
-        self.t = other.t
-        self.v = other.v
-
     def type(self):
         return self.t
 
     def is_null(self):
-        return self.v == None and self.t != Type(InterpreterBase.NOTHING_DEF)
-  
+        return self.v is None and self.t is not NOTHING_TYPE
+
     def is_typeless_null(self):
-        return self.v == None and self.t == Type(InterpreterBase.NULL_DEF)
-    
+        return self.v is None and self.t is NULL_TYPE
+
     def __eq__(self, other):
-        return self.t == other.t and self.v == other.v
+        return self.t is other.t and self.v == other.v
+
+
+# the most common values are created once, and shared by every expression that evaluates to them
+SMALL_INT_MIN = -128
+SMALL_INT_MAX = 1023
+_small_int_values = [Value(INT_TYPE, i) for i in range(SMALL_INT_MIN, SMALL_INT_MAX + 1)]
+TRUE_VALUE = Value(BOOL_TYPE, True)
+FALSE_VALUE = Value(BOOL_TYPE, False)
+EMPTY_STRING_VALUE = Value(STRING_TYPE, "")
+
+
+# returns an int Value; shared for small ints
+def int_value(i):
+    if SMALL_INT_MIN <= i <= SMALL_INT_MAX:
+        return _small_int_values[i - SMALL_INT_MIN]
+    return Value(INT_TYPE, i)
+
+
+# returns TRUE_VALUE or FALSE_VALUE
+def bool_value(b):
+    return TRUE_VALUE if b else FALSE_VALUE
+
+
+# returns a string Value; shared for ""
+def string_value(s):
+    if not s:
+        return EMPTY_STRING_VALUE
+    return Value(STRING_TYPE, s)
 
 
 # val is a string with the value we want to use to construct a Value object.
 # e.g., '1234' 'null' 'true' '"foobar"'
 def create_value(val):
     if val == InterpreterBase.TRUE_DEF:
-        return Value(Type(InterpreterBase.BOOL_DEF), True)
+        return TRUE_VALUE
     elif val == InterpreterBase.FALSE_DEF:
-        return Value(Type(InterpreterBase.BOOL_DEF), False)
+        return FALSE_VALUE
     elif val[0] == '"':
-        return Value(Type(InterpreterBase.STRING_DEF), val.strip('"'))
+        return string_value(val.strip('"'))
     elif val.lstrip('-').isnumeric():
-        return Value(Type(InterpreterBase.INT_DEF), int(val))
+        return int_value(int(val))
     elif val == InterpreterBase.NULL_DEF:
-        return Value(Type(InterpreterBase.NULL_DEF), None)
+        return Value(NULL_TYPE, None)
     else:
         return None
 
 
 # create a default value of the specified type; type_def is a Type object
 def create_default_value(type_def):
-    if type_def == Type(InterpreterBase.BOOL_DEF):
-        return Value(Type(InterpreterBase.BOOL_DEF), False)
-    elif type_def == Type(InterpreterBase.STRING_DEF):
-        return Value(Type(InterpreterBase.STRING_DEF), "")
-    elif type_def == Type(InterpreterBase.INT_DEF):
-        return Value(Type(InterpreterBase.INT_DEF), 0)
-    elif type_def == Type(
-        InterpreterBase.NOTHING_DEF
-    ):  # used for void return type on methods
-        return Value(Type(InterpreterBase.NOTHING_DEF), None)
+    if type_def is BOOL_TYPE:
+        return FALSE_VALUE
+    elif type_def is STRING_TYPE:
+        return EMPTY_STRING_VALUE
+    elif type_def is INT_TYPE:
+        return int_value(0)
+    elif type_def is NOTHING_TYPE:  # used for void return type on methods
+        return Value(NOTHING_TYPE, None)
     else:
         return Value(
             type_def, None
@@ -82,17 +111,44 @@ def create_default_value(type_def):
 # Used to track user-defined types (for classes) as well as check for type compatibility between
 # values of same/different types for assignment/comparison
 class TypeManager:
+    # most check_type_compatibility results remembered; programs use few distinct type pairs, so only very large
+    # programs ever evict
+    COMPATIBILITY_CACHE_SIZE = 4096
+
     def __init__(self):
+        # type name -> its canonical Type, for every type name the program has used, valid or not; see get_type
+        self.types = {
+            type_obj.type_name: type_obj
+            for type_obj in (INT_TYPE, STRING_TYPE, BOOL_TYPE, NULL_TYPE, NOTHING_TYPE)
+        }
         self.map_typename_to_type = {}
+        self.supertype_names = {}  # class name -> name of its superclass, or None
+        # type name -> (names of the type and all its superclasses, first superclass name that isn't registered or
+        # None); filled in on first use and emptied, with the cache below, whenever a type is registered
+        self.ancestors = {}
+        self.compatibility_cache = OrderedDict()  # (typea, typeb, for_assignment) -> bool, least recent first
         self.__setup_primitive_types()
 
     # used to register a new class name (and its supertype name, if present as a valid type so it can be used
     # for type checking.
     # needs to be called the moment we parse the class name and superclass name to enable things like linked lists
     # and other self-referential structures
+    # template instantiations like node@int are registered the same way once they are created; since types are
+    # interned, any Type already handed out for that name becomes the valid class type
     def add_class_type(self, class_name, superclass_name):
-        class_type = Type(class_name, superclass_name)
-        self.map_typename_to_type[class_name] = class_type
+        self.map_typename_to_type[class_name] = self.get_type(class_name)
+        self.supertype_names[class_name] = superclass_name
+        self.ancestors.clear()
+        self.compatibility_cache.clear()
+
+    # returns the canonical Type object for a type name, creating it the first time the name is seen. The table
+    # belongs to this program's TypeManager, so it goes away with the program
+    def get_type(self, type_name):
+        type_obj = self.types.get(type_name)
+        if type_obj is None:
+            type_name = str(type_name)  # not the parser's token, which would keep its line number alive
+            type_obj = self.types[type_name] = Type(type_name)
+        return type_obj
 
     def is_valid_type(self, typename):
         return typename in self.map_typename_to_type
@@ -109,21 +165,49 @@ class TypeManager:
             suspected_subtype
         ):
             return False
-        cur_type = suspected_subtype
-        while True:
-            if (
-                suspected_supertype == cur_type
-            ):  # passing a Student object to a Student parameter
-                return True
-            type_info = self.get_type_info(cur_type)
-            if type_info.supertype_name is None:
-                return False
-            cur_type = (
-                type_info.supertype_name #check suspected supertype is in the inheritance chain
-            )  # check the base class of the subtype next
+        ancestors = self.ancestors.get(suspected_subtype)
+        if ancestors is None:
+            ancestors = self.ancestors[suspected_subtype] = self.__find_ancestors(
+                suspected_subtype
+            )
+        names, unregistered_name = ancestors
+        if (
+            suspected_supertype in names
+        ):  # passing a Student object to a Student parameter, or to a Person parameter
+            return True
+        if unregistered_name is not None:
+            # the superclass chain runs into a class that was never declared. The interpreter reports that as a
+            # TYPE_ERROR when it builds the class, before any type check; used on its own, a TypeManager raises
+            # AttributeError, as it always has
+            raise AttributeError(f"no type named {unregistered_name}")
+        return False
+
+    # walks the superclass chain of a type once; see self.ancestors
+    def __find_ancestors(self, typename):
+        names = set()
+        cur_type = typename
+        while cur_type is not None and cur_type not in names:  # stop at the base class, or if the chain loops
+            names.add(cur_type)
+            if cur_type not in self.supertype_names:
+                return frozenset(names), cur_type
+            cur_type = self.supertype_names[cur_type]  # check the base class of the subtype next
+        return frozenset(names), None
 
     # typea and typeb are Type objects
     def check_type_compatibility(self, typea, typeb, for_assignment):
+        key = (typea, typeb, for_assignment)
+        cache = self.compatibility_cache
+        compatible = cache.get(key)
+        if compatible is not None:
+            cache.move_to_end(key)
+            return compatible
+        compatible = self.__check_type_compatibility(typea, typeb, for_assignment)
+        cache[key] = compatible
+        if len(cache) > TypeManager.COMPATIBILITY_CACHE_SIZE:
+            cache.popitem(last=False)
+        return compatible
+
+    def __check_type_compatibility(self, typea, typeb, for_assignment):
         # if either type is invalid (E.g., the user referenced a class name that doesn't exist) then
         # return false
         if not self.is_valid_type(typea.type_name) or not self.is_valid_type(
@@ -141,7 +225,7 @@ class TypeManager:
         ):  # person == animal
             return True
         # if the types are identical then they're compatible
-        if typea == typeb:
+        if typea is typeb:
             return True
         # if either is a primitive type, but the types aren't the same, they can't match
         if (
@@ -167,15 +251,9 @@ class TypeManager:
             InterpreterBase.STRING_DEF,
             InterpreterBase.BOOL_DEF,
         }
-        self.map_typename_to_type[InterpreterBase.INT_DEF] = Type(
-            InterpreterBase.INT_DEF
-        )
-        self.map_typename_to_type[InterpreterBase.STRING_DEF] = Type(
-            InterpreterBase.STRING_DEF
-        )
-        self.map_typename_to_type[InterpreterBase.BOOL_DEF] = Type(
-            InterpreterBase.BOOL_DEF
-        )
-        self.map_typename_to_type[InterpreterBase.NULL_DEF] = Type(
-            InterpreterBase.NULL_DEF
-        )
\ No newline at end of file
+        self.map_typename_to_type[InterpreterBase.INT_DEF] = INT_TYPE
+        self.map_typename_to_type[InterpreterBase.STRING_DEF] = STRING_TYPE
+        self.map_typename_to_type[InterpreterBase.BOOL_DEF] = BOOL_TYPE
+        self.map_typename_to_type[InterpreterBase.NULL_DEF] = NULL_TYPE
+        for typename in self.map_typename_to_type:
+            self.supertype_names[typename] = None
\ No newline at end of file